@@ -0,0 +1,104 @@
+"""
+In-memory review representation benchmark.
+
+Measures bytes per review (tracemalloc) for what the pipeline holds at each step:
+  crawl:      crawler output as 16-key dicts vs ReviewRecords sharing one ProductInfo per product
+  transform:  the dict path copied every dict; ReviewRecords are normalized in place
+  dataframe:  all-object columns vs to_dataframe's categorical / nullable dtypes (memory_usage(deep=True))
+Review texts are generated before measuring, so only the representation is counted.
+
+    python -m benchmarks.bench_memory --sizes 10000 100000
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+import pandas as pd
+from benchmarks.synthetic import generate_reviews
+from src.etl.records import ProductCatalog, ReviewRecord, PRODUCT_KEYS, REVIEW_KEYS, intern_value
+from src.etl.transformer import ReviewTransformer
+from src.utils.logger import logger
+
+# DatabaseHandler.get_all_reviews column names for the synthetic reviews
+DB_COLUMNS = {"상품명": "product_name", "브랜드": "brand", "가격": "price", "쿠팡상품번호": "coupang_product_id", "옵션": "option",
+              "리뷰제목": "review_title", "리뷰본문": "review_content", "리뷰페이지": "review_page", "작성자": "author",
+              "평점": "rating", "작성일": "created_at", "판매자": "seller", "실제구매상품명": "actual_purchase_product_name",
+              "이미지들": "images", "설문응답": "survey_response", "도움수": "helpful_count"}
+
+def measure(build):
+    """Returns (result, bytes still allocated by build())."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, allocated
+
+def crawler_rows(size, seed):
+    """(product values, review values) per review, like the crawler has them before building its output."""
+    rows = []
+    products = {}
+    for review in generate_reviews(size, seed=seed):
+        product = tuple(review[key] for key in PRODUCT_KEYS)
+        product = products.setdefault(product, product) # the crawler holds one product_info per product
+        rows.append((product, tuple(review[key] for key in REVIEW_KEYS if key in review)))
+    return rows
+
+def review_fields():
+    return [REVIEW_KEYS[key] for key in REVIEW_KEYS if key in DB_COLUMNS]
+
+def build_dicts(rows):
+    review_keys = [key for key in REVIEW_KEYS if key in DB_COLUMNS]
+    return [dict(zip(PRODUCT_KEYS, product), **dict(zip(review_keys, values))) for product, values in rows]
+
+def build_records(rows):
+    catalog = ProductCatalog()
+    attributes = review_fields()
+    records = []
+    for product, values in rows:
+        record = ReviewRecord(catalog.get(*product), **dict(zip(attributes, values)))
+        record.seller, record.created_at, record.helpful = intern_value(record.seller), intern_value(record.created_at), intern_value(record.helpful)
+        records.append(record)
+    return records
+
+def db_rows(records):
+    """Transformed reviews as get_all_reviews returns them."""
+    return [{column: record[key] for key, column in DB_COLUMNS.items()} | {"id": i} for i, record in enumerate(records, 1)]
+
+def run(size, seed):
+    rows = crawler_rows(size, seed)
+    dicts, dict_bytes = measure(lambda: build_dicts(rows))
+    records, record_bytes = measure(lambda: build_records(rows))
+
+    # The dict path's transform kept a copy of every dict next to the crawler output
+    _, copy_bytes = measure(lambda: [review.copy() for review in dicts])
+    transformer = ReviewTransformer()
+    # Aspect lists and cleaned values are allocated by both paths, so the in-place cost is added to both sides
+    transformed, in_place_bytes = measure(lambda: transformer.transform(records))
+
+    stored = db_rows(transformed)
+    object_df = pd.DataFrame(stored).rename(columns={v: k for k, v in DB_COLUMNS.items()})
+    typed_df = transformer.to_dataframe(stored)
+    object_df_bytes = object_df.memory_usage(deep=True).sum()
+    typed_df_bytes = typed_df.memory_usage(deep=True).sum()
+
+    return {
+        "crawl": (dict_bytes / size, record_bytes / size),
+        "crawl + transform": ((dict_bytes + copy_bytes + in_place_bytes) / size, (record_bytes + in_place_bytes) / size),
+        "dataframe": (object_df_bytes / size, typed_df_bytes / size),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bytes per review: dicts vs ReviewRecords, object vs typed DataFrames")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    print(f"{'reviews':>8} {'step':<18} {'before B/review':>16} {'after B/review':>15} {'saved':>7}")
+    for size in args.sizes:
+        for step, (before, after) in run(size, args.seed).items():
+            print(f"{size:>8} {step:<18} {before:>16,.0f} {after:>15,.0f} {(1 - after / before) * 100:>6.1f}%")
@@ -0,0 +1,98 @@
+"""
+Near-duplicate detection benchmark.
+
+Plants copy-pasted / lightly edited reviews in a synthetic corpus and runs the
+incremental MinHash-LSH path (NearDuplicateDetector + a local SQLite database)
+at growing corpus sizes. Time per review should stay flat as the corpus grows;
+the all-pairs baseline is run at the smallest size for comparison and to check recall.
+
+    python -m benchmarks.bench_near_duplicates --sizes 2000 10000 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from src.db.database_handler import DatabaseHandler
+from src.etl.near_duplicate import NearDuplicateDetector
+from src.utils.logger import logger
+
+SYLLABLES = "가나다라마바사아자차카타파하거너더러머버서어저처커터퍼허고노도로모보소오조초코토포호구누두루무부수우주추쿠투푸후"
+
+def make_corpus(size, duplicate_ratio=0.1, seed=7):
+    """Returns (reviews, planted) where planted maps a duplicate's id to its source id."""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(3000)]
+    reviews, planted = [], {}
+    for review_id in range(1, size + 1):
+        if reviews and rng.random() < duplicate_ratio:
+            source = rng.choice(reviews)
+            text = source['리뷰본문']
+            if rng.random() < 0.5: # light edit: a word appended at the end
+                text = text + " " + rng.choice(vocabulary)
+            planted[review_id] = source['id']
+        else:
+            text = " ".join(rng.choices(vocabulary, k=rng.randint(15, 40)))
+        reviews.append({"id": review_id, "리뷰본문": text})
+    return reviews, planted
+
+def insert_stub_reviews(db_handler, reviews):
+    with db_handler.engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO reviews (id, product_name) VALUES (?, 'bench')", [(r['id'],) for r in reviews])
+
+def run_lsh(size, batch_size):
+    reviews, planted = make_corpus(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_handler = DatabaseHandler(db_url=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        db_handler.create_tables()
+        insert_stub_reviews(db_handler, reviews)
+        detector = NearDuplicateDetector(db_handler)
+        start = time.perf_counter()
+        for offset in range(0, len(reviews), batch_size):
+            detector.process_reviews(reviews[offset:offset + batch_size])
+        elapsed = time.perf_counter() - start
+        flagged = {r['id'] for r in db_handler.get_all_reviews() if r['is_duplicate']}
+    found = len(flagged & set(planted))
+    return elapsed, found, len(planted), len(flagged - set(planted))
+
+def run_all_pairs(size):
+    """Exact Jaccard over the same shingles, comparing every pair: O(n^2)."""
+    reviews, planted = make_corpus(size)
+    detector = NearDuplicateDetector(db_handler=None)
+    k = detector.shingle_size
+    start = time.perf_counter()
+    shingle_sets = []
+    for review in reviews:
+        text = detector._normalize(review['리뷰본문'])
+        shingle_sets.append({text[i:i + k] for i in range(max(len(text) - k + 1, 1))})
+    flagged = set()
+    for i in range(len(reviews)):
+        for j in range(i):
+            a, b = shingle_sets[i], shingle_sets[j]
+            if len(a & b) / len(a | b) >= detector.threshold:
+                flagged.add(reviews[i]['id'])
+                break
+    elapsed = time.perf_counter() - start
+    return elapsed, len(flagged & set(planted)), len(planted)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MinHash-LSH near-duplicate benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 10000, 50000])
+    parser.add_argument('--batch-size', type=int, default=1000, help='Reviews per insert batch (incremental hook size).')
+    parser.add_argument('--skip-all-pairs', action='store_true')
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    print(f"{'reviews':>8} {'seconds':>9} {'ms/review':>10} {'recall':>8} {'false+':>7}")
+    for size in args.sizes:
+        elapsed, found, planted, false_positives = run_lsh(size, args.batch_size)
+        print(f"{size:>8} {elapsed:>9.2f} {elapsed / size * 1000:>10.3f} {found / max(planted, 1):>8.3f} {false_positives:>7}")
+
+    if not args.skip_all_pairs:
+        size = min(args.sizes)
+        elapsed, found, planted = run_all_pairs(size)
+        print(f"all-pairs baseline at {size} reviews: {elapsed:.2f}s, recall {found / max(planted, 1):.3f} "
+              f"(grows quadratically: ~{elapsed * (max(args.sizes) / size) ** 2:.0f}s at {max(args.sizes)})")
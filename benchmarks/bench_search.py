@@ -0,0 +1,88 @@
+"""
+Full-text search latency benchmark.
+
+Indexes a synthetic corpus (benchmarks/synthetic.py sentences plus one rare word per
+review) into a ReviewSearchIndex at growing sizes and times search() for rare terms,
+common terms (matching a large share of the corpus), multi-word queries and filtered
+queries. Exact BM25 top-k is measured by default; pass --max-candidates N to measure the
+recency-biased mode (SEARCH_MAX_CANDIDATES) as well.
+
+    python -m benchmarks.bench_search --sizes 100000 1000000
+    python -m benchmarks.bench_search --sizes 1000000 --max-candidates 20000
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from benchmarks.synthetic import generate_reviews
+from src.search.review_search import ReviewSearchIndex
+from src.utils.logger import logger
+
+RARE_SYLLABLES = "갸냐댜랴먀뱌샤야쟈챠캬탸퍄햐겨녀뎌려며벼셔여져쳐켜텨펴혀"
+
+QUERIES = {
+    "rare": {"query": None}, # filled with a planted rare word
+    "common": {"query": "배송"},
+    "two words": {"query": "배송 포장"},
+    "common + product": {"query": "배송", "product_id": "8000000003 - 20000000003"},
+    "common + rating/date": {"query": "품질", "min_rating": 4, "date_from": "2024-01-01"},
+}
+
+def build_index(index_path, size, batch_size=20000, seed=0):
+    """Indexes size synthetic reviews; returns (index, a rare word present in the corpus, seconds)."""
+    rng = random.Random(seed)
+    rare_words = ["".join(rng.choice(RARE_SYLLABLES) for _ in range(3)) for _ in range(50000)]
+    index = ReviewSearchIndex(index_path=index_path)
+    start = time.perf_counter()
+    for offset in range(0, size, batch_size):
+        raw = generate_reviews(min(batch_size, size - offset), seed=seed + offset, n_products=max(1, size // 200))
+        docs = []
+        for i, review in enumerate(raw):
+            docs.append({
+                "id": offset + i + 1,
+                "쿠팡상품번호": review["쿠팡상품번호"],
+                "평점": float(review["평점"]),
+                "작성일": datetime.datetime.strptime(review["작성일"], "%Y.%m.%d"),
+                "리뷰제목": review["리뷰제목"],
+                "리뷰본문": f"{review['리뷰본문']} {rng.choice(rare_words)}",
+            })
+        index.index_reviews(docs)
+    with index._connect() as conn:
+        conn.execute("INSERT INTO review_fts (review_fts) VALUES ('optimize')")
+    return index, rare_words[0], time.perf_counter() - start
+
+def time_query(index, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = index.search(limit=20, **params)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)], len(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search latency benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per query (p50 / p95 are reported).')
+    parser.add_argument('--max-candidates', type=int, default=0, help='Also measure the recency-biased mode with this cap.')
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    modes = [("exact", 0)] + ([(f"newest {args.max_candidates}", args.max_candidates)] if args.max_candidates else [])
+    print(f"{'reviews':>8} {'mode':<14} {'query':<22} {'p50 ms':>8} {'p95 ms':>8} {'hits':>5}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            index, rare_word, build_seconds = build_index(os.path.join(tmp, "search.db"), size)
+            print(f"{size:>8} indexed in {build_seconds:.1f}s")
+            for mode, max_candidates in modes:
+                index.max_candidates = max_candidates
+                for name, params in QUERIES.items():
+                    params = dict(params, query=params["query"] or rare_word)
+                    p50, p95, hits = time_query(index, params, args.repeat)
+                    print(f"{size:>8} {mode:<14} {name:<22} {p50:>8.1f} {p95:>8.1f} {hits:>5}")
@@ -0,0 +1,106 @@
+"""
+Startup (import time) benchmark per entry point.
+
+Each entry point's imports run in a fresh interpreter under `python -X importtime`;
+the report shows the median wall time of the process, the import time on top of a
+bare interpreter and the packages that time went to. Subcommands import their
+modules lazily, so each one lists the modules its function imports. "eager main.py"
+is the set main.py imported for every subcommand before; it also loaded the model
+libraries, measured on their own in the last row.
+
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    "main.py (--web-ui, --dashboard)": ["main"],
+    "main.py --enqueue": ["main", "src.db.database_handler", "src.db.task_queue"],
+    "main.py --build-reports": ["main", "src.db.database_handler", "src.report.report_engine"],
+    "main.py --worker": ["main", "src.crawler.coupang_crawler", "src.crawler.product_registry", "src.crawler.worker",
+                         "src.etl.transformer", "src.etl.near_duplicate", "src.db.database_handler",
+                         "src.search.review_search", "src.report.anomaly_detector"],
+    "main.py --crawl": ["main", "src.crawler.coupang_crawler", "src.crawler.product_registry", "src.etl.transformer",
+                        "src.etl.near_duplicate", "src.db.database_handler", "src.db.analytics", "src.ml.review_model",
+                        "src.ml.embedding_index", "src.report.report_generator", "src.report.anomaly_detector",
+                        "src.report.report_engine", "src.search.review_search", "src.utils.profiler"],
+    "eager main.py (all subcommand imports)": ["pandas", "src.crawler.coupang_crawler", "src.crawler.product_registry",
+                                               "src.crawler.worker", "src.crawler.scheduler", "src.etl.transformer",
+                                               "src.etl.near_duplicate", "src.etl.aspect_extractor", "src.db.database_handler",
+                                               "src.db.analytics", "src.db.task_queue", "src.ml.review_model",
+                                               "src.ml.embedding_index", "src.report.report_generator",
+                                               "src.report.anomaly_detector", "src.report.report_engine",
+                                               "src.search.review_search", "src.utils.profiler"],
+    "src/api/main.py": ["src.api.main"],
+    "src/dashboard/app.py": ["src.dashboard.app"],
+    "model libraries (torch, transformers)": ["torch", "transformers"],
+}
+
+def parse_importtime(stderr):
+    """[(module, self seconds)] from -X importtime output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        if self_us.strip().isdigit(): # skips the header line
+            modules.append((name.strip(), int(self_us) / 1e6))
+    return modules
+
+def measure(code, env):
+    """(wall seconds, [(module, self seconds)]) of one interpreter running code."""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                             capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        errors = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(errors[-1] if errors else f"exit code {process.returncode}")
+    return wall, parse_importtime(process.stderr)
+
+def by_package(modules, startup):
+    """{root package: self seconds} of the modules a bare interpreter does not load."""
+    packages = {}
+    for module, seconds in modules:
+        if module not in startup:
+            root = module.split(".")[0]
+            packages[root] = packages.get(root, 0.0) + seconds
+    return packages
+
+def run(repeat, top):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Entry points that open the database at import get a throwaway SQLite file
+        env = dict(os.environ, DB_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}", PYTHONPATH=ROOT)
+        startup = {module for module, _ in measure("pass", env)[1]}
+        results = {}
+        for name, modules in ENTRY_POINTS.items():
+            try:
+                runs = [measure("import " + ", ".join(modules), env) for _ in range(repeat)]
+            except RuntimeError as e:
+                results[name] = str(e)
+                continue
+            packages = [by_package(imported, startup) for _, imported in runs]
+            heaviest = sorted(packages[-1].items(), key=lambda item: -item[1])[:top]
+            results[name] = (statistics.median(wall for wall, _ in runs), statistics.median(sum(p.values()) for p in packages), heaviest)
+        return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time per entry point (python -X importtime)")
+    parser.add_argument('--repeat', type=int, default=3, help="Interpreter runs per entry point (median is reported).")
+    parser.add_argument('--top', type=int, default=5, help="Heaviest packages listed per entry point.")
+    args = parser.parse_args()
+
+    print(f"{'entry point':<40} {'wall s':>7} {'import s':>9}  heaviest packages (self time, s)")
+    for name, result in run(args.repeat, args.top).items():
+        if isinstance(result, str):
+            print(f"{name:<40} {'-':>7} {'-':>9}  unavailable: {result}")
+            continue
+        wall, imported, heaviest = result
+        print(f"{name:<40} {wall:>7.2f} {imported:>9.2f}  " + ", ".join(f"{module} {seconds:.2f}" for module, seconds in heaviest))
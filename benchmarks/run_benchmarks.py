@@ -0,0 +1,255 @@
+"""
+End-to-end pipeline benchmark.
+
+Runs each pipeline stage (crawler parsing on recorded fixtures with each parser backend, transform,
+insert_reviews, get_all_reviews, to_dataframe, analyze_sentiment,
+generate_summary_report, analytics snapshot and SQL reports) on a synthetic corpus against a local SQLite database
+(or any --db-url, e.g. a local MySQL) and writes wall time, CPU time, throughput
+and peak memory per stage to a JSON file. Pass --compare with an earlier result to see deltas.
+
+    python -m benchmarks.run_benchmarks --scale 10k
+    python -m benchmarks.run_benchmarks --scale 100k --compare benchmarks/results/previous.json
+    python -m benchmarks.run_benchmarks --parse-only       # parse throughput only
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from benchmarks.synthetic import SCALES, generate_reviews
+from src.crawler.html_parser import HtmlParser, BACKENDS
+from src.db.analytics import AnalyticsEngine
+from src.db.database_handler import DatabaseHandler
+from src.etl.transformer import ReviewTransformer
+from src.report.report_generator import ReportGenerator
+from src.utils.logger import logger
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+class RssSampler:
+    """
+    Samples the process resident set size from /proc in a background thread.
+    Far cheaper than tracemalloc, so stage timings stay representative.
+    """
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def available():
+        return os.path.exists("/proc/self/statm")
+
+    def _rss(self):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * self.PAGE_SIZE
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self.baseline = self.peak = self._rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Returns the peak RSS growth over the baseline, in bytes."""
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+        return self.peak - self.baseline
+
+class StageTimer:
+    def __init__(self, memory_mode="rss"):
+        if memory_mode == "rss" and not RssSampler.available():
+            memory_mode = "tracemalloc"
+        self.memory_mode = memory_mode
+        self.stages = {}
+
+    def run(self, name, items, func):
+        """Runs func() once and records its cost; items is the unit count for throughput."""
+        gc.collect()
+        sampler = None
+        if self.memory_mode == "rss":
+            sampler = RssSampler()
+            sampler.start()
+        elif self.memory_mode == "tracemalloc":
+            tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = func()
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        peak = None
+        if sampler:
+            peak = sampler.stop()
+        elif self.memory_mode == "tracemalloc":
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.stages[name] = {
+            "items": items,
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "items_per_s": round(items / wall, 1) if wall > 0 else None,
+            "peak_mem_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+        }
+        print(f"{name:<24} {items:>9} items {wall:>9.3f}s wall {cpu:>9.3f}s cpu "
+              f"{self.stages[name]['items_per_s'] or 0:>12.1f}/s {self.stages[name]['peak_mem_mb'] or 0:>9.1f} MB")
+        return result
+
+    def skip(self, name, reason):
+        self.stages[name] = {"skipped": reason}
+        print(f"{name:<24} skipped: {reason}")
+
+def run_parsers(timer, iterations):
+    search_html, detail_html, review_html = read_fixture("search_page.html"), read_fixture("product_detail.html"), read_fixture("review_page.html")
+    parsers = {name: HtmlParser(backend=name) for name in BACKENDS}
+    for name, parser in parsers.items():
+        suffix = "" if name == "lxml" else f"_{name}"
+        timer.run(f"parse_search_page{suffix}", iterations, lambda: [parser.parse_search_page(search_html) for _ in range(iterations)])
+        timer.run(f"parse_product_detail{suffix}", iterations, lambda: [parser.parse_product_detail(detail_html) for _ in range(iterations)])
+        timer.run(f"parse_review_articles{suffix}", iterations, lambda: [parser.parse_review_articles(review_html) for _ in range(iterations)])
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    size = SCALES.get(args.scale.lower()) or int(args.scale)
+    timer = StageTimer(memory_mode=args.memory)
+
+    run_parsers(timer, args.parse_iterations)
+    if args.parse_only:
+        return {"meta": run_meta(args, size, timer), "stages": timer.stages}
+
+    raw_reviews = generate_reviews(size, seed=args.seed)
+    transformer = ReviewTransformer()
+    transformed = timer.run("transform", size, lambda: transformer.transform(raw_reviews))
+    del raw_reviews
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_handler = DatabaseHandler(db_url=args.db_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        db_handler.create_tables()
+        timer.run("insert_reviews", size, lambda: [db_handler.insert_reviews(transformed[i:i + args.batch_size])
+                                                   for i in range(0, size, args.batch_size)])
+        del transformed
+        stored = timer.run("get_all_reviews", size, db_handler.get_all_reviews)
+        df = timer.run("to_dataframe", size, lambda: transformer.to_dataframe(stored))
+        del stored
+
+        if args.with_model:
+            try:
+                from src.ml.review_model import SentimentAnalyzer
+                analyzer = SentimentAnalyzer()
+                # The model loads lazily; load it outside the timed stage
+                if analyzer.sentiment_pipeline is None:
+                    raise ImportError("sentiment model could not be loaded")
+                texts = df['리뷰본문'].head(args.sentiment_sample).tolist()
+                labels = timer.run("analyze_sentiment", len(texts), lambda: analyzer.analyze_sentiment(texts))
+                df['sentiment_label'] = None
+                df.loc[df.index[:len(labels)], 'sentiment_label'] = [s['label'] if s else None for s in labels]
+            except ImportError as e:
+                timer.skip("analyze_sentiment", f"ML dependencies unavailable ({e})")
+        else:
+            timer.skip("analyze_sentiment", "pass --with-model to benchmark the transformer model")
+
+        report_generator = ReportGenerator()
+        timer.run("generate_summary_report", len(df), lambda: report_generator.generate_summary_report(df))
+
+        analytics_sql = AnalyticsEngine(db_handler, backend="sql")
+        timer.run("analytics_report_sql", size, lambda: report_generator.generate_summary_report_from_analytics(analytics_sql))
+        analytics_duckdb = AnalyticsEngine(db_handler, backend="duckdb", snapshot_dir=os.path.join(tmp, "analytics"))
+        if analytics_duckdb.backend == "duckdb":
+            timer.run("analytics_snapshot", size, analytics_duckdb.refresh)
+            timer.run("analytics_report_duckdb", size, lambda: report_generator.generate_summary_report_from_analytics(analytics_duckdb))
+        else:
+            timer.skip("analytics_snapshot", "duckdb is not installed")
+            timer.skip("analytics_report_duckdb", "duckdb is not installed")
+
+    return {"meta": run_meta(args, size, timer), "stages": timer.stages}
+
+def run_meta(args, size, timer):
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "scale": size,
+        "seed": args.seed,
+        "db": "custom" if args.db_url else "sqlite",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "memory_mode": timer.memory_mode,
+    }
+
+def compare(current, baseline_path, threshold):
+    """Prints per-stage deltas against a baseline file; returns the regressed stage names."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nComparison with {baseline_path} (revision {baseline['meta'].get('git_revision')}, scale {baseline['meta'].get('scale')}):")
+    if baseline['meta'].get('memory_mode') != current['meta']['memory_mode']:
+        print("  warning: runs used different memory probes; tracemalloc runs are much slower")
+    regressions = []
+    for name, stage in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if not before or "skipped" in stage or "skipped" in before:
+            continue
+        # Compare throughput so runs at different scales stay comparable
+        change = (stage["items_per_s"] - before["items_per_s"]) / before["items_per_s"] * 100 if before["items_per_s"] else 0.0
+        marker = ""
+        if change < -threshold:
+            marker = "  <-- slower"
+            regressions.append(name)
+        elif change > threshold:
+            marker = "  faster"
+        print(f"  {name:<24} {before['items_per_s']:>12.1f}/s -> {stage['items_per_s']:>12.1f}/s ({change:+.1f}%){marker}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coupang review pipeline benchmark")
+    parser.add_argument('--scale', default="10k", help="10k, 100k, 1m or an explicit review count.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db-url', help="SQLAlchemy URL of a database to benchmark instead of a temporary SQLite file.")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Reviews per insert_reviews call.")
+    parser.add_argument('--parse-iterations', type=int, default=50)
+    parser.add_argument('--parse-only', action='store_true', help="Only verify the parser fixtures and measure parse throughput.")
+    parser.add_argument('--with-model', action='store_true', help="Also benchmark SentimentAnalyzer (downloads the model).")
+    parser.add_argument('--sentiment-sample', type=int, default=1000, help="Reviews sent to the sentiment model.")
+    parser.add_argument('--memory', choices=["rss", "tracemalloc", "off"], default="rss",
+                        help="Peak-memory probe: sampled RSS growth (default), tracemalloc (exact Python allocations, much slower) or off.")
+    parser.add_argument('--output', help="Result file (default: benchmarks/results/<timestamp>_<scale>.json).")
+    parser.add_argument('--compare', help="Earlier result file to compare against.")
+    parser.add_argument('--regression-threshold', type=float, default=10.0, help="Percent throughput drop reported as a regression.")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = run(args)
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d_%H%M%S}_{args.scale}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.regression_threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,76 @@
+"""
+Synthetic Coupang review generator.
+
+Produces raw review dicts shaped exactly like CoupangCrawler.collect_review output
+(Korean keys, string values such as '48 명에게 도움 됨'), so benchmarks exercise
+the same ETL / DB / ML code paths as a real crawl.
+"""
+import random
+import datetime
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+BRANDS = ["삼성전자", "LG전자", "애플", "레노버", "ASUS", "HP", "MSI", "한성컴퓨터", "곰곰", "탐사", "코멧", "브랜드 정보 없음"]
+CATEGORIES = ["노트북", "무선 이어폰", "생수", "물티슈", "운동화", "전기포트", "캠핑의자", "기저귀", "샴푸", "모니터"]
+OPTIONS = ["색상: 블랙", "색상: 화이트", "용량: 500ml", "사이즈: 270", "수량: 1개", "구성: 본품+케이스"]
+HEADLINES = ["가성비 최고", "배송 빠르고 좋아요", "생각보다 별로예요", "재구매 의사 있어요", "만족합니다", "그냥 그래요", "선물용으로 좋아요", "품질이 아쉬워요"]
+SENTENCES = [
+    "배송이 하루 만에 와서 좋았어요.", "포장이 꼼꼼하게 되어 있었습니다.", "가격 대비 품질이 훌륭합니다.",
+    "사이즈가 생각보다 작아서 교환했어요.", "색상이 사진이랑 조금 달라요.", "냄새가 좀 나서 며칠 환기시켰어요.",
+    "아이가 너무 좋아하네요.", "마감이 조금 아쉽지만 쓸만합니다.", "설명서가 없어서 조립이 어려웠어요.",
+    "배터리가 생각보다 오래 갑니다.", "소음이 거의 없어서 밤에도 쓰기 좋아요.", "박스가 찌그러져서 왔어요.",
+    "부모님 선물로 드렸는데 만족하세요.", "두 번째 구매입니다.", "할인할 때 사서 이득 본 느낌이에요.",
+    "고객센터 응대가 친절했어요.", "한 달 정도 써보고 리뷰 남깁니다.", "디자인이 깔끔하고 예뻐요.",
+]
+SURVEYS = {
+    "배송 속도": ["아주 빨라요", "보통이에요", "느려요"],
+    "사이즈": ["잘 맞아요", "작아요", "커요"],
+    "품질": ["기대 이상이에요", "보통이에요", "별로예요"],
+    "맛": ["아주 맛있어요", "괜찮아요", "생각보다 별로예요"],
+}
+SURNAMES = "김이박최정강조윤장임한오서신권황안송류홍"
+
+def make_products(n_products, rng):
+    products = []
+    for i in range(n_products):
+        category = rng.choice(CATEGORIES)
+        brand = rng.choice(BRANDS)
+        products.append({
+            "상품명": f"{brand} {category} {rng.choice(['프로', '라이트', '플러스', '베이직', '2024년형'])} {i}",
+            "브랜드": brand,
+            "가격": f"{rng.randint(3, 2500) * 1000:,}원",
+            "쿠팡상품번호": f"{8000000000 + i} - {20000000000 + i}",
+            "옵션": "; ".join(rng.sample(OPTIONS, 2)),
+        })
+    return products
+
+def generate_reviews(n, seed=0, n_products=None):
+    """
+    Returns n raw review dicts spread over n_products products (default: ~200 reviews per product).
+    The same seed always yields the same corpus, so runs are comparable.
+    """
+    rng = random.Random(seed)
+    products = make_products(n_products or max(1, n // 200), rng)
+    start_date = datetime.date(2023, 1, 1)
+    reviews = []
+    for i in range(n):
+        product = rng.choice(products)
+        rating = rng.choices([1, 2, 3, 4, 5], weights=[5, 5, 10, 25, 55])[0]
+        images = "; ".join(f"https://img1a.coupangcdn.com/image/review/{i}_{j}.jpg" for j in range(rng.choice([0, 0, 0, 1, 2, 3])))
+        survey = "; ".join(f"{question}: {rng.choice(answers)}" for question, answers in rng.sample(sorted(SURVEYS.items()), rng.randint(0, 2)))
+        review = dict(product)
+        review.update({
+            "리뷰제목": rng.choice(HEADLINES),
+            "리뷰본문": " ".join(rng.choices(SENTENCES, k=rng.randint(1, 6))),
+            "리뷰페이지": rng.randint(1, 10),
+            "작성자": f"{rng.choice(SURNAMES)}*{rng.choice(SURNAMES)}",
+            "평점": str(rating),
+            "작성일": (start_date + datetime.timedelta(days=rng.randint(0, 650))).strftime("%Y.%m.%d"),
+            "판매자": rng.choice(["쿠팡", "판매자: 쿠팡", "(주)셀러"]),
+            "실제구매상품명": f"{product['상품명']}, {rng.choice(OPTIONS)}",
+            "이미지들": images,
+            "설문응답": survey,
+            "도움수": f"{rng.randint(0, 120)} 명에게 도움 됨" if rng.random() < 0.3 else "",
+        })
+        reviews.append(review)
+    return reviews
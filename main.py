@@ -1,64 +1,139 @@
 import argparse
+import datetime
 import subprocess
+import uuid
 import sys
 import os
-import pandas as pd
 
-from src.crawler.coupang_crawler import CoupangCrawler
-from src.etl.transformer import ReviewTransformer
-from src.db.database_handler import DatabaseHandler
-from src.ml.review_model import SentimentAnalyzer
-from src.report.report_generator import ReportGenerator
+# Only lightweight modules are imported here. Each subcommand imports what it needs
+# (crawler: selenium / bs4, ML: torch / transformers, reports: pandas / duckdb), so
+# --web-ui and --dashboard start their subprocess without loading any of them.
+from src.config import Config
 from src.utils.logger import logger
 
-def run_pipeline(keyword, pages):
+def add_sentiment_labels(db_handler, all_reviews_df):
+    """
+    Scores reviews that have no stored sentiment yet and persists the new labels,
+    so reviews and their aspect postings are only analyzed once.
+    """
+    from src.ml.review_model import SentimentAnalyzer
+    from src.utils import metrics
+
+    if all_reviews_df.empty or '리뷰본문' not in all_reviews_df.columns:
+        logger.info("No review content column found or DataFrame is empty for ML analysis.")
+        return all_reviews_df
+
+    if 'sentiment_label' not in all_reviews_df.columns:
+        all_reviews_df['sentiment_label'] = None
+    # Filter out empty review content and already-scored reviews before sending to ML model
+    with_content = all_reviews_df[all_reviews_df['리뷰본문'].astype(bool)]
+    pending = with_content[with_content['sentiment_label'].isnull()]
+    # Stored labels are reused instead of re-running the model
+    metrics.record_cache("sentiment_labels", hits=len(with_content) - len(pending), misses=len(pending))
+    if pending.empty:
+        logger.info("No new review content to analyze sentiment.")
+        return all_reviews_df
+
+    sentiment_analyzer = SentimentAnalyzer()
+    sentiments = sentiment_analyzer.analyze_sentiment(pending['리뷰본문'].tolist())
+    new_labels = {review_id: s['label'] for review_id, s in zip(pending['id'], sentiments) if s is not None and 'label' in s}
+    if not new_labels:
+        logger.warning("Sentiment analysis returned no valid results.")
+        return all_reviews_df
+
+    all_reviews_df['sentiment_label'] = all_reviews_df['sentiment_label'].fillna(all_reviews_df['id'].map(new_labels))
+    db_handler.update_sentiments(new_labels)
+    logger.info("ML sentiment analysis completed and added to DataFrame.")
+    return all_reviews_df
+
+def run_pipeline(keyword, pages, profiler=None):
+    from src.crawler.coupang_crawler import CoupangCrawler
+    from src.crawler.product_registry import ProductRegistry, drop_stored_reviews
+    from src.etl.transformer import ReviewTransformer
+    from src.db.database_handler import DatabaseHandler
+    from src.report.report_engine import ReportEngine
+    from src.utils.profiler import StageProfiler
+
     logger.info(f"Starting full pipeline for keyword: {keyword} (pages: {pages})")
-    
+    profiler = profiler or StageProfiler()
+
     db_handler = DatabaseHandler()
     db_handler.create_tables()
+    embedding_indexer = _register_hooks(db_handler)
+
+    # 1-3. Crawling, ETL and saving to DB, product by product: the registry marks a product
+    # crawled only after its reviews are stored, so a failed insert or a crash leaves it due
+    transformer = ReviewTransformer()
+
+    def store(product_key, reviews):
+        reviews = drop_stored_reviews(db_handler, product_key, reviews)
+        if reviews:
+            db_handler.insert_reviews(transformer.transform(reviews))
+        return reviews
 
-    # 1. Crawling
-    crawler = CoupangCrawler()
-    raw_reviews = crawler.search_products_and_crawl_reviews(keyword, pages=pages)
-    logger.info(f"Finished crawling. Collected {len(raw_reviews)} raw reviews.")
+    crawler = CoupangCrawler(registry=ProductRegistry(db_handler))
+    with profiler.stage("crawl"):
+        raw_reviews = crawler.search_products_and_crawl_reviews(keyword, pages=pages, store=store)
+    logger.info(f"Finished crawling. Collected and stored {len(raw_reviews)} reviews.")
 
     if not raw_reviews:
-        logger.warning("No reviews collected. Skipping ETL, ML, and Reporting.")
+        logger.warning("No reviews collected. Skipping ML and Reporting.")
         return
 
-    # 2. ETL
-    transformer = ReviewTransformer()
-    transformed_reviews = transformer.transform(raw_reviews)
-    logger.info(f"Finished ETL. Transformed {len(transformed_reviews)} reviews.")
-
-    # 3. Save to DB
-    db_handler.insert_reviews(transformed_reviews)
-    logger.info("Reviews inserted into database.")
-
     # 4. ML Analysis
-    all_reviews_df = transformer.to_dataframe(db_handler.get_all_reviews())
-    if not all_reviews_df.empty and '리뷰본문' in all_reviews_df.columns:
-        sentiment_analyzer = SentimentAnalyzer()
-        # Filter out empty review content before sending to ML model
-        non_empty_reviews = all_reviews_df[all_reviews_df['리뷰본문'].astype(bool)]['리뷰본문'].tolist()
-        if non_empty_reviews:
-            sentiments = sentiment_analyzer.analyze_sentiment(non_empty_reviews)
-            # Add sentiment labels to the DataFrame
-            sentiment_map = {text: s['label'] for text, s in zip(non_empty_reviews, sentiments)}
-            all_reviews_df['sentiment_label'] = all_reviews_df['리뷰본문'].map(sentiment_map)
-            logger.info("ML sentiment analysis completed and added to DataFrame.")
-        else:
-            logger.info("No review content to analyze sentiment.")
-    else:
-        logger.info("No review content column found or DataFrame is empty for ML analysis.")
+    with profiler.stage("read_back"):
+        all_reviews_df = transformer.to_dataframe(db_handler.get_all_reviews())
+    with profiler.stage("inference"):
+        all_reviews_df = add_sentiment_labels(db_handler, all_reviews_df)
 
     # 5. Report Generation
-    report_generator = ReportGenerator()
-    summary_report = report_generator.generate_summary_report(all_reviews_df)
+    with profiler.stage("report"):
+        summary_report = generate_report(db_handler, embedding_indexer, all_reviews_df)
+        ReportEngine(db_handler).build() # only products with new reviews are rebuilt
     logger.info("\n" + "="*50 + "\nSummary Report:\n" + summary_report + "\n" + "="*50)
 
     logger.info("Full pipeline execution completed successfully.")
 
+def generate_report(db_handler, embedding_indexer, all_reviews_df):
+    from src.db.analytics import AnalyticsEngine
+    from src.ml.embedding_index import find_complaint_themes
+    from src.report.report_generator import ReportGenerator
+
+    analytics = AnalyticsEngine(db_handler)
+    analytics.refresh()
+    report_generator = ReportGenerator()
+    return report_generator.generate_summary_report_from_analytics(
+        analytics,
+        aspect_counts=db_handler.get_aspect_counts(),
+        complaint_themes=find_complaint_themes(embedding_indexer.store, all_reviews_df),
+        alerts=db_handler.get_alerts(limit=10),
+        survey_distribution=db_handler.get_survey_distribution()
+    )
+
+def _register_hooks(db_handler, embeddings=True):
+    """
+    Keeps the full-text index, near-duplicate clusters, embedding index (with embeddings)
+    and anomaly alerts current on every insert; anomalies are also re-checked on sentiment updates.
+    Returns the EmbeddingIndexer, or None without embeddings.
+    """
+    from src.etl.near_duplicate import NearDuplicateDetector
+    from src.report.anomaly_detector import AnomalyDetector
+    from src.search.review_search import ReviewSearchIndex
+
+    db_handler.add_insert_hook(ReviewSearchIndex().index_reviews)
+    db_handler.add_insert_hook(NearDuplicateDetector(db_handler).process_reviews)
+    embedding_indexer = None
+    if embeddings:
+        from src.ml.review_model import ReviewEmbedder
+        from src.ml.embedding_index import EmbeddingIndexer
+
+        embedding_indexer = EmbeddingIndexer(ReviewEmbedder())
+        db_handler.add_insert_hook(embedding_indexer.index_reviews)
+    detector = AnomalyDetector(db_handler)
+    db_handler.add_insert_hook(detector.process_reviews)
+    db_handler.add_sentiment_hook(detector.process_sentiments)
+    return embedding_indexer
+
 def start_web_ui():
     logger.info("Starting Flask Web UI...")
     project_root = os.path.dirname(os.path.abspath(__file__))
@@ -97,43 +172,42 @@ def start_dashboard():
     except Exception as e:
         logger.error(f"Failed to start Streamlit Dashboard: {e}")
 
-def import_csv_to_db(csv_file_path):
+def import_csv_to_db(csv_file_path, profiler=None):
+    import pandas as pd
+    from src.etl.transformer import ReviewTransformer
+    from src.db.database_handler import DatabaseHandler
+    from src.report.report_engine import ReportEngine
+    from src.utils.profiler import StageProfiler
+
     logger.info(f"Importing data from CSV: {csv_file_path}")
+    profiler = profiler or StageProfiler()
     try:
-        df = pd.read_csv(csv_file_path)
-        # Convert DataFrame to list of dictionaries for transformer
-        raw_reviews = df.to_dict(orient='records')
+        with profiler.stage("read_csv"):
+            df = pd.read_csv(csv_file_path)
+            # Convert DataFrame to list of dictionaries for transformer
+            raw_reviews = df.to_dict(orient='records')
 
         db_handler = DatabaseHandler()
         db_handler.create_tables()
+        embedding_indexer = _register_hooks(db_handler)
 
         transformer = ReviewTransformer()
-        transformed_reviews = transformer.transform(raw_reviews)
+        with profiler.stage("etl"):
+            transformed_reviews = transformer.transform(raw_reviews)
 
-        db_handler.insert_reviews(transformed_reviews)
+        with profiler.stage("insert"):
+            db_handler.insert_reviews(transformed_reviews)
         logger.info(f"Successfully imported {len(transformed_reviews)} reviews from CSV to database.")
 
         # Optionally run ML analysis and report generation after import
-        all_reviews_df = transformer.to_dataframe(db_handler.get_all_reviews())
-        if not all_reviews_df.empty and '리뷰본문' in all_reviews_df.columns:
-            sentiment_analyzer = SentimentAnalyzer()
-            non_empty_reviews = all_reviews_df[all_reviews_df['리뷰본문'].astype(bool)]['리뷰본문'].tolist()
-            if non_empty_reviews:
-                sentiments = sentiment_analyzer.analyze_sentiment(non_empty_reviews)
-                if sentiments: # Check if sentiments is not None or empty
-                    # Add sentiment labels to the DataFrame, filtering out None sentiments
-                    sentiment_map = {text: s['label'] for text, s in zip(non_empty_reviews, sentiments) if s is not None and 'label' in s}
-                    all_reviews_df['sentiment_label'] = all_reviews_df['리뷰본문'].map(sentiment_map)
-                    logger.info("ML sentiment analysis completed and added to DataFrame.")
-                else:
-                    logger.warning("Sentiment analysis returned no valid results.")
-            else:
-                logger.info("No review content to analyze sentiment.")
-        else:
-            logger.info("No review content column found or DataFrame is empty for ML analysis.")
-
-        report_generator = ReportGenerator()
-        summary_report = report_generator.generate_summary_report(all_reviews_df)
+        with profiler.stage("read_back"):
+            all_reviews_df = transformer.to_dataframe(db_handler.get_all_reviews())
+        with profiler.stage("inference"):
+            all_reviews_df = add_sentiment_labels(db_handler, all_reviews_df)
+
+        with profiler.stage("report"):
+            summary_report = generate_report(db_handler, embedding_indexer, all_reviews_df)
+            ReportEngine(db_handler).build()
         logger.info("\n" + "="*50 + "\nSummary Report:\n" + summary_report + "\n" + "="*50)
 
     except FileNotFoundError:
@@ -141,6 +215,151 @@ def import_csv_to_db(csv_file_path):
     except Exception as e:
         logger.error(f"Error importing CSV to DB: {e}")
 
+def run_worker(max_tasks=None, exit_when_idle=False):
+    from src.crawler.coupang_crawler import CoupangCrawler
+    from src.crawler.product_registry import ProductRegistry
+    from src.crawler.worker import CrawlWorker
+    from src.etl.transformer import ReviewTransformer
+    from src.db.database_handler import DatabaseHandler
+    from src.utils import metrics
+
+    db_handler = DatabaseHandler()
+    db_handler.create_tables()
+    _register_hooks(db_handler, embeddings=False)
+    # Product leases expire with the task lease, so a task retried after a dead worker is not skipped
+    crawler = CoupangCrawler(registry=ProductRegistry(db_handler, lease_minutes=Config.WORKER_LEASE_SECONDS / 60))
+    worker = CrawlWorker(db_handler, crawler, ReviewTransformer())
+    with logger.contextualize(job_id=worker.worker_id):
+        worker.run(max_tasks=max_tasks, exit_when_idle=exit_when_idle)
+    logger.info("\n" + metrics.summary())
+
+def enqueue_keyword(keyword, pages):
+    from src.db.database_handler import DatabaseHandler
+    from src.db.task_queue import TaskQueue
+
+    db_handler = DatabaseHandler()
+    db_handler.create_tables()
+    queue = TaskQueue(db_handler)
+    if queue.enqueue_keyword(keyword, pages):
+        logger.info(f"Queued keyword '{keyword}' ({pages} pages) for the crawl workers.")
+    else:
+        logger.info(f"Keyword '{keyword}' is already queued or being crawled.")
+    logger.info(f"Queue: {queue.stats()}")
+
+def run_scheduler(once=False):
+    from src.crawler.scheduler import CrawlScheduler
+    from src.db.database_handler import DatabaseHandler
+    from src.utils import metrics
+
+    db_handler = DatabaseHandler()
+    db_handler.create_tables()
+    CrawlScheduler(db_handler).run(once=once)
+    logger.info("\n" + metrics.summary())
+
+def update_watchlist(keyword=None, product_link=None, unwatch=None, pages=1):
+    from src.crawler.scheduler import CrawlScheduler
+    from src.db.database_handler import DatabaseHandler
+
+    db_handler = DatabaseHandler()
+    db_handler.create_tables()
+    scheduler = CrawlScheduler(db_handler)
+    if keyword:
+        scheduler.watch_keyword(keyword, pages)
+        logger.info(f"Watching keyword '{keyword}' ({pages} pages).")
+    if product_link:
+        try:
+            scheduler.watch_product(product_link)
+            logger.info(f"Watching product {product_link}.")
+        except ValueError as e:
+            logger.error(f"Cannot watch product: {e}")
+    if unwatch:
+        logger.info(f"Removed {db_handler.remove_watch(unwatch)} watchlist entries for '{unwatch}'.")
+    for entry in db_handler.get_watchlist():
+        logger.info(f"  {entry['kind']:<8} {entry['target']} (last scheduled {entry['last_scheduled_at'] or '-'})")
+
+def rebuild_search_index():
+    from src.etl.transformer import ReviewTransformer
+    from src.db.database_handler import DatabaseHandler
+    from src.search.review_search import ReviewSearchIndex
+
+    logger.info("Rebuilding full-text search index from the database...")
+    db_handler = DatabaseHandler()
+    indexed = ReviewSearchIndex().rebuild(db_handler, ReviewTransformer())
+    logger.info(f"Search index rebuilt with {indexed} reviews.")
+
+def detect_duplicates():
+    from src.etl.near_duplicate import NearDuplicateDetector
+    from src.db.database_handler import DatabaseHandler
+
+    logger.info("Checking stored reviews for near-duplicates...")
+    db_handler = DatabaseHandler()
+    db_handler.create_tables()
+    duplicates = NearDuplicateDetector(db_handler).backfill()
+    logger.info(f"Near-duplicate backfill completed. {duplicates} duplicates flagged.")
+
+def build_reports(force=False):
+    from src.db.database_handler import DatabaseHandler
+    from src.report.report_engine import ReportEngine
+
+    db_handler = DatabaseHandler()
+    db_handler.create_tables()
+    engine = ReportEngine(db_handler)
+    built = engine.build(force=force)
+    logger.info(f"Reports in {engine.output_dir}: {built['products']} product and {built['keywords']} keyword reports built, {built['skipped']} up to date.")
+
+def rebuild_rollups():
+    from src.db.database_handler import DatabaseHandler
+    from src.report.anomaly_detector import AnomalyDetector
+
+    logger.info("Rebuilding review rollups from the database...")
+    db_handler = DatabaseHandler()
+    db_handler.create_tables()
+    buckets = db_handler.rebuild_rollups()
+    alerts = AnomalyDetector(db_handler).check(since=datetime.datetime.min)
+    logger.info(f"Review rollups rebuilt: {buckets} buckets, {alerts} new anomaly alerts.")
+
+def backfill_review_details():
+    from src.etl.aspect_extractor import parse_survey, parse_images
+    from src.db.database_handler import DatabaseHandler
+
+    logger.info("Converting stored survey responses and image lists into their tables...")
+    db_handler = DatabaseHandler()
+    db_handler.create_tables()
+    answers, images = db_handler.backfill_review_details(parse_survey, parse_images)
+    logger.info(f"Backfill completed: {answers} survey answers, {images} images. Run --build-reports --force to refresh the reports.")
+
+def reparse_archive(product_keys=None):
+    from src.crawler.page_archive import PageArchive, reparse_archive as reparse
+    from src.etl.transformer import ReviewTransformer
+    from src.db.database_handler import DatabaseHandler
+    from src.report.report_engine import ReportEngine
+
+    logger.info(f"Re-parsing archived pages from {Config.PAGE_ARCHIVE_DIR}...")
+    db_handler = DatabaseHandler()
+    db_handler.create_tables()
+    # No embedding hook: the re-parse stays CPU-bound; --build-embeddings backfills the new reviews
+    _register_hooks(db_handler, embeddings=False)
+    archive = PageArchive()
+    try:
+        _, _, inserted = reparse(db_handler, ReviewTransformer(), archive=archive, product_keys=product_keys) # counts are logged by reparse
+    finally:
+        archive.close()
+    if inserted:
+        ReportEngine(db_handler).build()
+        logger.info("Run --build-embeddings to embed the re-parsed reviews.")
+
+def build_embeddings():
+    from src.db.database_handler import DatabaseHandler
+    from src.ml.review_model import ReviewEmbedder
+    from src.ml.embedding_index import EmbeddingIndexer
+
+    logger.info("Embedding stored reviews that are not in the embedding store yet...")
+    db_handler = DatabaseHandler()
+    embedding_indexer = EmbeddingIndexer(ReviewEmbedder())
+    added = embedding_indexer.backfill(db_handler)
+    embedding_indexer.store.train_ivf()
+    logger.info(f"Embedding backfill completed. {added} reviews embedded.")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Coupang Review Analysis System")
@@ -150,19 +369,77 @@ if __name__ == "__main__":
     parser.add_argument('--web-ui', action='store_true', help='Start the Flask web UI.')
     parser.add_argument('--dashboard', action='store_true', help='Start the Streamlit dashboard.')
     parser.add_argument('--import-csv', type=str, help='Path to a CSV file to import into the database.')
+    parser.add_argument('--rebuild-search-index', action='store_true', help='Rebuild the full-text search index from the database.')
+    parser.add_argument('--detect-duplicates', action='store_true', help='Flag near-duplicate reviews among stored reviews not checked yet.')
+    parser.add_argument('--profile', nargs='?', const='auto', choices=['auto', 'cprofile', 'sampling'],
+                        help='With --crawl or --import-csv: profile each stage (CPU + tracemalloc) into PROFILE_DIR. '
+                             'auto uses the pyinstrument sampling profiler when installed, otherwise cProfile.')
+    parser.add_argument('--enqueue', action='store_true', help='Queue --keyword (and --pages) as a crawl task for the distributed workers.')
+    parser.add_argument('--worker', action='store_true', help='Run a crawl worker that leases tasks from the shared crawl_tasks table.')
+    parser.add_argument('--max-tasks', type=int, help='With --worker: stop after this many tasks.')
+    parser.add_argument('--exit-when-idle', action='store_true', help='With --worker: stop when no task is available instead of polling.')
+    parser.add_argument('--scheduler', action='store_true', help='Run the watchlist scheduler that queues recurring crawls for the workers.')
+    parser.add_argument('--once', action='store_true', help='With --scheduler: run one scheduling pass and exit.')
+    parser.add_argument('--watch-keyword', type=str, help='Add a keyword (with --pages) to the scheduler watchlist.')
+    parser.add_argument('--watch-product', type=str, help='Add a product link to the scheduler watchlist.')
+    parser.add_argument('--unwatch', type=str, help='Remove a keyword or product key from the scheduler watchlist.')
+    parser.add_argument('--rebuild-rollups', action='store_true', help='Recompute the daily/weekly review rollups and re-run the anomaly checks.')
+    parser.add_argument('--backfill-review-details', action='store_true', help='Convert stored survey responses and image lists into the review_survey_answers / review_images tables.')
+    parser.add_argument('--build-reports', action='store_true', help='Write per-product and per-keyword HTML/JSON/Parquet reports for products with new reviews.')
+    parser.add_argument('--force', action='store_true', help='With --build-reports: rebuild every report.')
+    parser.add_argument('--build-embeddings', action='store_true', help='Embed stored reviews missing from the embedding store and retrain its ANN index.')
+    parser.add_argument('--reparse', nargs='*', metavar='PRODUCT_KEY',
+                        help='Rebuild reviews from the raw page archive (PAGE_ARCHIVE_DIR) with the current parser and store the missing ones; '
+                             'optionally only the given product keys.')
 
     args = parser.parse_args()
+    if not (args.web_ui or args.dashboard):
+        Config.validate() # no longer run at import; the web UI subprocess validates its own environment
 
     if args.crawl:
         if not args.keyword:
             parser.error("--keyword is required when --crawl is used.")
-        run_pipeline(args.keyword, args.pages)
+        from src.utils import metrics
+        from src.utils.profiler import StageProfiler
+        profiler = StageProfiler(enabled=bool(args.profile), mode=args.profile or "auto")
+        with logger.contextualize(job_id=uuid.uuid4().hex[:12]):
+            run_pipeline(args.keyword, args.pages, profiler=profiler)
+            logger.info("\n" + metrics.summary())
+            profiler.write_summary()
     elif args.import_csv:
-        import_csv_to_db(args.import_csv)
+        from src.utils.profiler import StageProfiler
+        profiler = StageProfiler(enabled=bool(args.profile), mode=args.profile or "auto")
+        with logger.contextualize(job_id=uuid.uuid4().hex[:12]):
+            import_csv_to_db(args.import_csv, profiler=profiler)
+            profiler.write_summary()
+    elif args.enqueue:
+        if not args.keyword:
+            parser.error("--keyword is required when --enqueue is used.")
+        enqueue_keyword(args.keyword, args.pages)
+    elif args.worker:
+        run_worker(max_tasks=args.max_tasks, exit_when_idle=args.exit_when_idle)
+    elif args.scheduler:
+        run_scheduler(once=args.once)
+    elif args.watch_keyword or args.watch_product or args.unwatch:
+        update_watchlist(args.watch_keyword, args.watch_product, args.unwatch, args.pages)
     elif args.web_ui:
         start_web_ui()
     elif args.dashboard:
         start_dashboard()
+    elif args.rebuild_search_index:
+        rebuild_search_index()
+    elif args.detect_duplicates:
+        detect_duplicates()
+    elif args.rebuild_rollups:
+        rebuild_rollups()
+    elif args.backfill_review_details:
+        backfill_review_details()
+    elif args.build_reports:
+        build_reports(force=args.force)
+    elif args.build_embeddings:
+        build_embeddings()
+    elif args.reparse is not None:
+        reparse_archive(args.reparse or None)
     else:
-        print("Please specify an action: --crawl, --import-csv, --web-ui, or --dashboard.")
+        print("Please specify an action: --crawl, --enqueue, --worker, --scheduler, --watch-keyword, --watch-product, --import-csv, --web-ui, --dashboard, --rebuild-search-index, --detect-duplicates, --rebuild-rollups, --backfill-review-details, --build-reports, --build-embeddings, or --reparse.")
         parser.print_help()
\ No newline at end of file
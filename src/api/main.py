@@ -1,18 +1,38 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 from src.crawler.coupang_crawler import CoupangCrawler
+from src.crawler.product_registry import ProductRegistry, drop_stored_reviews
 from src.etl.transformer import ReviewTransformer
+from src.etl.near_duplicate import NearDuplicateDetector
+from src.report.anomaly_detector import AnomalyDetector
 from src.db.database_handler import DatabaseHandler
+from src.db.async_reader import AsyncReviewReader
 from src.ml.review_model import SentimentAnalyzer
+from src.search.review_search import ReviewSearchIndex
+from src.ml.embedding_index import EmbeddingStore
+from src.config import Config
 from src.utils.logger import logger
+from src.utils import metrics
+import datetime
 import threading
+import uuid
 import os
 
 app = Flask(__name__)
 
-crawler = CoupangCrawler()
 transformer = ReviewTransformer()
 db_handler = DatabaseHandler()
-sentiment_analyzer = SentimentAnalyzer() # Initialize sentiment analyzer
+crawler = CoupangCrawler(registry=ProductRegistry(db_handler)) # concurrent /crawl jobs share the product leases
+sentiment_analyzer = SentimentAnalyzer() # the model is loaded by the first /crawl job, not at startup
+search_index = ReviewSearchIndex()
+db_handler.add_insert_hook(search_index.index_reviews) # Keep the full-text index current on insert
+db_handler.add_insert_hook(NearDuplicateDetector(db_handler).process_reviews) # Flag copy-pasted reviews on insert
+anomaly_detector = AnomalyDetector(db_handler)
+db_handler.add_insert_hook(anomaly_detector.process_reviews) # Rating / sentiment / volume anomalies from the rollups
+db_handler.add_sentiment_hook(anomaly_detector.process_sentiments)
+embedding_store = EmbeddingStore() # Read-only here; reviews are embedded by the batch pipeline
+async_reader = AsyncReviewReader() # Read endpoints use the async engine; crawl threads keep the sync pool
+
+Config.validate()
 
 # Ensure database tables exist on startup
 try:
@@ -34,37 +54,46 @@ def crawl_and_analyze():
 
     logger.info(f"Received request to crawl for keyword: {keyword} (pages: {pages})")
 
+    job_id = uuid.uuid4().hex[:12]
+
+    @logger.contextualize(job_id=job_id)
     def run_pipeline():
         try:
+            def store(product_key, reviews):
+                # Runs per product before the registry marks it crawled
+                reviews = drop_stored_reviews(db_handler, product_key, reviews)
+                if reviews:
+                    with logger.contextualize(stage="etl"):
+                        transformed_reviews = transformer.transform(reviews)
+                    with logger.contextualize(stage="insert"):
+                        db_handler.insert_reviews(transformed_reviews)
+                return reviews
+
             logger.info(f"Starting crawling for '{keyword}'...")
-            raw_reviews = crawler.search_products_and_crawl_reviews(keyword, pages=pages)
-            logger.info(f"Finished crawling. Collected {len(raw_reviews)} raw reviews.")
+            with logger.contextualize(stage="crawl"):
+                raw_reviews = crawler.search_products_and_crawl_reviews(keyword, pages=pages, store=store)
+            logger.info(f"Finished crawling. Collected and stored {len(raw_reviews)} reviews.")
 
             if not raw_reviews:
-                logger.warning("No reviews collected. Skipping ETL and ML.")
+                logger.warning("No reviews collected. Skipping ML.")
                 return
 
-            logger.info("Starting ETL process...")
-            transformed_reviews = transformer.transform(raw_reviews)
-            logger.info(f"Finished ETL. Transformed {len(transformed_reviews)} reviews.")
-
-            logger.info("Inserting reviews into database...")
-            db_handler.insert_reviews(transformed_reviews)
-            logger.info("Reviews inserted into database.")
-
             # Fetch reviews from DB for ML analysis (including newly added ones)
             all_reviews_df = transformer.to_dataframe(db_handler.get_all_reviews())
             
             if not all_reviews_df.empty and '리뷰본문' in all_reviews_df.columns:
                 logger.info("Starting ML sentiment analysis...")
-                # Only analyze reviews that don't have sentiment yet or re-analyze all
-                reviews_to_analyze = all_reviews_df[all_reviews_df['리뷰본문'].astype(bool)]['리뷰본문'].tolist()
-                if reviews_to_analyze:
-                    sentiments = sentiment_analyzer.analyze_sentiment(reviews_to_analyze)
-                    # Update sentiment in DataFrame (this part needs to be handled carefully if updating DB)
-                    # For simplicity, we'll assume sentiment is added to the DataFrame for dashboard use
-                    # and not persisted back to DB in this basic setup.
-                    # In a real app, you'd update the DB with sentiment results.
+                # Only analyze reviews that don't have a stored sentiment yet
+                with_content = all_reviews_df[all_reviews_df['리뷰본문'].astype(bool)]
+                pending = with_content
+                if 'sentiment_label' in pending.columns:
+                    pending = pending[pending['sentiment_label'].isnull()]
+                metrics.record_cache("sentiment_labels", hits=len(with_content) - len(pending), misses=len(pending))
+                if not pending.empty:
+                    sentiments = sentiment_analyzer.analyze_sentiment(pending['리뷰본문'].tolist())
+                    # Persist labels so the aspect index and dashboard can use them
+                    new_labels = {review_id: s['label'] for review_id, s in zip(pending['id'], sentiments) if s is not None and 'label' in s}
+                    db_handler.update_sentiments(new_labels)
                     logger.info("ML sentiment analysis completed.")
                 else:
                     logger.info("No review content to analyze sentiment.")
@@ -80,7 +109,97 @@ def crawl_and_analyze():
     thread = threading.Thread(target=run_pipeline)
     thread.start()
 
-    return jsonify({'status': 'success', 'message': 'Crawling and analysis started in background.'}), 202
+    return jsonify({'status': 'success', 'message': 'Crawling and analysis started in background.', 'job_id': job_id}), 202
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.export_metrics()
+    return Response(body, content_type=content_type)
+
+def _read(method_name, *args, **kwargs):
+    """Runs a read query on the async engine, or on the sync handler when no async driver is installed."""
+    if async_reader.available:
+        return async_reader.call(getattr(async_reader, method_name), *args, **kwargs)
+    return getattr(db_handler, method_name)(*args, **kwargs)
+
+def _serialize_review(review):
+    """Makes a review dict from DatabaseHandler JSON-safe."""
+    serialized = {}
+    for key, value in review.items():
+        if key.startswith('_'):
+            continue
+        serialized[key] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return serialized
+
+@app.route('/aspects', methods=['GET'])
+def aspect_counts():
+    product_id = request.args.get('product_id')
+    return jsonify({'status': 'success', 'aspects': _read('get_aspect_counts', product_id=product_id)})
+
+@app.route('/aspects/<aspect>/reviews', methods=['GET'])
+def aspect_reviews(aspect):
+    product_id = request.args.get('product_id')
+    sentiment = request.args.get('sentiment')
+    limit = request.args.get('limit', 50, type=int)
+    reviews = _read('get_aspect_reviews', aspect, product_id=product_id, sentiment=sentiment, limit=min(limit, 500))
+    return jsonify({'status': 'success', 'aspect': aspect, 'reviews': [_serialize_review(r) for r in reviews]})
+
+@app.route('/alerts', methods=['GET'])
+def review_alerts():
+    since = request.args.get('since')
+    try:
+        since = datetime.datetime.strptime(since, '%Y-%m-%d') if since else None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'since must be YYYY-MM-DD.'}), 400
+    period = request.args.get('period')
+    if period not in (None, 'day', 'week'):
+        return jsonify({'status': 'error', 'message': 'period must be day or week.'}), 400
+    alerts = _read('get_alerts', product_name=request.args.get('product'), period=period, since=since,
+                   limit=min(request.args.get('limit', 50, type=int), 500))
+    return jsonify({'status': 'success', 'alerts': [_serialize_review(alert) for alert in alerts]})
+
+@app.route('/survey', methods=['GET'])
+def survey_distribution():
+    # Precomputed per-product answer counts (survey_answer_counts); reviews are not scanned
+    distribution = _read('get_survey_distribution', product_name=request.args.get('product'), question=request.args.get('question'))
+    return jsonify({'status': 'success', 'distribution': distribution})
+
+@app.route('/reviews/<int:review_id>/images', methods=['GET'])
+def review_images(review_id):
+    images = _read('get_review_images', [review_id])
+    return jsonify({'status': 'success', 'review_id': review_id, 'images': images.get(review_id, [])})
+
+@app.route('/search', methods=['GET'])
+def search_reviews():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'status': 'error', 'message': 'Query parameter q is required.'}), 400
+
+    results = search_index.search(
+        query,
+        product_id=request.args.get('product_id'),
+        min_rating=request.args.get('min_rating', type=float),
+        max_rating=request.args.get('max_rating', type=float),
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to'),
+        limit=min(request.args.get('limit', 20, type=int), 200),
+        offset=request.args.get('offset', 0, type=int)
+    )
+    scores = {r['review_id']: r['score'] for r in results}
+    reviews = _read('get_reviews_by_ids', [r['review_id'] for r in results])
+    hits = [dict(_serialize_review(review), score=scores[review['id']]) for review in reviews]
+    return jsonify({'status': 'success', 'query': query, 'results': hits})
+
+@app.route('/reviews/<int:review_id>/similar', methods=['GET'])
+def similar_reviews(review_id):
+    k = min(request.args.get('k', 10, type=int), 100)
+    neighbours = embedding_store.similar_to(review_id, k=k)
+    if not neighbours and review_id not in embedding_store:
+        return jsonify({'status': 'error', 'message': f'No embedding stored for review {review_id}.'}), 404
+    similarities = dict(neighbours)
+    reviews = _read('get_reviews_by_ids', [neighbour_id for neighbour_id, _ in neighbours])
+    results = [dict(_serialize_review(review), similarity=similarities[review['id']]) for review in reviews]
+    return jsonify({'status': 'success', 'review_id': review_id, 'results': results})
 
 if __name__ == '__main__':
     # Create a templates directory for Flask
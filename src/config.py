@@ -6,10 +6,31 @@ load_dotenv()
 
 class Config:
     # Database Configuration
+    DB_BACKEND = os.getenv("DB_BACKEND", "mysql") # mysql (OLTP ingest) or sqlite (embedded, no server needed)
+    DB_URL = os.getenv("DB_URL") # full SQLAlchemy URL, overrides DB_BACKEND
     DB_HOST = os.getenv("DB_HOST", "localhost")
     DB_USER = os.getenv("DB_USER", "root")
     DB_PASSWORD = os.getenv("DB_PASSWORD")
     DB_NAME = os.getenv("DB_NAME", "coupang_reviews")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "data/coupang_reviews.db")
+
+    # Connection pool (shared per process by src/db/engine_registry.py)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30")) # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # below MySQL wait_timeout so idle connections never go stale
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # Analytical reads (report / dashboard aggregations)
+    ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "duckdb") # duckdb (Parquet snapshots) or sql (primary database)
+    ANALYTICS_SNAPSHOT_DIR = os.getenv("ANALYTICS_SNAPSHOT_DIR", "data/analytics")
+    ANALYTICS_ID_OVERLAP = int(os.getenv("ANALYTICS_ID_OVERLAP", "1000")) # ids below the high-water mark re-checked for late commits
+    ANALYTICS_LABEL_OVERLAP_SECONDS = int(os.getenv("ANALYTICS_LABEL_OVERLAP_SECONDS", "120")) # updated_at re-read window for late commits
+    ANALYTICS_LABEL_MAX_PARTS = int(os.getenv("ANALYTICS_LABEL_MAX_PARTS", "32")) # label parts before they are compacted into one
+
+    # Dashboard delta refresh (only reviews inserted / updated since the last refresh are loaded)
+    DASHBOARD_REFRESH_SECONDS = int(os.getenv("DASHBOARD_REFRESH_SECONDS", "60")) # minimum age before a rerun checks for new reviews
+    DASHBOARD_REFRESH_OVERLAP_SECONDS = int(os.getenv("DASHBOARD_REFRESH_OVERLAP_SECONDS", "120")) # re-read window for late commits / clock skew
 
     # Proxy Configuration
     PROXY_HOST = os.getenv("PROXY_HOST")
@@ -19,18 +40,111 @@ class Config:
     # Scraping Browser WebDriver
     SBR_WEBDRIVER_AUTH = os.getenv("SBR_WEBDRIVER_AUTH")
 
+    # Crawler pacing (AIMD limiter), retries and circuit breaker
+    CRAWL_INITIAL_DELAY = float(os.getenv("CRAWL_INITIAL_DELAY", "2.0")) # seconds between requests at start
+    CRAWL_MIN_DELAY = float(os.getenv("CRAWL_MIN_DELAY", "0.5"))
+    CRAWL_MAX_DELAY = float(os.getenv("CRAWL_MAX_DELAY", "30"))
+    CRAWL_LATENCY_TARGET = float(os.getenv("CRAWL_LATENCY_TARGET", "3.0")) # slower responses lower the rate
+    CRAWL_REQUEST_TIMEOUT = float(os.getenv("CRAWL_REQUEST_TIMEOUT", "30"))
+    CRAWL_MAX_RETRIES = int(os.getenv("CRAWL_MAX_RETRIES", "4"))
+    CRAWL_BACKOFF_BASE = float(os.getenv("CRAWL_BACKOFF_BASE", "1.0"))
+    CRAWL_BACKOFF_CAP = float(os.getenv("CRAWL_BACKOFF_CAP", "60"))
+    CRAWL_BREAKER_WINDOW = int(os.getenv("CRAWL_BREAKER_WINDOW", "20")) # recent requests considered
+    CRAWL_BREAKER_THRESHOLD = float(os.getenv("CRAWL_BREAKER_THRESHOLD", "0.5")) # blocked share that opens the circuit
+    CRAWL_BREAKER_COOLDOWN = float(os.getenv("CRAWL_BREAKER_COOLDOWN", "120"))
+    CRAWL_BREAKER_MAX_TRIPS = int(os.getenv("CRAWL_BREAKER_MAX_TRIPS", "3")) # consecutive trips before the crawl stops
+
+    # On-disk cache of search / product detail pages
+    HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+    HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "data/http_cache.db")
+    HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "512")) # compressed size cap, LRU eviction above it
+    HTTP_CACHE_TTL_SEARCH = int(os.getenv("HTTP_CACHE_TTL_SEARCH", str(6 * 3600))) # seconds
+    HTTP_CACHE_TTL_DETAIL = int(os.getenv("HTTP_CACHE_TTL_DETAIL", str(24 * 3600)))
+
+    # Raw page archive (search / detail / review page snapshots) for offline re-parsing (main.py --reparse)
+    PAGE_ARCHIVE_ENABLED = os.getenv("PAGE_ARCHIVE_ENABLED", "false").lower() == "true"
+    PAGE_ARCHIVE_DIR = os.getenv("PAGE_ARCHIVE_DIR", "data/page_archive")
+    PAGE_ARCHIVE_SEGMENT_MB = int(os.getenv("PAGE_ARCHIVE_SEGMENT_MB", "256")) # append-only segment file size
+    PAGE_ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("PAGE_ARCHIVE_COMPRESSION_LEVEL", "6")) # zlib 1-9
+    PAGE_ARCHIVE_REPARSE_WORKERS = int(os.getenv("PAGE_ARCHIVE_REPARSE_WORKERS", "0")) # parse processes, 0 = one per CPU
+    PAGE_ARCHIVE_REPARSE_BATCH = int(os.getenv("PAGE_ARCHIVE_REPARSE_BATCH", "2000")) # reviews per transform / insert batch
+
+    # HTML parsing: lxml (C parser, needs cssselect) or bs4 (pure-Python html.parser)
+    PARSER_BACKEND = os.getenv("PARSER_BACKEND", "lxml")
+    PARSER_SELECTORS_PATH = os.getenv("PARSER_SELECTORS_PATH") # 기본값: src/crawler/selectors.json
+
+    # Product registry: skip products crawled within PRODUCT_FRESH_HOURS, crawl only new reviews
+    # within PRODUCT_FULL_RECRAWL_DAYS, otherwise crawl everything again
+    PRODUCT_FRESH_HOURS = float(os.getenv("PRODUCT_FRESH_HOURS", "24"))
+    PRODUCT_FULL_RECRAWL_DAYS = float(os.getenv("PRODUCT_FULL_RECRAWL_DAYS", "30"))
+    PRODUCT_CRAWL_LEASE_MINUTES = float(os.getenv("PRODUCT_CRAWL_LEASE_MINUTES", "30")) # 동시 작업 간 상품 점유 시간
+
+    # Distributed crawl workers (main.py --worker)
+    WORKER_LEASE_SECONDS = int(os.getenv("WORKER_LEASE_SECONDS", "300")) # visibility timeout of a leased task
+    WORKER_HEARTBEAT_SECONDS = int(os.getenv("WORKER_HEARTBEAT_SECONDS", "60"))
+    WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "5")) # idle wait between lease attempts
+    WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+
+    # Watchlist crawl scheduler (main.py --scheduler): products are recrawled once about
+    # SCHEDULER_TARGET_NEW_REVIEWS new reviews are expected, within the interval bounds
+    SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", "300"))
+    SCHEDULER_BROWSER_MINUTES_PER_DAY = float(os.getenv("SCHEDULER_BROWSER_MINUTES_PER_DAY", "600")) # 하루 브라우저 사용 예산
+    SCHEDULER_TARGET_NEW_REVIEWS = float(os.getenv("SCHEDULER_TARGET_NEW_REVIEWS", "10"))
+    SCHEDULER_MIN_INTERVAL_HOURS = float(os.getenv("SCHEDULER_MIN_INTERVAL_HOURS", "1")) # hot products
+    SCHEDULER_MAX_INTERVAL_HOURS = float(os.getenv("SCHEDULER_MAX_INTERVAL_HOURS", "168")) # stale products (weekly)
+    SCHEDULER_VELOCITY_DAYS = int(os.getenv("SCHEDULER_VELOCITY_DAYS", "14")) # window for reviews per day
+    SCHEDULER_KEYWORD_INTERVAL_HOURS = float(os.getenv("SCHEDULER_KEYWORD_INTERVAL_HOURS", "24")) # new product discovery
+    SCHEDULER_DEFAULT_CRAWL_SECONDS = float(os.getenv("SCHEDULER_DEFAULT_CRAWL_SECONDS", "180")) # budget charge before a product's first crawl
+
+    # ETL: optional JSON file ({"aspect": ["keyword", ...]}) overriding the default aspect lexicon
+    ASPECT_LEXICON_PATH = os.getenv("ASPECT_LEXICON_PATH")
+
+    # Rollup anomaly alerts (review_rollups -> review_alerts)
+    ANOMALY_BASELINE_PERIODS = int(os.getenv("ANOMALY_BASELINE_PERIODS", "14")) # previous days (weeks) a bucket is compared with
+    ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3.0"))
+    ANOMALY_MIN_REVIEWS = int(os.getenv("ANOMALY_MIN_REVIEWS", "5")) # buckets with fewer reviews are never flagged
+    ANOMALY_MIN_BASELINE = int(os.getenv("ANOMALY_MIN_BASELINE", "3")) # baseline buckets with reviews needed
+    ANOMALY_MIN_COUNT_EXCESS = int(os.getenv("ANOMALY_MIN_COUNT_EXCESS", "5")) # reviews above the baseline mean a burst needs
+
+    # Per-product / per-keyword reports (main.py --build-reports)
+    REPORT_DIR = os.getenv("REPORT_DIR", "data/reports")
+    REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "0")) # render processes, 0 = one per CPU
+
+    # Full-text search sidecar (SQLite FTS5 file)
+    SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "data/search_index.db")
+    SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "20000")) # rank only the newest N matches (recency-biased); 0: exact BM25 top-k
+
+    # Near-duplicate (MinHash-LSH) detection
+    NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", "128"))
+    NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", "32")) # 32 bands x 4 rows: pairs at 0.8 similarity become candidates >99.9% of the time
+    NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+    NEAR_DUP_SHINGLE_SIZE = int(os.getenv("NEAR_DUP_SHINGLE_SIZE", "4"))
+    NEAR_DUP_MIN_CHARS = int(os.getenv("NEAR_DUP_MIN_CHARS", "20")) # shorter reviews ('좋아요') are never flagged
+
+    # Review embeddings (semantic search / complaint themes)
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "snunlp/KR-SBERT-V40K-klueNLI-augSTS")
+    EMBEDDING_DIR = os.getenv("EMBEDDING_DIR", "data/embeddings")
+    EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float16") # float16 or int8
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    EMBEDDING_IVF_LISTS = int(os.getenv("EMBEDDING_IVF_LISTS", "256"))
+    EMBEDDING_IVF_MIN_ROWS = int(os.getenv("EMBEDDING_IVF_MIN_ROWS", "20000")) # brute force below this size
+    EMBEDDING_NPROBE = int(os.getenv("EMBEDDING_NPROBE", "8"))
+
+    # main.py --profile output (one sub-directory per run)
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
     @classmethod
     def validate(cls):
         required_vars = [
-            "DB_PASSWORD",
             "PROXY_HOST",
             "PROXY_USERNAME",
             "PROXY_PASSWORD",
             "SBR_WEBDRIVER_AUTH"
         ]
+        if cls.DB_BACKEND == "mysql" and not cls.DB_URL:
+            required_vars.append("DB_PASSWORD")
         missing_vars = [var for var in required_vars if getattr(cls, var) is None]
         if missing_vars:
             logger.error(f"Missing required environment variables: {', '.join(missing_vars)}. Please check your .env file.")
             # sys.exit(1) # Uncomment to exit if critical variables are missing
-
-Config.validate()
+        return not missing_vars
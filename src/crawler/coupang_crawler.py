@@ -4,18 +4,39 @@ import warnings
 from selenium.webdriver import Remote, ChromeOptions
 from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+import datetime
+import functools
 import time
-import random
 import re
-from src.utils.logger import logger
+import uuid
+from src.utils.logger import logger, sample
+from src.utils import metrics
 from src.config import Config
+from src.crawler.rate_control import RateController, CircuitOpenError, backoff_delay, is_block_page
+from src.crawler.http_cache import HttpCache
+from src.crawler.page_archive import PageArchive, SEARCH, DETAIL, REVIEW
+from src.crawler.product_registry import SKIP, INCREMENTAL
+from src.crawler.html_parser import default_parser
+from src.etl.records import ProductInfo, record_from_article, review_key
+
+REVIEW_ARTICLE_SELECTOR = "article.sdp-review__article__list.js_reviewArticleReviewList"
+NO_REVIEW_SELECTOR = ".sdp-review__article__no-review"
+NEWEST_SORT_SELECTOR = ".js_reviewArticleNewListBtn"
 
 warnings.filterwarnings("ignore", category=requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
 class CoupangCrawler:
-    def __init__(self):
+    def __init__(self, registry=None):
         self.proxies = self._setup_proxies()
         self.sbr_webdriver_url = self._setup_sbr_webdriver_url()
+        self.webdriver_commands = 0
+        self.rate_control = RateController() # pacing, retries and circuit breaking for every request
+        self.http_cache = HttpCache() if Config.HTTP_CACHE_ENABLED else None
+        self.page_archive = PageArchive() if Config.PAGE_ARCHIVE_ENABLED else None # raw pages for main.py --reparse
+        self.registry = registry # ProductRegistry; without one every product is crawled fully
+        self.parser = default_parser() # selectors: src/crawler/selectors.json
 
     def _setup_proxies(self):
         if not all([Config.PROXY_HOST, Config.PROXY_USERNAME, Config.PROXY_PASSWORD]):
@@ -37,42 +58,80 @@ class CoupangCrawler:
         try:
             sbr_connection = ChromiumRemoteConnection(self.sbr_webdriver_url, 'goog', 'chrome')
             driver = Remote(sbr_connection, options=ChromeOptions())
+            self._instrument_driver(driver)
             logger.info("Selenium driver connected successfully.")
             return driver
         except Exception as e:
             logger.error(f"Failed to connect Selenium driver: {e}")
             return None
 
-    def collect_review(self, driver, link, product_info):
+    def _instrument_driver(self, driver):
+        # Every WebDriver round trip (driver and WebElement calls alike) goes through driver.execute
+        execute = driver.execute
+        def counted_execute(driver_command, params=None):
+            self.webdriver_commands += 1
+            metrics.WEBDRIVER_COMMANDS.labels(command=driver_command).inc()
+            return execute(driver_command, params)
+        driver.execute = counted_execute
+
+    def collect_review(self, driver, link, product_info, plan=None, crawl_id=None):
+        commands_before = self.webdriver_commands
+        start = time.perf_counter()
+        try:
+            reviews_data = self._collect_review(driver, link, product_info, plan, crawl_id)
+        finally:
+            metrics.PRODUCT_CRAWL_SECONDS.observe(time.perf_counter() - start)
+            metrics.WEBDRIVER_CALLS_PER_PRODUCT.observe(self.webdriver_commands - commands_before)
+        metrics.REVIEWS_COLLECTED.inc(len(reviews_data))
+        return reviews_data
+
+    def _collect_review(self, driver, link, product_info, plan=None, crawl_id=None):
+        """
+        Collects a product's reviews page by page. With an incremental plan the list is
+        sorted newest first and collection stops at the first review older than plan.since;
+        reviews already stored (plan.known_keys) are skipped.
+        With the page archive enabled every review page is archived under crawl_id.
+        A page that fails to load (timeout, block page, review tab missing or not clickable)
+        raises, so the product is retried and never recorded as crawled with no reviews.
+        """
         logger.info(f"[리뷰 수집 시작] {link}")
         reviews_data = []
-        try:
-            driver.get(link)
-            time.sleep(random.uniform(2, 3))
-        except Exception as e:
-            logger.error(f"페이지 로드 실패: {e}")
-            return reviews_data
+        incremental = plan is not None and plan.mode == INCREMENTAL
+        product_key = plan.product_key if plan is not None else None
+        self.rate_control.run(lambda: driver.get(link), "product", is_blocked=lambda: is_block_page(driver.title))
 
-        try:
-            review_tab = driver.find_element(By.XPATH, "//a[contains(text(),'상품평')]")
-            review_text = review_tab.text.strip()
-            match = re.search(r'\((\d+)\)', review_text)
-            review_count = int(match.group(1)) if match else 0
-            logger.info(f"상품평 총 {review_count}개")
-            review_tab.click()
-            time.sleep(random.uniform(2, 3))
-        except Exception as e:
-            logger.warning(f"상품평 탭 클릭 실패 또는 상품평 없음: {e}")
-            return reviews_data
+        # 상품평 탭이 없거나 클릭/로딩에 실패하면 예외를 그대로 올려 재시도 (상품평 0개는 아래에서 확인)
+        review_tab = driver.find_element(By.XPATH, "//a[contains(text(),'상품평')]")
+        review_text = review_tab.text.strip()
+        match = re.search(r'\((\d+)\)', review_text)
+        review_count = int(match.group(1)) if match else 0
+        logger.info(f"상품평 총 {review_count}개")
+        self.rate_control.run(review_tab.click, "review_page")
+        self._wait_for_reviews(driver)
 
         try:
-            empty_text_elements = driver.find_elements(By.CSS_SELECTOR, ".sdp-review__article__no-review")
+            empty_text_elements = driver.find_elements(By.CSS_SELECTOR, NO_REVIEW_SELECTOR)
             if empty_text_elements and "등록된 상품평이 없습니다" in empty_text_elements[0].text:
                 logger.info("등록된 상품평이 없습니다.")
                 return reviews_data
         except:
             pass
 
+        if incremental:
+            try:
+                sort_btn = driver.find_element(By.CSS_SELECTOR, NEWEST_SORT_SELECTOR)
+                old_reviews = driver.find_elements(By.CSS_SELECTOR, REVIEW_ARTICLE_SELECTOR)
+                self.rate_control.run(lambda: driver.execute_script("arguments[0].click();", sort_btn), "review_page")
+                if old_reviews:
+                    WebDriverWait(driver, Config.CRAWL_REQUEST_TIMEOUT).until(EC.staleness_of(old_reviews[0]))
+                self._wait_for_reviews(driver)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                # Without newest-first order the date cut-off is unsafe; fall back to a full pass
+                logger.warning(f"최신순 정렬 실패, 전체 수집으로 전환: {e}")
+                incremental = False
+
         try:
             total_pages = len(driver.find_elements(By.CSS_SELECTOR, ".js_reviewArticlePageBtn"))
             if total_pages == 0: # Handle case where there's only one page and no page buttons
@@ -82,117 +141,218 @@ class CoupangCrawler:
 
         page_num = 1
         review_index = 1
+        reached_known = False
+        product = ProductInfo(*product_info) # 상품 정보는 리뷰마다 복사하지 않고 공유
 
         while page_num <= total_pages:
-            time.sleep(random.uniform(1.5, 2.5))
-            reviews = driver.find_elements(By.CSS_SELECTOR, "article.sdp-review__article__list.js_reviewArticleReviewList")
+            reviews = driver.find_elements(By.CSS_SELECTOR, REVIEW_ARTICLE_SELECTOR)
 
             if not reviews:
                 logger.info(f"No reviews found on page {page_num}. Breaking loop.")
                 break
 
-            for review in reviews:
-                try:
-                    headline = review.find_element(By.CSS_SELECTOR, ".sdp-review__article__list__headline").text.strip()
-                except: headline = ""
-                try:
-                    content = review.find_element(By.CSS_SELECTOR, ".sdp-review__article__list__review__content.js_reviewArticleContent").text.strip()
-                except: content = ""
-                try:
-                    author = review.find_element(By.CSS_SELECTOR, ".sdp-review__article__list__info__user__name").text.strip()
-                except: author = ""
-                try:
-                    rating = review.find_element(By.CSS_SELECTOR, ".sdp-review__article__list__info__product-info__star-orange").get_attribute("data-rating")
-                except: rating = ""
-                try:
-                    date = review.find_element(By.CSS_SELECTOR, ".sdp-review__article__list__info__product-info__reg-date").text.strip()
-                except: date = ""
-                try:
-                    seller = review.find_element(By.CSS_SELECTOR, ".sdp-review__article__list__info__product-info__seller_name").text.strip()
-                except: seller = ""
-                try:
-                    real_product = review.find_element(By.CSS_SELECTOR, ".sdp-review__article__list__info__product-info__name").text.strip()
-                except: real_product = ""
-                try:
-                    img_tags = review.find_elements(By.CSS_SELECTOR, ".sdp-review__article__list__attachment__img")
-                    image_urls = [img.get_attribute("data-origin-path") for img in img_tags]
-                    images = "; ".join(image_urls)
-                except: images = ""
-                try:
-                    survey_blocks = review.find_elements(By.CSS_SELECTOR, ".sdp-review__article__list__survey__row")
-                    surveys = [f"{b.find_element(By.CLASS_NAME, 'sdp-review__article__list__survey__row__question').text.strip()}: {b.find_element(By.CLASS_NAME, 'sdp-review__article__list__survey__row__answer').text.strip()}" for b in survey_blocks]
-                    survey_text = "; ".join(surveys)
-                except: survey_text = ""
-                try:
-                    helpful_text = review.find_element(By.CSS_SELECTOR, ".sdp-review__article__list__help__count").text.strip()
-                except: helpful_text = ""
-
-                review_data = {
-                    "상품명": product_info[0],
-                    "브랜드": product_info[1],
-                    "가격": product_info[2],
-                    "쿠팡상품번호": product_info[3],
-                    "옵션": product_info[4],
-                    "리뷰제목": headline,
-                    "리뷰본문": content,
-                    "리뷰페이지": page_num,
-                    "작성자": author,
-                    "평점": rating,
-                    "작성일": date,
-                    "판매자": seller,
-                    "실제구매상품명": real_product,
-                    "이미지들": images,
-                    "설문응답": survey_text,
-                    "도움수": helpful_text
-                }
+            # One page_source read per page instead of ~12 WebDriver round trips per review
+            html = driver.page_source
+            self._archive(REVIEW, link, html, product_key=product_key, page=page_num, crawl_id=crawl_id,
+                          meta={"product_info": list(product_info)})
+            for parsed in self.parser.parse_review_articles(html):
+                headline, content, author, date = parsed["headline"], parsed["content"], parsed["author"], parsed["date"]
+                rating = parsed["rating"]
+                if incremental:
+                    try:
+                        review_date = datetime.datetime.strptime(date, '%Y.%m.%d')
+                    except ValueError:
+                        review_date = None
+                    if review_date is not None and review_date < plan.since:
+                        reached_known = True
+                        break
+                    if review_key(author, headline, date, content) in plan.known_keys:
+                        continue
+
+                review_data = record_from_article(parsed, product, page_num, product_key)
                 reviews_data.append(review_data)
-                logger.info(f"[{review_index}] {headline} / {content}")
+                # Hot loop: sampled, and the review text itself is never logged
+                if sample("crawler.review"):
+                    logger.debug(f"[{review_index}] page {page_num}, rating {rating}, {len(content)} chars: {headline[:40]}")
                 review_index += 1
 
             page_num += 1
+            if reached_known:
+                logger.info(f"{plan.since:%Y.%m.%d} 이전 리뷰에 도달, 증분 수집 종료")
+                break
             if page_num > total_pages:
                 break
 
             try:
                 next_btn = driver.find_element(By.CSS_SELECTOR, f".js_reviewArticlePageBtn[data-page='{page_num}']")
-                driver.execute_script("arguments[0].click();", next_btn)
+                self.rate_control.run(lambda: driver.execute_script("arguments[0].click();", next_btn), "review_page")
+                # The page swaps the article list in place; wait for the old one to go
+                WebDriverWait(driver, Config.CRAWL_REQUEST_TIMEOUT).until(EC.staleness_of(reviews[0]))
+                self._wait_for_reviews(driver)
+            except CircuitOpenError:
+                raise
             except Exception as e:
                 logger.info(f"{page_num} 페이지 버튼 클릭 실패 또는 마지막 페이지: {e}")
                 break
         return reviews_data
 
-    def search_products_and_crawl_reviews(self, keyword, pages=1):
+    def _fetch_page(self, url, page_type, latency_histogram):
+        """GETs a search or detail page through the HTTP cache (when enabled) and the rate controller."""
+        def fetcher(fetch_url, headers=None):
+            with metrics.timed(latency_histogram):
+                return self.rate_control.fetch(fetch_url, page_type, headers=headers or {}, proxies=self.proxies, verify=False)
+        if self.http_cache is None:
+            return fetcher(url)
+        return self.http_cache.fetch(url, page_type, fetcher)
+
+    def _archive(self, page_type, url, html, **index):
+        """Adds a fetched page to the page archive (when enabled); an archive failure never fails the crawl."""
+        if self.page_archive is None or not html:
+            return
+        try:
+            self.page_archive.add(page_type, url, html, **index)
+        except Exception as e:
+            logger.error(f"Failed to archive {page_type} page {url}: {e}")
+
+    def _collect_with_retry(self, driver, link, product_info, plan=None, crawl_id=None):
+        """
+        Retries a product whose review collection raised (a load timeout, a block page,
+        a dropped browser session) with backoff.
+        """
+        for attempt in range(self.rate_control.max_retries + 1):
+            try:
+                return self.collect_review(driver, link, product_info, plan, crawl_id)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if attempt == self.rate_control.max_retries:
+                    # Raised, not an empty list: crawl_product then releases the product instead of completing it
+                    logger.error(f"상품 리뷰 수집 실패: {e}")
+                    raise
+                delay = backoff_delay(attempt)
+                metrics.CRAWL_RETRIES.labels(page_type="product").inc()
+                logger.warning(f"상품 리뷰 수집 오류 ({e}); retry {attempt + 1}/{self.rate_control.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _wait_for_reviews(self, driver):
+        """Waits (instead of a fixed sleep) until review articles or the no-review notice are rendered."""
+        WebDriverWait(driver, Config.CRAWL_REQUEST_TIMEOUT).until(EC.any_of(
+            EC.presence_of_element_located((By.CSS_SELECTOR, REVIEW_ARTICLE_SELECTOR)),
+            EC.presence_of_element_located((By.CSS_SELECTOR, NO_REVIEW_SELECTOR)),
+        ))
+
+    @staticmethod
+    def parse_search_page(html):
+        """
+        Extracts (상품명, 가격, 링크) tuples from a search result page.
+        Returns None when the page has no product units at all (end of results).
+        """
+        return default_parser().parse_search_page(html)
+
+    @staticmethod
+    def parse_product_detail(html):
+        """
+        Extracts (브랜드, 쿠팡상품번호, 옵션 문자열) from a product detail page.
+        """
+        return default_parser().parse_product_detail(html)
+
+    def crawl_search_page(self, keyword, page_num):
+        """
+        Fetches and parses one search result page. Returns (상품명, 가격, 링크) tuples,
+        None at the end of the results; request errors are raised.
+        """
+        logger.info(f"{page_num}페이지 상품 검색 중...")
+        url = f"https://www.coupang.com/np/search?component=&q={keyword}&page={page_num}&listSize=36"
+        try:
+            response = self._fetch_page(url, "search", metrics.SEARCH_PAGE_SECONDS)
+        except requests.exceptions.RequestException:
+            metrics.PAGE_FETCH_ERRORS.labels(page_type="search").inc()
+            raise
+        self._archive(SEARCH, url, response.text, keyword=keyword, page=page_num)
+        return self.parse_search_page(response.text)
+
+    def crawl_product(self, driver, product_key, name, price, link, store=None, fresh_hours=None):
+        """
+        Collects one product's reviews, consulting the registry (when set) for
+        skip / incremental / full. Returns the reviews, or None when skipped.
+        store(reviews), when given, runs before the product is marked crawled, so a
+        failure to store leaves it due for crawling again.
+        fresh_hours overrides PRODUCT_FRESH_HOURS (scheduled crawls of fast-moving products).
+        Errors are raised; the product's lease is released then.
+        """
+        logger.info(f"상품명: {name} | 가격: {price} | 링크: {link}")
+        plan = self.registry.acquire(product_key, fresh_hours=fresh_hours) if self.registry is not None else None
+        if plan is not None:
+            metrics.PRODUCT_CRAWL_PLANS.labels(mode=plan.mode).inc()
+            if plan.mode == SKIP:
+                logger.info(f"상품 {product_key} 건너뜀 ({plan.reason})")
+                return None
+
+        completed = False
+        browser_seconds = None
+        crawl_id = uuid.uuid4().hex # groups this pass's detail and review pages in the page archive
+        try:
+            try:
+                response = self._fetch_page(link, "detail", metrics.DETAIL_PAGE_SECONDS)
+            except requests.exceptions.RequestException:
+                metrics.PAGE_FETCH_ERRORS.labels(page_type="detail").inc()
+                raise
+            self._archive(DETAIL, link, response.text, product_key=product_key, crawl_id=crawl_id)
+            brand, product_id, option_str = self.parse_product_detail(response.text)
+            product_info = [name, brand, price, product_id, option_str]
+            with logger.contextualize(product_id=product_id):
+                started = time.perf_counter()
+                product_reviews = self._collect_with_retry(driver, link, product_info, plan, crawl_id)
+                browser_seconds = time.perf_counter() - started
+                logger.info(f"{len(product_reviews)}개 리뷰 수집 완료" + (f" ({plan.mode})" if plan is not None else ""))
+            if store is not None:
+                product_reviews = store(product_reviews)
+            completed = True
+            return product_reviews
+        finally:
+            if plan is not None:
+                if completed:
+                    self.registry.complete(product_key, plan.mode, browser_seconds=browser_seconds)
+                else:
+                    self.registry.release(product_key)
+
+    def close(self, driver):
+        driver.quit()
+        logger.info("Selenium driver closed.")
+        if self.http_cache is not None:
+            logger.info(self.http_cache.report())
+        if self.page_archive is not None:
+            logger.info(self.page_archive.report())
+
+    def search_products_and_crawl_reviews(self, keyword, pages=1, store=None):
+        """
+        Searches keyword and collects the reviews of every product found. store(product_key,
+        reviews), when given, stores each product's reviews before the registry marks it
+        crawled (see crawl_product) and returns the reviews it stored; those are returned.
+        """
         all_reviews = []
         product_links = []
 
         for page_num in range(1, pages + 1):
-            logger.info(f"{page_num}페이지 상품 검색 중...")
-            url = f"https://www.coupang.com/np/search?component=&q={keyword}&page={page_num}&listSize=36"
             try:
-                response = requests.get(url, proxies=self.proxies, verify=False)
-                response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
+                page_links = self.crawl_search_page(keyword, page_num)
+            except CircuitOpenError as e:
+                logger.error(f"{e} Keeping the {len(product_links)} product links found so far.")
+                break
             except requests.exceptions.RequestException as e:
                 logger.error(f"상품 검색 요청 실패: {e}")
                 continue
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            items = soup.select("[class = ProductUnit_productUnit__Qd6sv]")
-
-            if not items:
+            if page_links is None:
                 logger.info(f"No products found on page {page_num}. Stopping search.")
                 break
-
-            for item in items:
-                name_tag = item.select_one(".ProductUnit_productName__gre7e")
-                price_tag = item.select_one(".Price_priceValue__A4KOr")
-                if not (name_tag and price_tag and item.a and 'href' in item.a.attrs):
-                    continue
-                name_text = name_tag.text.strip()
-                price_text = price_tag.text.strip()
-                link = f"https://www.coupang.com{item.a['href']}"
-                product_links.append((name_text, price_text, link))
+            product_links.extend(page_links)
         
         logger.info(f"총 {len(product_links)}개 상품 링크 수집 완료")
+        if self.registry is not None:
+            products = self.registry.register(product_links, keyword)
+        else:
+            products = [(None, name, price, link) for name, price, link in product_links]
 
         driver = self._get_driver()
         if not driver:
@@ -200,47 +360,21 @@ class CoupangCrawler:
             return []
 
         try:
-            for name, price, link in product_links:
-                logger.info("=" * 80)
-                logger.info(f"상품명: {name}")
-                logger.info(f"가격: {price}")
-                logger.info(f"링크: {link}")
-
+            for product_key, name, price, link in products:
                 try:
-                    response = requests.get(link, proxies=self.proxies, verify=False)
-                    response.raise_for_status()
-                    soup = BeautifulSoup(response.text, "html.parser")
+                    product_store = functools.partial(store, product_key) if store is not None else None
+                    product_reviews = self.crawl_product(driver, product_key, name, price, link, store=product_store)
+                    all_reviews.extend(product_reviews or [])
+                except CircuitOpenError as e:
+                    logger.error(f"{e} Returning the {len(all_reviews)} reviews collected so far.")
+                    break
                 except requests.exceptions.RequestException as e:
                     logger.error(f"상세 페이지 요청 실패: {e}")
-                    continue
-
-                brand_tag = soup.select_one("div.twc-text-sm.twc-text-blue-600")
-                brand = brand_tag.text.strip() if brand_tag else "브랜드 정보 없음"
-
-                product_id = "없음"
-                option_list = []
-                spec_section = soup.select_one("div.product-description ul")
-                if spec_section:
-                    for li in spec_section.select("li"):
-                        text = li.text.strip()
-                        if ":" in text:
-                            key, value = text.split(":", 1)
-                            key, value = key.strip(), value.strip()
-                            if "쿠팡상품번호" in key:
-                                product_id = value
-                            else:
-                                option_list.append(f"{key}: {value}")
-                        else:
-                            option_list.append(text)
-
-                option_str = "; ".join(option_list)
-                product_info = [name, brand, price, product_id, option_str]
-
-                product_reviews = self.collect_review(driver, link, product_info)
-                all_reviews.extend(product_reviews)
+                except Exception as e:
+                    # Collection, parsing or store() failed for this product only; its lease was released
+                    logger.error(f"상품 {product_key or link} 처리 실패, 다음 상품으로 진행: {e}")
         finally:
-            driver.quit()
-            logger.info("Selenium driver closed.")
+            self.close(driver)
 
         return all_reviews
 
@@ -0,0 +1,221 @@
+import json
+import os
+import re
+import threading
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from src.config import Config
+from src.utils.logger import logger
+from src.utils import metrics
+
+try:
+    import lxml.etree
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError: # lxml / cssselect are optional; parsing falls back to BeautifulSoup
+    lxml = None
+
+DEFAULT_SELECTORS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "selectors.json")
+BASE_URL = "https://www.coupang.com"
+
+class LxmlBackend:
+    """libxml2 parser; CSS selectors are compiled to XPath once and reused."""
+    name = "lxml"
+
+    def __init__(self):
+        self._compiled = {}
+        self._text_parts = lxml.etree.XPath(".//text() | .//br")
+
+    def parse(self, html):
+        return lxml.html.fromstring(html)
+
+    def select(self, node, selector):
+        compiled = self._compiled.get(selector)
+        if compiled is None:
+            compiled = self._compiled[selector] = CSSSelector(selector)
+        return compiled(node)
+
+    def text(self, node):
+        # <br> becomes a line break like in the rendered text; the tree is left as it is,
+        # so repeated calls on a node or its ancestors return the same text
+        return "".join("\n" if getattr(part, "tag", None) == "br" else part for part in self._text_parts(node))
+
+    def attr(self, node, name):
+        return node.get(name)
+
+class SoupBackend:
+    """BeautifulSoup with the pure-Python html.parser (the original parser)."""
+    name = "bs4"
+
+    def parse(self, html):
+        return BeautifulSoup(html, "html.parser")
+
+    def select(self, node, selector):
+        return node.select(selector)
+
+    def text(self, node):
+        return node.get_text()
+
+    def attr(self, node, name):
+        return node.get(name)
+
+BACKENDS = {"lxml": LxmlBackend, "bs4": SoupBackend}
+
+def _clean(text):
+    return re.sub(r"[ \t\r\f\v]+", " ", text).strip() if text else ""
+
+class HtmlParser:
+    """
+    Parses search, product detail and review pages with selectors from a versioned
+    JSON config (src/crawler/selectors.json, or PARSER_SELECTORS_PATH).
+
+    Each field has a fallback chain of CSS selectors tried in order. A hit on a
+    fallback or a field no selector finds is counted (parser_selector_fallbacks /
+    parser_selector_misses) and logged once, so a Coupang redeploy shows up in the
+    metrics instead of as silently empty results; the fix is a config change.
+    """
+    def __init__(self, backend=None, selectors_path=None):
+        backend = backend or Config.PARSER_BACKEND
+        if backend == "lxml" and lxml is None:
+            logger.warning("lxml/cssselect is not installed. Parsing with BeautifulSoup instead.")
+            backend = "bs4"
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported PARSER_BACKEND: {backend}")
+        self.backend = BACKENDS[backend]()
+        self.selectors_path = selectors_path or Config.PARSER_SELECTORS_PATH or DEFAULT_SELECTORS_PATH
+        with open(self.selectors_path, encoding="utf-8") as f:
+            config = json.load(f)
+        self.version = config["version"]
+        self.fields = {page: {name: self._field_spec(spec) for name, spec in fields.items()}
+                       for page, fields in config["pages"].items()}
+        self._reported = set()
+        self._lock = threading.Lock()
+        logger.info(f"HtmlParser initialized with backend {self.backend.name}, selectors {self.version}")
+
+    @staticmethod
+    def _field_spec(spec):
+        if isinstance(spec, list):
+            spec = {"selectors": spec}
+        return {"selectors": spec["selectors"], "attr": spec.get("attr")}
+
+    def _report(self, page, field, kind, detail):
+        key = (page, field, kind, detail)
+        if kind == "fallback":
+            metrics.PARSER_SELECTOR_FALLBACKS.labels(page=page, field=field).inc()
+        else:
+            metrics.PARSER_SELECTOR_MISSES.labels(page=page, field=field).inc()
+        with self._lock:
+            if key in self._reported:
+                return
+            self._reported.add(key)
+        if kind == "fallback":
+            logger.warning(f"Selector drift ({self.version}): {page}.{field} matched fallback '{detail}'; update {self.selectors_path}.")
+        else:
+            logger.warning(f"Selector drift ({self.version}): no selector for {page}.{field} matched.")
+
+    def _nodes(self, node, page, field, required=True):
+        """Nodes matched by the first selector in the field's chain that matches anything."""
+        selectors = self.fields[page][field]["selectors"]
+        for index, selector in enumerate(selectors):
+            found = self.backend.select(node, selector)
+            if found:
+                if index:
+                    self._report(page, field, "fallback", selector)
+                return found
+        if required:
+            self._report(page, field, "miss", None)
+        return []
+
+    def _value(self, node, page, field, required=True):
+        """The field's text (or attribute) on the first match, '' when nothing matches."""
+        spec = self.fields[page][field]
+        found = self._nodes(node, page, field, required)
+        if not found:
+            return ""
+        if spec["attr"]:
+            return self.backend.attr(found[0], spec["attr"]) or ""
+        return _clean(self.backend.text(found[0]))
+
+    def parse_search_page(self, html):
+        """
+        Extracts (상품명, 가격, 링크) tuples from a search result page.
+        Returns None when the page has no product units at all (end of results).
+        """
+        root = self.backend.parse(html)
+        items = self._nodes(root, "search", "product_unit", required=False)
+        if not items:
+            return None
+        product_links = []
+        for item in items:
+            name_text = self._value(item, "search", "product_name")
+            price_text = self._value(item, "search", "price")
+            href = self._value(item, "search", "link")
+            if not (name_text and price_text and href):
+                continue
+            product_links.append((name_text, price_text, urljoin(BASE_URL, href)))
+        return product_links
+
+    def parse_product_detail(self, html):
+        """
+        Extracts (브랜드, 쿠팡상품번호, 옵션 문자열) from a product detail page.
+        """
+        root = self.backend.parse(html)
+        brand = self._value(root, "detail", "brand") or "브랜드 정보 없음"
+
+        product_id = "없음"
+        option_list = []
+        for li in self._nodes(root, "detail", "spec_items"):
+            text = _clean(self.backend.text(li))
+            if ":" in text:
+                key, value = text.split(":", 1)
+                key, value = key.strip(), value.strip()
+                if "쿠팡상품번호" in key:
+                    product_id = value
+                else:
+                    option_list.append(f"{key}: {value}")
+            else:
+                option_list.append(text)
+
+        return brand, product_id, "; ".join(option_list)
+
+    def parse_review_articles(self, html):
+        """
+        Extracts every review article on a rendered review page (driver.page_source)
+        in one pass, instead of a WebDriver round trip per field.
+        Returns dicts with headline, content, author, rating, date, seller,
+        real_product, images and survey (both '; '-joined) and helpful.
+        """
+        root = self.backend.parse(html)
+        reviews = []
+        for article in self._nodes(root, "review", "article", required=False):
+            image_attr = self.fields["review"]["images"]["attr"]
+            images = [self.backend.attr(img, image_attr) for img in self._nodes(article, "review", "images", required=False)]
+            surveys = []
+            for row in self._nodes(article, "review", "survey_rows", required=False):
+                question = self._value(row, "review", "survey_question")
+                answer = self._value(row, "review", "survey_answer")
+                surveys.append(f"{question}: {answer}")
+            reviews.append({
+                "headline": self._value(article, "review", "headline", required=False),
+                "content": self._value(article, "review", "content", required=False),
+                "author": self._value(article, "review", "author"),
+                "rating": self._value(article, "review", "rating"),
+                "date": self._value(article, "review", "date"),
+                "seller": self._value(article, "review", "seller", required=False),
+                "real_product": self._value(article, "review", "real_product", required=False),
+                "images": "; ".join(filter(None, images)),
+                "survey": "; ".join(surveys),
+                "helpful": self._value(article, "review", "helpful", required=False),
+            })
+        return reviews
+
+_default_parser = None
+_default_lock = threading.Lock()
+
+def default_parser():
+    """Process-wide HtmlParser built from Config (selectors are loaded once)."""
+    global _default_parser
+    with _default_lock:
+        if _default_parser is None:
+            _default_parser = HtmlParser()
+        return _default_parser
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from src.config import Config
+from src.utils.logger import logger
+from src.utils import metrics
+
+# Query parameters that only track the click (search id, rank, ...) and never change the page
+TRACKING_PARAMS = {
+    "searchid", "rank", "sourcetype", "isaddedcart", "traceid", "clickeventid", "src", "spec",
+    "addtag", "ctag", "lptag", "itime", "wpcid", "wref", "wtime", "redirect", "component",
+}
+
+def normalize_url(url):
+    """
+    Cache key for a URL: lowercase scheme/host, no fragment, tracking parameters dropped
+    and the remaining query parameters sorted, so the same page reached from different
+    searches or ranks maps to one entry.
+    """
+    parts = urlsplit(url)
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if key.lower() not in TRACKING_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(query), ""))
+
+class CachedPage:
+    """The subset of requests.Response the crawler uses, served from the cache."""
+    def __init__(self, url, text, status_code=200):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+        self.from_cache = True
+
+class HttpCache:
+    """
+    On-disk cache of fetched pages (SQLite file, zlib-compressed bodies).
+
+    Entries expire per page type (HTTP_CACHE_TTL_SEARCH / HTTP_CACHE_TTL_DETAIL).
+    A stale entry with an ETag or Last-Modified is revalidated with a conditional
+    request; a 304 refreshes it without downloading the page again. When the stored
+    bodies exceed HTTP_CACHE_MAX_MB, the least recently used entries are evicted.
+    """
+    def __init__(self, cache_path=None, max_bytes=None, ttls=None):
+        self.cache_path = cache_path or Config.HTTP_CACHE_PATH
+        self.max_bytes = max_bytes or Config.HTTP_CACHE_MAX_MB * 1024 * 1024
+        self.ttls = ttls or {"search": Config.HTTP_CACHE_TTL_SEARCH, "detail": Config.HTTP_CACHE_TTL_DETAIL}
+        self.stats = {}
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._create_schema()
+        logger.info(f"HttpCache initialized at {self.cache_path}")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.cache_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn: # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_schema(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url_key TEXT PRIMARY KEY,
+                    page_type TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_pages_accessed ON pages (accessed_at);
+            """)
+
+    def _count(self, page_type, result):
+        counts = self.stats.setdefault(page_type, {"hit": 0, "revalidated": 0, "miss": 0})
+        counts[result] += 1
+        metrics.CACHE_REQUESTS.labels(cache=f"http_{page_type}", result=result).inc()
+
+    def fetch(self, url, page_type, fetcher):
+        """
+        Returns the page for url from the cache when fresh, otherwise calls
+        fetcher(url, headers) (a requests-style GET) and stores a 200 response.
+        """
+        key = normalize_url(url)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT body, etag, last_modified, fetched_at FROM pages WHERE url_key = ?", (key,)).fetchone()
+            if row and now - row[3] < self.ttls.get(page_type, 0):
+                conn.execute("UPDATE pages SET accessed_at = ? WHERE url_key = ?", (now, key))
+                self._count(page_type, "hit")
+                return CachedPage(url, zlib.decompress(row[0]).decode("utf-8"))
+
+        headers = {}
+        if row and row[1]:
+            headers["If-None-Match"] = row[1]
+        if row and row[2]:
+            headers["If-Modified-Since"] = row[2]
+        response = fetcher(url, headers)
+
+        if response.status_code == 304 and row:
+            with self._connect() as conn:
+                conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url_key = ?", (now, now, key))
+            self._count(page_type, "revalidated")
+            return CachedPage(url, zlib.decompress(row[0]).decode("utf-8"))
+
+        self._count(page_type, "miss")
+        if response.status_code == 200:
+            self._store(key, page_type, response, now)
+        return response
+
+    def _store(self, key, page_type, response, now):
+        body = zlib.compress(response.text.encode("utf-8"), 6)
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO pages (url_key, page_type, body, size, etag, last_modified, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (key, page_type, body, len(body), response.headers.get("ETag"), response.headers.get("Last-Modified"), now, now))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries down to 90% of the cap so eviction is not paid on every store
+        target, evicted = total - int(self.max_bytes * 0.9), 0
+        victims = []
+        for url_key, size in conn.execute("SELECT url_key, size FROM pages ORDER BY accessed_at"):
+            victims.append((url_key,))
+            evicted += size
+            if evicted >= target:
+                break
+        conn.executemany("DELETE FROM pages WHERE url_key = ?", victims)
+        logger.info(f"HttpCache evicted {len(victims)} pages ({evicted / 1024 / 1024:.1f} MB).")
+
+    def report(self):
+        """Hit / revalidated / miss counts per page type for this crawler, plus store size."""
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        lines = [f"HTTP cache: {entries} pages, {size / 1024 / 1024:.1f} MB compressed (cap {self.max_bytes / 1024 / 1024:.0f} MB)"]
+        for page_type, counts in sorted(self.stats.items()):
+            lookups = sum(counts.values())
+            served = counts["hit"] + counts["revalidated"]
+            lines.append(f"  {page_type}: {counts['hit']} hits, {counts['revalidated']} revalidated, {counts['miss']} misses "
+                         f"({served / lookups * 100:.1f}% served from cache)")
+        return "\n".join(lines)
@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from src.config import Config
+from src.utils.logger import logger
+from src.utils import metrics
+
+# Snapshot page types (the crawler's page_type labels)
+SEARCH, DETAIL, REVIEW = "search", "detail", "review"
+
+def read_blob(handle, offset, length):
+    """Decompressed page text of the blob at offset in an open segment file."""
+    handle.seek(offset)
+    return zlib.decompress(handle.read(length)).decode("utf-8")
+
+class PageArchive:
+    """
+    Append-only, content-addressed archive of every page the crawler fetched.
+
+    Bodies are zlib-compressed and appended to segment files under PAGE_ARCHIVE_DIR,
+    keyed by the sha256 of the page, so a page fetched again unchanged (or served by the
+    HTTP cache) costs one index row, not another copy. index.db (SQLite) records each
+    snapshot: page type, URL, keyword, product key, page number, crawl id and time.
+    Segments are never rewritten; each archive instance appends to its own segment
+    files, so crawlers in several processes never interleave writes. Two processes
+    archiving the same new page at once may both append it; the index keeps one copy
+    and the other is dead bytes.
+    """
+    def __init__(self, archive_dir=None, segment_mb=None, compression_level=None):
+        self.archive_dir = archive_dir or Config.PAGE_ARCHIVE_DIR
+        self.segment_bytes = (segment_mb or Config.PAGE_ARCHIVE_SEGMENT_MB) * 1024 * 1024
+        self.compression_level = Config.PAGE_ARCHIVE_COMPRESSION_LEVEL if compression_level is None else compression_level
+        self.index_path = os.path.join(self.archive_dir, "index.db")
+        self.stats = {}
+        self._writer_id = uuid.uuid4().hex[:12]
+        self._segment_number = 0
+        self._segment = None # (name, file) this instance appends to
+        self._readers = OrderedDict() # open segment files for read(), least recently used first
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self._create_schema()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn: # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_schema(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    digest TEXT PRIMARY KEY,
+                    segment TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    size INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    page_type TEXT NOT NULL,
+                    url TEXT,
+                    keyword TEXT,
+                    product_key TEXT,
+                    page INTEGER,
+                    crawl_id TEXT,
+                    fetched_at REAL NOT NULL,
+                    digest TEXT NOT NULL,
+                    meta TEXT
+                );
+                CREATE INDEX IF NOT EXISTS ix_snapshots_product ON snapshots (product_key, page_type, page);
+                CREATE INDEX IF NOT EXISTS ix_snapshots_keyword ON snapshots (keyword, page);
+                CREATE INDEX IF NOT EXISTS ix_snapshots_crawl ON snapshots (crawl_id);
+            """)
+
+    def _append(self, body):
+        """Appends a compressed body to this instance's current segment; returns (segment, offset)."""
+        if self._segment is None or self._segment[1].tell() + len(body) > self.segment_bytes:
+            self.close()
+            self._segment_number += 1
+            name = f"{self._writer_id}-{self._segment_number:05d}.seg"
+            self._segment = (name, open(os.path.join(self.archive_dir, name), "ab"))
+        name, segment = self._segment
+        offset = segment.tell()
+        segment.write(body)
+        segment.flush() # the index row written next must never point past the end of the file
+        return name, offset
+
+    def add(self, page_type, url, html, keyword=None, product_key=None, page=None, crawl_id=None, meta=None):
+        """Archives one fetched page and returns its digest. The body is stored only if it is new."""
+        raw = html.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._connect() as conn:
+            stored = conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is not None
+            if not stored:
+                body = zlib.compress(raw, self.compression_level)
+                segment, offset = self._append(body)
+                conn.execute("INSERT OR IGNORE INTO blobs (digest, segment, offset, length, size) VALUES (?, ?, ?, ?, ?)",
+                             (digest, segment, offset, len(body), len(raw)))
+            conn.execute("""
+                INSERT INTO snapshots (page_type, url, keyword, product_key, page, crawl_id, fetched_at, digest, meta)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (page_type, url, keyword, product_key, page, crawl_id, time.time(), digest,
+                  json.dumps(meta, ensure_ascii=False) if meta is not None else None))
+        result = "deduplicated" if stored else "stored"
+        counts = self.stats.setdefault(page_type, {"stored": 0, "deduplicated": 0})
+        counts[result] += 1
+        metrics.ARCHIVED_PAGES.labels(page_type=page_type, result=result).inc()
+        return digest
+
+    def _reader(self, segment):
+        handle = self._readers.pop(segment, None)
+        if handle is None:
+            handle = open(os.path.join(self.archive_dir, segment), "rb")
+            if len(self._readers) >= 16:
+                self._readers.popitem(last=False)[1].close()
+        self._readers[segment] = handle
+        return handle
+
+    def read(self, digest):
+        """The page text stored under digest."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT segment, offset, length FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return read_blob(self._reader(row[0]), row[1], row[2])
+
+    def snapshots(self, page_type=None, product_key=None, keyword=None):
+        """Snapshot rows (dicts, meta decoded) in archive order, optionally filtered."""
+        query, params = "SELECT * FROM snapshots WHERE 1 = 1", []
+        for column, value in (("page_type", page_type), ("product_key", product_key), ("keyword", keyword)):
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = [dict(row) for row in conn.execute(query + " ORDER BY id", params)]
+        for row in rows:
+            row["meta"] = json.loads(row["meta"]) if row["meta"] else {}
+        return rows
+
+    def product_crawls(self, product_keys=None):
+        """
+        {product: [crawl, ...]} for every product with archived review pages; a crawl is
+        {'detail': snapshot or None, 'reviews': [snapshots by page]}, oldest first.
+        Products are keyed by product key, or by link for crawls without a registry.
+        Snapshots carry their blob's segment / offset / length, so parse processes read
+        the segment files directly instead of querying the index per page.
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = [dict(row) for row in conn.execute("""
+                SELECT s.*, b.segment, b.offset, b.length FROM snapshots s JOIN blobs b ON b.digest = s.digest
+                WHERE s.page_type IN (?, ?) AND s.crawl_id IS NOT NULL ORDER BY s.id
+            """, (DETAIL, REVIEW))]
+        crawls = OrderedDict()
+        for row in rows:
+            row["meta"] = json.loads(row["meta"]) if row["meta"] else {}
+            crawl = crawls.setdefault(row["crawl_id"], {"detail": None, "reviews": []})
+            if row["page_type"] == DETAIL:
+                crawl["detail"] = row
+            else:
+                crawl["reviews"].append(row)
+        products = OrderedDict()
+        wanted = set(product_keys) if product_keys else None
+        for crawl in crawls.values():
+            if not crawl["reviews"]:
+                continue
+            first = crawl["reviews"][0]
+            product = first["product_key"] or first["url"]
+            if wanted is None or product in wanted:
+                crawl["reviews"].sort(key=lambda row: (row["page"] or 0, row["id"]))
+                products.setdefault(product, []).append(crawl)
+        return products
+
+    def close(self):
+        if self._segment is not None:
+            self._segment[1].close()
+            self._segment = None
+        while self._readers:
+            self._readers.popitem()[1].close()
+
+    def report(self):
+        """Stored / deduplicated counts per page type for this crawler, plus archive size."""
+        with self._connect() as conn:
+            blobs, stored, raw = conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            snapshots = conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        ratio = raw / stored if stored else 0
+        lines = [f"Page archive: {snapshots} snapshots, {blobs} distinct pages, {stored / 1024 / 1024:.1f} MB compressed ({ratio:.1f}x)"]
+        for page_type, counts in sorted(self.stats.items()):
+            lines.append(f"  {page_type}: {counts['stored']} stored, {counts['deduplicated']} unchanged")
+        return "\n".join(lines)
+
+def parse_product_crawls(archive_dir, crawls):
+    """
+    Rebuilds one product's reviews from its archived crawls (runs in a reparse process).
+    Detail pages are parsed again for brand / product id / options; a page archived
+    unchanged by several crawls is parsed once. A review seen in several crawls (or
+    pages re-read on a retry) is kept once, from the newest crawl.
+    """
+    from src.crawler.html_parser import default_parser
+    from src.etl.records import ProductCatalog, record_from_article, record_key
+
+    parser = default_parser()
+    catalog = ProductCatalog()
+    handles, parsed_pages, reviews = {}, {}, {}
+
+    def parse(snapshot, parse_page):
+        if snapshot["digest"] not in parsed_pages:
+            handle = handles.get(snapshot["segment"])
+            if handle is None:
+                handle = handles[snapshot["segment"]] = open(os.path.join(archive_dir, snapshot["segment"]), "rb")
+            parsed_pages[snapshot["digest"]] = parse_page(read_blob(handle, snapshot["offset"], snapshot["length"]))
+        return parsed_pages[snapshot["digest"]]
+
+    try:
+        for crawl in crawls:
+            name, brand, price, product_id, option = crawl["reviews"][0]["meta"].get("product_info", [""] * 5)
+            if crawl["detail"] is not None:
+                brand, product_id, option = parse(crawl["detail"], parser.parse_product_detail)
+            product = catalog.get(name, brand, price, product_id, option)
+            for snapshot in crawl["reviews"]:
+                for parsed in parse(snapshot, parser.parse_review_articles):
+                    record = record_from_article(parsed, product, snapshot["page"], snapshot["product_key"])
+                    key = record_key(record)
+                    reviews.pop(key, None) # the newest snapshot of a review wins
+                    reviews[key] = record
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return list(reviews.values())
+
+def reparse_archive(db_handler, transformer, archive=None, product_keys=None, workers=None, batch_size=None):
+    """
+    Rebuilds reviews from the archived pages with the current parser, without a browser,
+    and stores the ones not in the database yet through the normal transform / insert
+    path (insert hooks included). Products are parsed in a process pool.
+    Returns (products, reviews parsed, reviews inserted).
+    """
+    from src.crawler.product_registry import drop_stored_reviews
+
+    archive = archive or PageArchive()
+    workers = workers or Config.PAGE_ARCHIVE_REPARSE_WORKERS or os.cpu_count()
+    batch_size = batch_size or Config.PAGE_ARCHIVE_REPARSE_BATCH
+    products = archive.product_crawls(product_keys)
+    if not products:
+        logger.warning(f"No archived review pages in {archive.archive_dir}.")
+        return 0, 0, 0
+    logger.info(f"Re-parsing {len(products)} archived products with {min(workers, len(products))} processes...")
+
+    start = time.perf_counter()
+    parsed_count, inserted, pending = 0, 0, []
+
+    def store(product, reviews):
+        nonlocal parsed_count, inserted, pending
+        parsed_count += len(reviews)
+        product_key = reviews[0].product_key if reviews else None
+        pending.extend(drop_stored_reviews(db_handler, product_key, reviews) if product_key else reviews)
+        if len(pending) >= batch_size:
+            db_handler.insert_reviews(transformer.transform(pending))
+            inserted += len(pending)
+            pending = []
+
+    if workers <= 1 or len(products) < 2:
+        for product, crawls in products.items():
+            try:
+                store(product, parse_product_crawls(archive.archive_dir, crawls))
+            except Exception as e:
+                logger.error(f"Failed to re-parse archived product {product}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(products))) as pool:
+            futures = {pool.submit(parse_product_crawls, archive.archive_dir, crawls): product for product, crawls in products.items()}
+            for future, product in futures.items():
+                try:
+                    store(product, future.result())
+                except Exception as e:
+                    logger.error(f"Failed to re-parse archived product {product}: {e}")
+    if pending:
+        db_handler.insert_reviews(transformer.transform(pending))
+        inserted += len(pending)
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Re-parse completed: {len(products)} products, {parsed_count} reviews parsed "
+                f"({parsed_count / elapsed if elapsed else 0:.0f}/s), {inserted} new reviews stored.")
+    return len(products), parsed_count, inserted
@@ -0,0 +1,143 @@
+import datetime
+import os
+import socket
+import uuid
+from urllib.parse import urlsplit, parse_qs
+from src.config import Config
+from src.etl.records import record_key
+from src.utils.logger import logger
+
+# Crawl modes decided by ProductRegistry.plan()
+SKIP, INCREMENTAL, FULL = "skip", "incremental", "full"
+
+def drop_stored_reviews(db_handler, product_key, reviews):
+    """
+    Drops reviews already stored for the product (same records.review_key: 작성자, 리뷰제목,
+    작성일 and text, on or after the oldest review's date), so a retried task or an
+    archive re-parse stores each review once.
+    """
+    if product_key is None:
+        return reviews
+    dates = []
+    for review in reviews:
+        try:
+            dates.append(datetime.datetime.strptime(review.get('작성일', ''), '%Y.%m.%d'))
+        except ValueError:
+            pass
+    if not dates:
+        return reviews
+    known = db_handler.get_known_review_keys(product_key, min(dates))
+    fresh = [review for review in reviews if record_key(review) not in known]
+    if len(fresh) < len(reviews):
+        logger.info(f"{len(reviews) - len(fresh)} reviews of {product_key} already stored; skipped.")
+    return fresh
+
+class CrawlPlan:
+    """What to do with one product: mode, plus the cut-off date and known reviews for incremental crawls."""
+    def __init__(self, product_key, mode, since=None, known_keys=None, reason=None):
+        self.product_key = product_key
+        self.mode = mode
+        self.reason = reason
+        self.since = since # 이 날짜 이전에 작성된 리뷰에 도달하면 수집 중단
+        self.known_keys = known_keys or set() # 이미 저장된 리뷰의 records.review_key
+
+class ProductRegistry:
+    """
+    Global product registry shared by all keywords and concurrent jobs.
+
+    Products are keyed by the productId/vendorItemId in their link, so the same
+    product found under different keywords (or by different jobs) is crawled once.
+    The freshness window decides per product:
+      - crawled within PRODUCT_FRESH_HOURS        -> skip
+      - crawled within PRODUCT_FULL_RECRAWL_DAYS  -> incremental (new reviews only)
+      - never crawled or older                    -> full
+    A product is leased to one job while it is crawled.
+    """
+    def __init__(self, db_handler, fresh_hours=None, full_recrawl_days=None, lease_minutes=None):
+        self.db_handler = db_handler
+        self.fresh_window = datetime.timedelta(hours=Config.PRODUCT_FRESH_HOURS if fresh_hours is None else fresh_hours)
+        self.full_window = datetime.timedelta(days=Config.PRODUCT_FULL_RECRAWL_DAYS if full_recrawl_days is None else full_recrawl_days)
+        self.lease_seconds = (Config.PRODUCT_CRAWL_LEASE_MINUTES if lease_minutes is None else lease_minutes) * 60
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.products = {}
+
+    @staticmethod
+    def parse_product_key(link):
+        """
+        'https://www.coupang.com/vp/products/123?itemId=4&vendorItemId=567' -> '123:567'.
+        Falls back to the productId alone, and returns None for links without one.
+        """
+        parts = urlsplit(link)
+        segments = [segment for segment in parts.path.split("/") if segment]
+        if "products" not in segments or segments.index("products") + 1 >= len(segments):
+            return None
+        product_id = segments[segments.index("products") + 1]
+        if not product_id.isdigit():
+            return None
+        vendor_item_id = parse_qs(parts.query).get("vendorItemId", [""])[0]
+        return f"{product_id}:{vendor_item_id}" if vendor_item_id.isdigit() else product_id
+
+    def register(self, product_links, keyword=None):
+        """
+        Registers (상품명, 가격, 링크) tuples from the search pages under keyword.
+        Returns (product_key, 상품명, 가격, 링크) tuples, one per product; links without
+        a product id keep product_key None and are always crawled fully.
+        """
+        registered, products = [], []
+        seen = set()
+        for name, price, link in product_links:
+            key = self.parse_product_key(link)
+            if key is not None:
+                if key in seen:
+                    continue # 같은 상품이 여러 검색 페이지/순위에 노출된 경우
+                seen.add(key)
+                product_id, _, vendor_item_id = key.partition(":")
+                products.append({"product_key": key, "link_product_id": product_id, "vendor_item_id": vendor_item_id or None,
+                                 "product_name": name[:255], "price": (price or "")[:50], "link": link})
+            registered.append((key, name, price, link))
+        try:
+            self.products.update(self.db_handler.register_products(products, keyword))
+        except Exception as e:
+            logger.error(f"Product registry unavailable, crawling every product fully: {e}")
+        logger.info(f"Registered {len(products)} products for '{keyword}' ({len(product_links) - len(registered)} duplicate links dropped).")
+        return registered
+
+    def acquire(self, product_key, now=None, fresh_hours=None):
+        """
+        Decides how to crawl a product and, unless skipped, leases it to this job.
+        Freshness is re-checked in the same UPDATE that takes the lease, so a product
+        finished by another job after register() is not crawled again.
+        fresh_hours overrides the registry's freshness window for this product.
+        """
+        fresh_window = self.fresh_window if fresh_hours is None else datetime.timedelta(hours=fresh_hours)
+        if product_key is not None and product_key not in self.products:
+            # Registered by another process (e.g. a worker that ran the search task)
+            self.products.update(self.db_handler.get_product_states([product_key]))
+        if product_key is None or product_key not in self.products:
+            return CrawlPlan(product_key, FULL)
+        now = now or datetime.datetime.now()
+        last_crawled_at = self.products[product_key]["last_crawled_at"]
+        if last_crawled_at is not None and now - last_crawled_at < fresh_window:
+            return CrawlPlan(product_key, SKIP, reason="fresh")
+        state = self.db_handler.claim_product(product_key, self.owner, self.lease_seconds, crawled_before=now - fresh_window)
+        if state is None:
+            return CrawlPlan(product_key, SKIP, reason="claimed by another job or just crawled")
+        self.products[product_key] = state
+        last_crawled_at, since = state["last_crawled_at"], state["newest_review_date"]
+        if last_crawled_at is None or since is None or now - last_crawled_at >= self.full_window:
+            return CrawlPlan(product_key, FULL)
+        # Reviews of the newest stored day may be partly stored; known_keys skips those
+        return CrawlPlan(product_key, INCREMENTAL, since, self.db_handler.get_known_review_keys(product_key, since))
+
+    def renew(self, product_key):
+        """Extends this job's lease on a product it is crawling (long crawls, worker heartbeats)."""
+        if product_key is not None and product_key in self.products:
+            self.db_handler.claim_product(product_key, self.owner, self.lease_seconds)
+
+    def complete(self, product_key, mode, browser_seconds=None):
+        if product_key is not None and product_key in self.products:
+            self.db_handler.complete_product_crawl(product_key, self.owner, mode, browser_seconds=browser_seconds)
+
+    def release(self, product_key):
+        if product_key is not None and product_key in self.products:
+            self.db_handler.release_product(product_key, self.owner)
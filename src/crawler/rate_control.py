@@ -0,0 +1,212 @@
+import random
+import threading
+import time
+from collections import deque
+import requests
+from selenium.common.exceptions import TimeoutException
+from src.config import Config
+from src.utils.logger import logger
+from src.utils import metrics
+
+# Substrings of the pages served instead of content when the crawler is blocked
+BLOCK_MARKERS = ("Access Denied", "captcha", "Pardon Our Interruption", "비정상적인 접근")
+# Status codes that mean "slow down" rather than "this page is broken"
+THROTTLE_STATUS = {403, 429}
+RETRYABLE_STATUS = {403, 429, 500, 502, 503, 504}
+# Browser action errors that mean the site is slowing us down (page load / script timeouts);
+# anything else (stale or unclickable element, selector miss) is an ordinary DOM error
+BROWSER_BLOCK_ERRORS = (TimeoutException, TimeoutError)
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker has tripped too often and the crawl should stop."""
+
+class BlockedError(Exception):
+    """Raised when a browser action landed on a block page (captcha, access denied); retryable."""
+
+class AimdRateLimiter:
+    """
+    Paces requests with additive-increase / multiplicative-decrease on the request rate.
+    Fast healthy responses raise the rate by a fixed step; slow responses cut it a little,
+    throttling, block pages and timeouts cut it in half.
+    """
+    def __init__(self, initial_delay=None, min_delay=None, max_delay=None, latency_target=None,
+                 additive_step=0.05, slow_factor=0.8, throttle_factor=0.5):
+        self.min_rate = 1.0 / (max_delay or Config.CRAWL_MAX_DELAY)
+        self.max_rate = 1.0 / (min_delay or Config.CRAWL_MIN_DELAY)
+        self.rate = 1.0 / (initial_delay or Config.CRAWL_INITIAL_DELAY) # requests per second
+        self.latency_target = latency_target or Config.CRAWL_LATENCY_TARGET
+        self.additive_step = additive_step
+        self.slow_factor = slow_factor
+        self.throttle_factor = throttle_factor
+        self._next_request_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Sleeps until the next request is allowed (delay = 1 / rate, +-20% jitter)."""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._next_request_at - now)
+            self._next_request_at = max(now, self._next_request_at) + random.uniform(0.8, 1.2) / self.rate
+        if delay:
+            time.sleep(delay)
+
+    def on_success(self, latency):
+        with self._lock:
+            if latency <= self.latency_target:
+                self.rate = min(self.max_rate, self.rate + self.additive_step)
+            else:
+                self.rate = max(self.min_rate, self.rate * self.slow_factor)
+        metrics.CRAWL_REQUEST_RATE.set(self.rate)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.throttle_factor)
+        metrics.CRAWL_REQUEST_RATE.set(self.rate)
+
+class CircuitBreaker:
+    """
+    Opens when the share of blocked/throttled requests in the last `window` outcomes
+    exceeds `threshold`. While open, callers sleep out the cooldown; then one trial
+    request is let through (half-open). A failed trial re-opens the circuit with a
+    doubled cooldown. After `max_trips` consecutive trips CircuitOpenError is raised.
+    """
+    def __init__(self, window=None, threshold=None, cooldown=None, max_trips=None, min_samples=5):
+        self.outcomes = deque(maxlen=window or Config.CRAWL_BREAKER_WINDOW)
+        self.threshold = threshold or Config.CRAWL_BREAKER_THRESHOLD
+        self.base_cooldown = cooldown or Config.CRAWL_BREAKER_COOLDOWN
+        self.max_trips = max_trips or Config.CRAWL_BREAKER_MAX_TRIPS
+        self.min_samples = min_samples
+        self.state = "closed"
+        self.trips = 0
+        self.opened_at = 0.0
+        self.cooldown = self.base_cooldown
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.state != "open":
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+        if remaining > 0:
+            logger.warning(f"Circuit open: pausing crawl for {remaining:.0f}s.")
+            time.sleep(remaining)
+        with self._lock:
+            self._set_state("half_open")
+
+    def record(self, blocked):
+        with self._lock:
+            self.outcomes.append(bool(blocked))
+            if self.state == "half_open":
+                if blocked:
+                    self._trip()
+                else:
+                    self.trips = 0
+                    self.cooldown = self.base_cooldown
+                    self.outcomes.clear()
+                    self._set_state("closed")
+                    logger.info("Circuit closed: trial request succeeded.")
+                return
+            if (self.state == "closed" and len(self.outcomes) >= self.min_samples
+                    and sum(self.outcomes) / len(self.outcomes) > self.threshold):
+                self._trip()
+
+    def _trip(self):
+        if self.state == "half_open":
+            self.cooldown = min(self.cooldown * 2, self.base_cooldown * 8)
+        self.trips += 1
+        self.opened_at = time.monotonic()
+        self._set_state("open")
+        metrics.CIRCUIT_TRIPS.inc()
+        if self.trips >= self.max_trips:
+            raise CircuitOpenError(f"Circuit breaker tripped {self.trips} times in a row; stopping the crawl.")
+        logger.warning(f"Circuit opened (block rate {sum(self.outcomes)}/{len(self.outcomes)}), cooldown {self.cooldown:.0f}s.")
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.CIRCUIT_STATE.set({"closed": 0, "half_open": 1, "open": 2}[state])
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2^attempt))."""
+    base = base or Config.CRAWL_BACKOFF_BASE
+    cap = cap or Config.CRAWL_BACKOFF_CAP
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def is_block_page(html):
+    head = html[:5000]
+    return any(marker in head for marker in BLOCK_MARKERS)
+
+class RateController:
+    """
+    Shared pacing, retry and circuit-breaking for every request the crawler makes,
+    both plain HTTP (fetch) and browser actions (run).
+    """
+    def __init__(self, limiter=None, breaker=None, max_retries=None, timeout=None):
+        self.limiter = limiter or AimdRateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = Config.CRAWL_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout or Config.CRAWL_REQUEST_TIMEOUT
+
+    def fetch(self, url, page_type, **kwargs):
+        """
+        GETs url with pacing and retries. Returns the Response, or raises the last
+        requests exception once retries are exhausted (CircuitOpenError aborts at once).
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_request()
+            self.limiter.wait()
+            start = time.perf_counter()
+            try:
+                response = requests.get(url, **kwargs)
+                latency = time.perf_counter() - start
+                if response.status_code in THROTTLE_STATUS or is_block_page(response.text):
+                    self._on_blocked(page_type, f"HTTP {response.status_code}")
+                    last_error = requests.exceptions.HTTPError(f"Blocked or throttled: HTTP {response.status_code}", response=response)
+                elif response.status_code in RETRYABLE_STATUS:
+                    self.breaker.record(blocked=False)
+                    last_error = requests.exceptions.HTTPError(f"HTTP {response.status_code}", response=response)
+                else:
+                    response.raise_for_status() # non-retryable 4xx
+                    self.limiter.on_success(latency)
+                    self.breaker.record(blocked=False)
+                    return response
+            except requests.exceptions.Timeout as e:
+                self._on_blocked(page_type, "timeout")
+                last_error = e
+            except requests.exceptions.ConnectionError as e:
+                self.limiter.on_throttle()
+                last_error = e
+            if attempt < self.max_retries:
+                delay = backoff_delay(attempt)
+                metrics.CRAWL_RETRIES.labels(page_type=page_type).inc()
+                logger.warning(f"{page_type} request failed ({last_error}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+        raise last_error
+
+    def run(self, action, page_type, is_blocked=None):
+        """
+        Runs a browser action (e.g. driver.get) with pacing; is_blocked() is checked
+        afterwards, and a block page is recorded and raised as BlockedError so the caller
+        retries instead of parsing it. Returns action's result. Timeouts count as blocks;
+        other exceptions are re-raised without touching the limiter or breaker.
+        """
+        self.breaker.before_request()
+        self.limiter.wait()
+        start = time.perf_counter()
+        try:
+            result = action()
+        except BROWSER_BLOCK_ERRORS:
+            self._on_blocked(page_type, "timeout")
+            raise
+        if is_blocked is not None and is_blocked():
+            self._on_blocked(page_type, "block page")
+            raise BlockedError(f"Block page served for {page_type}")
+        self.limiter.on_success(time.perf_counter() - start)
+        self.breaker.record(blocked=False)
+        return result
+
+    def _on_blocked(self, page_type, reason):
+        metrics.CRAWL_THROTTLE_EVENTS.labels(page_type=page_type, reason=reason).inc()
+        self.limiter.on_throttle()
+        self.breaker.record(blocked=True)
@@ -0,0 +1,139 @@
+import datetime
+import math
+import time
+from src.config import Config
+from src.crawler.product_registry import ProductRegistry
+from src.db.task_queue import TaskQueue
+from src.utils.logger import logger
+from src.utils import metrics
+
+class CrawlScheduler:
+    """
+    Daemon that keeps the watchlist (crawl_watchlist) fresh through the crawl_tasks queue.
+
+    Watched keywords are searched again every SCHEDULER_KEYWORD_INTERVAL_HOURS to
+    discover products (search pages are plain HTTP; no product is crawled by it).
+    Each watched product is recrawled incrementally once about
+    SCHEDULER_TARGET_NEW_REVIEWS new reviews are expected from its review velocity
+    (reviews per day over the last SCHEDULER_VELOCITY_DAYS, from the daily rollups),
+    clamped to [SCHEDULER_MIN_INTERVAL_HOURS, SCHEDULER_MAX_INTERVAL_HOURS]: hot
+    products hourly, quiet ones weekly.
+
+    Due products are queued in order of expected new reviews until the day's
+    SCHEDULER_BROWSER_MINUTES_PER_DAY are reserved; each product is charged its
+    measured browser time (products.crawl_seconds). Workers (main.py --worker) run the tasks.
+    """
+    def __init__(self, db_handler, queue=None, budget_minutes=None, target_new_reviews=None,
+                 min_interval_hours=None, max_interval_hours=None, velocity_days=None, keyword_interval_hours=None):
+        self.db_handler = db_handler
+        self.queue = queue or TaskQueue(db_handler)
+        self.budget_seconds = (budget_minutes or Config.SCHEDULER_BROWSER_MINUTES_PER_DAY) * 60
+        self.target_new_reviews = target_new_reviews or Config.SCHEDULER_TARGET_NEW_REVIEWS
+        self.min_interval = datetime.timedelta(hours=min_interval_hours or Config.SCHEDULER_MIN_INTERVAL_HOURS)
+        self.max_interval = datetime.timedelta(hours=max_interval_hours or Config.SCHEDULER_MAX_INTERVAL_HOURS)
+        self.velocity_days = velocity_days or Config.SCHEDULER_VELOCITY_DAYS
+        self.keyword_interval = datetime.timedelta(hours=keyword_interval_hours or Config.SCHEDULER_KEYWORD_INTERVAL_HOURS)
+        logger.info(f"CrawlScheduler initialized (budget {self.budget_seconds / 60:.0f} browser-minutes/day, "
+                    f"interval {self.min_interval} - {self.max_interval}).")
+
+    def watch_keyword(self, keyword, pages=1):
+        return self.db_handler.add_watch("keyword", keyword, pages=pages)
+
+    def watch_product(self, link):
+        """Watches a product by its link; the product is registered so it can be scheduled right away."""
+        product_key = ProductRegistry.parse_product_key(link)
+        if product_key is None:
+            raise ValueError(f"No product id in link: {link}")
+        product_id, _, vendor_item_id = product_key.partition(":")
+        self.db_handler.register_products([{"product_key": product_key, "link_product_id": product_id,
+                                            "vendor_item_id": vendor_item_id or None, "product_name": None, "link": link}])
+        return self.db_handler.add_watch("product", product_key)
+
+    def crawl_interval(self, velocity):
+        """Time until about target_new_reviews new reviews are expected at velocity reviews/day."""
+        if velocity <= 0:
+            return self.max_interval
+        interval = datetime.timedelta(days=self.target_new_reviews / velocity)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def plan(self, now=None):
+        """
+        Due products as dicts (product row + velocity, interval, expected_new_reviews,
+        cost_seconds), most expected new reviews first. Never-crawled products come first.
+        """
+        now = now or datetime.datetime.now()
+        watchlist = self.db_handler.get_watchlist()
+        products = self.db_handler.get_watched_products(
+            [entry["target"] for entry in watchlist if entry["kind"] == "product"],
+            [entry["target"] for entry in watchlist if entry["kind"] == "keyword"])
+        written = self.db_handler.get_review_velocity(now - datetime.timedelta(days=self.velocity_days))
+
+        due = []
+        for product in products:
+            velocity = written.get(product["product_name"], 0) / self.velocity_days
+            interval = self.crawl_interval(velocity)
+            last_crawled_at = product["last_crawled_at"]
+            if last_crawled_at is not None and now - last_crawled_at < interval:
+                continue
+            # Never-crawled products have every review still to collect
+            expected = math.inf if last_crawled_at is None else velocity * (now - last_crawled_at).total_seconds() / 86400
+            due.append(dict(product, velocity=velocity, interval=interval, expected_new_reviews=expected,
+                            cost_seconds=product["crawl_seconds"] or Config.SCHEDULER_DEFAULT_CRAWL_SECONDS))
+        due.sort(key=lambda product: -product["expected_new_reviews"])
+        return due
+
+    def tick(self, now=None):
+        """One scheduling pass. Returns {'keywords': queued, 'products': queued, 'deferred': due but over budget}."""
+        now = now or datetime.datetime.now()
+        queued_keywords = 0
+        for entry in self.db_handler.get_watchlist():
+            if entry["kind"] != "keyword":
+                continue
+            if entry["last_scheduled_at"] is not None and now - entry["last_scheduled_at"] < self.keyword_interval:
+                continue
+            if self.queue.enqueue_keyword(entry["target"], entry["pages"] or 1, discover_only=True):
+                queued_keywords += 1
+                metrics.SCHEDULED_CRAWLS.labels(kind="keyword").inc()
+            self.db_handler.mark_watch_scheduled(entry["id"], now)
+
+        today = datetime.datetime(now.year, now.month, now.day)
+        queued_products, deferred = 0, 0
+        for product in self.plan(now):
+            if deferred:
+                deferred += 1 # budget is spent; the rest waits for tomorrow
+                continue
+            if not self.db_handler.reserve_budget(today, product["cost_seconds"], self.budget_seconds):
+                deferred += 1
+                continue
+            # The registry's freshness window must not skip a product the scheduler found due
+            fresh_hours = self.min_interval.total_seconds() / 3600 / 2
+            if self.queue.enqueue_product(None, product["product_key"], product["product_name"] or "", product["price"] or "",
+                                          product["link"], fresh_hours=fresh_hours):
+                queued_products += 1
+                metrics.SCHEDULED_CRAWLS.labels(kind="product").inc()
+            else:
+                # Already queued or running: give the reservation back
+                self.db_handler.reserve_budget(today, -product["cost_seconds"], self.budget_seconds)
+
+        used = self.db_handler.get_budget_used(today)
+        metrics.BROWSER_BUDGET_USED.set(used)
+        logger.info(f"Scheduler: {queued_keywords} keyword searches and {queued_products} product crawls queued, "
+                    f"{deferred} due products over budget ({used / 60:.0f}/{self.budget_seconds / 60:.0f} browser-minutes today).")
+        return {"keywords": queued_keywords, "products": queued_products, "deferred": deferred}
+
+    def run(self, poll_seconds=None, once=False):
+        """Runs tick() every poll_seconds until interrupted."""
+        poll_seconds = poll_seconds or Config.SCHEDULER_POLL_SECONDS
+        logger.info(f"Crawl scheduler started (every {poll_seconds}s).")
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Scheduler pass failed: {e}")
+            if once:
+                return
+            try:
+                time.sleep(poll_seconds)
+            except KeyboardInterrupt:
+                logger.info("Crawl scheduler stopped.")
+                return
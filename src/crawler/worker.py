@@ -0,0 +1,151 @@
+import os
+import socket
+import threading
+import time
+import uuid
+import requests
+from src.config import Config
+from src.crawler.rate_control import CircuitOpenError, backoff_delay
+from src.crawler.product_registry import drop_stored_reviews
+from src.db.task_queue import TaskQueue
+from src.utils.logger import logger
+
+class LeaseLostError(Exception):
+    """The task's lease expired and another worker may be running it; its results are dropped."""
+
+class CrawlWorker:
+    """
+    Runs crawl tasks from the shared TaskQueue with the regular CoupangCrawler logic:
+      keyword -> one search task per page
+      search  -> product links registered in the product registry, one product task each
+      product -> reviews collected (registry decides skip / incremental / full), transformed and stored
+    Any number of workers can run on any number of nodes against the same database.
+    The crawler's registry should lease products for WORKER_LEASE_SECONDS; the heartbeat
+    renews both leases, so a dead worker's product is free again when its task is.
+    """
+    def __init__(self, db_handler, crawler, transformer, queue=None, worker_id=None,
+                 heartbeat_interval=None, poll_interval=None):
+        self.db_handler = db_handler
+        self.crawler = crawler
+        self.transformer = transformer
+        self.queue = queue or TaskQueue(db_handler)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.heartbeat_interval = heartbeat_interval or Config.WORKER_HEARTBEAT_SECONDS
+        self.poll_interval = poll_interval or Config.WORKER_POLL_SECONDS
+        self.driver = None
+        self.handlers = {"keyword": self._run_keyword, "search": self._run_search, "product": self._run_product}
+
+    def run(self, max_tasks=None, exit_when_idle=False):
+        """Leases and runs tasks until max_tasks are done (or, with exit_when_idle, the queue is empty)."""
+        logger.info(f"Crawl worker {self.worker_id} started.")
+        done = 0
+        try:
+            while max_tasks is None or done < max_tasks:
+                try:
+                    tasks = self.queue.lease(self.worker_id)
+                except Exception as e:
+                    logger.error(f"Failed to lease a crawl task: {e}")
+                    time.sleep(self.poll_interval)
+                    continue
+                if not tasks:
+                    if exit_when_idle:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                self._run_task(tasks[0])
+                done += 1
+        except KeyboardInterrupt:
+            logger.info("Crawl worker interrupted.")
+        finally:
+            if self.driver is not None:
+                self.crawler.close(self.driver)
+            logger.info(f"Crawl worker {self.worker_id} stopped after {done} tasks. Queue: {self.queue.stats()}")
+        return done
+
+    def _run_task(self, task):
+        lost = threading.Event()
+        stop = threading.Event()
+        def heartbeat():
+            while not stop.wait(self.heartbeat_interval):
+                if not self.queue.heartbeat(task.id, self.worker_id):
+                    logger.warning(f"Lost the lease on {task}.")
+                    lost.set()
+                    return
+                if task.product_key and self.crawler.registry is not None:
+                    self.crawler.registry.renew(task.product_key)
+        beat = threading.Thread(target=heartbeat, name=f"heartbeat-{task.id}", daemon=True)
+        beat.start()
+        with logger.contextualize(job_id=f"task-{task.id}"):
+            logger.info(f"Running {task}")
+            try:
+                result_count = self.handlers[task.task_type](task, lost)
+                if not self.queue.complete(task.id, self.worker_id, result_count):
+                    logger.warning(f"{task} was taken over by another worker before it completed.")
+            except LeaseLostError as e:
+                logger.warning(str(e))
+            except CircuitOpenError as e:
+                # The whole site is blocking us: give the task back and wait out the cooldown here too
+                logger.error(f"{e} Returning {task} to the queue.")
+                self.queue.fail(task.id, self.worker_id, e, retry_delay=Config.CRAWL_BREAKER_COOLDOWN)
+                time.sleep(Config.CRAWL_BREAKER_COOLDOWN)
+            except KeyboardInterrupt:
+                self.queue.fail(task.id, self.worker_id, "worker interrupted", retry_delay=0)
+                raise
+            except Exception as e:
+                logger.error(f"{task} failed: {e}")
+                self.queue.fail(task.id, self.worker_id, e, retry_delay=backoff_delay(task.attempts, cap=Config.CRAWL_BACKOFF_CAP) + 1)
+            finally:
+                stop.set()
+                beat.join()
+
+    def _run_keyword(self, task, lost):
+        pages = int(task.payload.get("pages", 1))
+        discover_only = bool(task.payload.get("discover_only"))
+        added = sum(self.queue.enqueue_search_page(task.keyword, page, discover_only) for page in range(1, pages + 1))
+        logger.info(f"Keyword '{task.keyword}': {added} of {pages} search page tasks queued.")
+        return pages
+
+    def _run_search(self, task, lost):
+        product_links = self.crawler.crawl_search_page(task.keyword, task.page)
+        if not product_links:
+            logger.info(f"No products on search page {task.page} for '{task.keyword}'.")
+            return 0
+        if self.crawler.registry is not None:
+            products = self.crawler.registry.register(product_links, task.keyword)
+        else:
+            products = [(None, name, price, link) for name, price, link in product_links]
+        if task.payload.get("discover_only") and self.crawler.registry is not None:
+            logger.info(f"Search page {task.page} for '{task.keyword}': {len(products)} products registered for the scheduler.")
+            return len(products)
+        added = sum(self.queue.enqueue_product(task.keyword, *product) for product in products)
+        logger.info(f"Search page {task.page} for '{task.keyword}': {added} of {len(products)} product tasks queued.")
+        return len(products)
+
+    def _run_product(self, task, lost):
+        if self.driver is None:
+            self.driver = self.crawler._get_driver()
+            if self.driver is None:
+                raise RuntimeError("Selenium driver unavailable.")
+        payload = task.payload
+
+        def store(reviews):
+            # A task retried after a crash between insert and complete() must not store its reviews twice
+            reviews = drop_stored_reviews(self.db_handler, task.product_key, reviews)
+            if lost.is_set() or not self.queue.heartbeat(task.id, self.worker_id):
+                raise LeaseLostError(f"Lease on {task} lost before its {len(reviews)} reviews were stored; dropping them.")
+            if reviews:
+                self.db_handler.insert_reviews(self.transformer.transform(reviews))
+            return reviews
+
+        try:
+            reviews = self.crawler.crawl_product(self.driver, task.product_key, payload["name"], payload["price"], payload["link"],
+                                                 store=store, fresh_hours=payload.get("fresh_hours"))
+        except (requests.exceptions.RequestException, CircuitOpenError, LeaseLostError):
+            raise
+        except Exception:
+            # A broken browser session fails every later product too; start a new one on the next task
+            self.crawler.close(self.driver)
+            self.driver = None
+            raise
+        return len(reviews or [])
+
@@ -4,53 +4,46 @@ import plotly.express as px
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 from src.db.database_handler import DatabaseHandler
+from src.db.analytics import AnalyticsEngine
 from src.ml.review_model import SentimentAnalyzer
 from src.etl.transformer import ReviewTransformer
-from src.utils.logger import logger
+from src.search.review_search import ReviewSearchIndex
+from src.dashboard.review_cache import ReviewFrameCache
 
 # Initialize components
 db_handler = DatabaseHandler()
-sentiment_analyzer = SentimentAnalyzer() # This will load the model
 transformer = ReviewTransformer()
+search_index = ReviewSearchIndex()
+analytics = AnalyticsEngine(db_handler) # aggregations run as SQL (DuckDB snapshot or primary DB)
+
+@st.cache_resource # one analyzer across reruns; its model loads only if unlabeled reviews need scoring
+def get_sentiment_analyzer():
+    return SentimentAnalyzer()
 
 st.set_page_config(layout="wide", page_title="Coupang Review Analysis Dashboard")
 
 st.title("📊 Coupang Review Analysis Dashboard")
 
-@st.cache_data(ttl=600) # Cache data for 10 minutes
-def load_data():
-    logger.info("Loading data from database...")
-    reviews_raw = db_handler.get_all_reviews()
-    df = transformer.to_dataframe(reviews_raw)
-    
-    if not df.empty and '리뷰본문' in df.columns:
-        # Perform sentiment analysis if not already done or if you want to re-run
-        # Check if sentiment_label column exists and is populated
-        if 'sentiment_label' not in df.columns or df['sentiment_label'].isnull().all():
-            logger.info("Performing sentiment analysis on review content...")
-            # Filter out empty review content before sending to ML model
-            non_empty_reviews = df[df['리뷰본문'].astype(bool)]['리뷰본문'].tolist()
-            if non_empty_reviews:
-                sentiments = sentiment_analyzer.analyze_sentiment(non_empty_reviews)
-                if sentiments: # Check if sentiments is not None or empty
-                    # Map sentiments back to the original DataFrame, filtering out None sentiments
-                    sentiment_map = {text: s['label'] for text, s in zip(non_empty_reviews, sentiments) if s is not None and 'label' in s}
-                    df['sentiment_label'] = df['리뷰본문'].map(sentiment_map)
-                else:
-                    logger.warning("Sentiment analysis returned no valid results.")
-            else:
-                df['sentiment_label'] = None
-        else:
-            logger.info("Sentiment analysis already present in data.")
-
-    # Ensure 'created_at' is datetime type for time series analysis
-    if 'created_at' in df.columns:
-        df['created_at'] = pd.to_datetime(df['created_at'], errors='coerce')
-    
-    logger.info(f"Data loaded. DataFrame shape: {df.shape}")
-    return df
-
-df = load_data()
+@st.cache_resource # one delta-refreshed review frame shared by all sessions
+def get_review_cache():
+    return ReviewFrameCache(db_handler, transformer, analytics=analytics, sentiment_analyzer=get_sentiment_analyzer)
+
+@st.cache_data(max_entries=64) # keyed by the product's version: only products with new reviews are redrawn
+def word_cloud_image(product_name, version, exclude_duplicates, _reviews):
+    text_content = " ".join(_reviews['리뷰본문'].dropna().tolist())
+    if not text_content:
+        return None
+    return WordCloud(width=800, height=400, background_color='white', font_path='malgun.ttf').generate(text_content).to_array()
+
+review_cache = get_review_cache()
+# Instead of a TTL full reload, each rerun past DASHBOARD_REFRESH_SECONDS loads only new / updated reviews
+if st.sidebar.button("Refresh data") or review_cache.is_stale():
+    review_cache.refresh()
+df = review_cache.df
+if review_cache.refreshed_at is not None:
+    delta = review_cache.last_delta
+    st.sidebar.caption(f"Last updated: {review_cache.refreshed_at:%Y-%m-%d %H:%M:%S} · {len(df)} reviews · "
+                       f"last refresh +{delta['new']} new, {delta['updated']} updated in {len(delta['products'])} products")
 
 if df.empty:
     st.warning("No review data available. Please run the crawler and ETL process first.")
@@ -61,23 +54,29 @@ else:
         ["All Products"] + sorted(df['상품명'].unique().tolist())
     )
 
+    exclude_duplicates = st.sidebar.checkbox("Exclude near-duplicate reviews", value=True)
+
     filtered_df = df.copy()
     if selected_product != "All Products":
         filtered_df = df[df['상품명'] == selected_product]
+    if exclude_duplicates and 'is_duplicate' in filtered_df.columns:
+        filtered_df = filtered_df[filtered_df['is_duplicate'].fillna(False) == False]
 
     st.subheader(f"Analysis for: {selected_product}")
 
+    product_filter = None if selected_product == "All Products" else selected_product
+    overview = analytics.overview(product_name=product_filter, exclude_duplicates=exclude_duplicates)
+
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        st.metric(label="Total Reviews", value=len(filtered_df))
+        st.metric(label="Total Reviews", value=overview['total_reviews'])
     with col2:
-        avg_rating = filtered_df['평점'].mean()
+        avg_rating = overview['average_rating'] or 0.0
         st.metric(label="Average Rating", value=f"{avg_rating:.2f} / 5.0")
     with col3:
         if 'sentiment_label' in filtered_df.columns and not filtered_df['sentiment_label'].isnull().all():
-            positive_count = filtered_df[filtered_df['sentiment_label'] == 'positive'].shape[0]
-            st.metric(label="Positive Reviews", value=positive_count)
+            st.metric(label="Positive Reviews", value=overview['positive_reviews'])
         else:
             st.metric(label="Positive Reviews", value="N/A")
 
@@ -86,11 +85,8 @@ else:
     # Product-wise Review Count and Average Rating
     if selected_product == "All Products":
         st.subheader("Product Overview: Review Count and Average Rating")
-        product_stats = filtered_df.groupby('상품명').agg(
-            total_reviews=('리뷰제목', 'count'),
-            average_rating=('평점', 'mean')
-        ).reset_index().sort_values(by='total_reviews', ascending=False)
-        
+        product_stats = analytics.product_stats(exclude_duplicates=exclude_duplicates)
+
         fig_product_stats = px.bar(product_stats, x='상품명', y='total_reviews',
                                    color='average_rating', title='Reviews per Product by Average Rating',
                                    hover_data=['average_rating'],
@@ -98,9 +94,10 @@ else:
         st.plotly_chart(fig_product_stats, use_container_width=True)
 
     # Sentiment Distribution
-    if 'sentiment_label' in filtered_df.columns and not filtered_df['sentiment_label'].isnull().all():
+    sentiment_share = analytics.sentiment_distribution(product_name=product_filter, exclude_duplicates=exclude_duplicates)
+    if not sentiment_share.empty:
         st.subheader("Sentiment Distribution")
-        sentiment_counts = filtered_df['sentiment_label'].value_counts().reset_index()
+        sentiment_counts = (sentiment_share * overview['total_reviews']).round().reset_index()
         sentiment_counts.columns = ['Sentiment', 'Count']
         fig_sentiment = px.pie(sentiment_counts, values='Count', names='Sentiment',
                                title='Distribution of Review Sentiments',
@@ -108,17 +105,82 @@ else:
         st.plotly_chart(fig_sentiment, use_container_width=True)
 
     # Reviews Over Time
-    if 'created_at' in filtered_df.columns and not filtered_df['created_at'].isnull().all():
+    reviews_per_date = analytics.reviews_per_date(product_name=product_filter, exclude_duplicates=exclude_duplicates)
+    if not reviews_per_date.empty:
         st.subheader("Reviews Over Time")
-        reviews_over_time = filtered_df.set_index('created_at').resample('D').size().reset_index(name='count')
+        reviews_over_time = reviews_per_date.rename_axis('created_at').reset_index(name='count')
         fig_time = px.line(reviews_over_time, x='created_at', y='count', title='Number of Reviews Over Time')
         st.plotly_chart(fig_time, use_container_width=True)
 
+    # Anomaly alerts (rating drops, negative-share spikes, review bursts) from the rollups
+    alerts = db_handler.get_alerts(product_name=product_filter, limit=20)
+    if alerts:
+        st.subheader("Anomaly Alerts")
+        alerts_df = pd.DataFrame(alerts)[['period_start', 'period', 'product_name', 'metric', 'value', 'baseline_mean', 'z_score', 'review_count']]
+        st.dataframe(alerts_df, use_container_width=True)
+
+    # Full-text search over review title/content
+    st.subheader("Search Reviews")
+    search_query = st.text_input("Search review titles and content:", placeholder="e.g., 배송 느림")
+    if search_query:
+        col_min_rating, col_date_range = st.columns(2)
+        with col_min_rating:
+            min_rating = st.slider("Minimum rating:", 0.0, 5.0, 0.0, 0.5)
+        with col_date_range:
+            date_range = st.date_input("Review date range:", value=())
+        search_product_id = None
+        if selected_product != "All Products" and '쿠팡상품번호' in filtered_df.columns:
+            product_ids = filtered_df['쿠팡상품번호'].dropna().unique().tolist()
+            search_product_id = product_ids[0] if len(product_ids) == 1 else None
+        results = search_index.search(
+            search_query,
+            product_id=search_product_id,
+            min_rating=min_rating or None,
+            date_from=date_range[0].isoformat() if len(date_range) > 0 else None,
+            date_to=date_range[1].isoformat() if len(date_range) > 1 else None,
+            limit=50
+        )
+        if results:
+            scores = pd.Series({r['review_id']: r['score'] for r in results}, name='score')
+            hits = df[df['id'].isin(scores.index)].set_index('id').join(scores).sort_values('score', ascending=False)
+            st.dataframe(hits[['상품명', '리뷰제목', '리뷰본문', '평점', 'score']], use_container_width=True)
+        else:
+            st.info("No reviews matched your search.")
+
+    # Aspect Analysis (served from the review_aspects index)
+    aspect_product_id = None
+    if selected_product != "All Products" and '쿠팡상품번호' in filtered_df.columns:
+        product_ids = filtered_df['쿠팡상품번호'].dropna().unique().tolist()
+        aspect_product_id = product_ids[0] if len(product_ids) == 1 else None
+    aspect_counts = db_handler.get_aspect_counts(product_id=aspect_product_id)
+    if aspect_counts:
+        st.subheader("Aspect Mentions by Sentiment")
+        aspect_df = pd.DataFrame(aspect_counts)
+        aspect_df['sentiment'] = aspect_df['sentiment'].fillna('unscored')
+        fig_aspects = px.bar(aspect_df, x='aspect', y='count', color='sentiment', barmode='stack',
+                             title='Reviews Mentioning Each Aspect',
+                             color_discrete_map={'positive':'green', 'negative':'red', 'neutral':'blue', 'unscored':'gray'})
+        st.plotly_chart(fig_aspects, use_container_width=True)
+
+        col_aspect, col_aspect_sentiment = st.columns(2)
+        with col_aspect:
+            selected_aspect = st.selectbox("Drill down into aspect:", sorted(aspect_df['aspect'].unique().tolist()))
+        with col_aspect_sentiment:
+            selected_aspect_sentiment = st.selectbox("Sentiment:", ["All", "positive", "negative", "neutral"])
+        aspect_reviews = db_handler.get_aspect_reviews(
+            selected_aspect, product_id=aspect_product_id,
+            sentiment=None if selected_aspect_sentiment == "All" else selected_aspect_sentiment, limit=20
+        )
+        if aspect_reviews:
+            aspect_reviews_df = transformer.to_dataframe(aspect_reviews)
+            st.dataframe(aspect_reviews_df[['상품명', '리뷰제목', '리뷰본문', '평점', 'sentiment_label']], use_container_width=True)
+        else:
+            st.info("No reviews found for this aspect.")
+
     # Word Cloud of Review Content
     st.subheader("Word Cloud of Review Content")
-    text_content = " ".join(filtered_df['리뷰본문'].dropna().tolist())
-    if text_content:
-        wordcloud = WordCloud(width=800, height=400, background_color='white', font_path='malgun.ttf').generate(text_content)
+    wordcloud = word_cloud_image(product_filter, review_cache.version_of(product_filter), exclude_duplicates, filtered_df)
+    if wordcloud is not None:
         fig, ax = plt.subplots(figsize=(10, 5))
         ax.imshow(wordcloud, interpolation='bilinear')
         ax.axis('off')
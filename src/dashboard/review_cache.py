@@ -0,0 +1,153 @@
+import datetime
+import threading
+import pandas as pd
+from src.config import Config
+from src.etl.transformer import CATEGORICAL_COLUMNS
+from src.utils.logger import logger
+
+# Columns rewritten after insert; a re-fetched row that differs in one of them is a change
+MUTABLE_COLUMNS = ['sentiment_label', 'is_duplicate', 'duplicate_cluster_id']
+
+def _upsert(frame, delta):
+    """frame with delta's rows added, replacing rows with the same id. Categoricals keep their dtype."""
+    if frame.empty:
+        return delta
+    # Boolean indexing already copied the rows; the shallow copy only detaches kept from frame for column assignment
+    kept = frame[~frame['id'].isin(delta['id'])].copy(deep=False)
+    delta = delta.copy()
+    for column in CATEGORICAL_COLUMNS:
+        if column in kept.columns and column in delta.columns:
+            # Appending categories keeps the cached codes as they are (no recode of the whole frame)
+            new_categories = delta[column].cat.categories.difference(kept[column].cat.categories)
+            kept[column] = kept[column].cat.add_categories(new_categories)
+            delta[column] = delta[column].cat.set_categories(kept[column].cat.categories)
+    return pd.concat([kept, delta], ignore_index=True)
+
+class ReviewFrameCache:
+    """
+    The dashboard's review DataFrame, kept current with deltas instead of TTL full reloads.
+
+    refresh() fetches only reviews above the id high-water mark or with updated_at at or
+    after the previous refresh (less DASHBOARD_REFRESH_OVERLAP_SECONDS, for late commits
+    and writer clock skew), scores new reviews with no stored sentiment once and
+    persists their labels, and upserts the rows into the cached frame by id.
+    Products touched by a delta get a new version, so views cached on
+    (product, version) are recomputed for the affected products only.
+    """
+    def __init__(self, db_handler, transformer, analytics=None, sentiment_analyzer=None, overlap_seconds=None):
+        self.db_handler = db_handler
+        self.transformer = transformer
+        self.analytics = analytics
+        self.sentiment_analyzer = sentiment_analyzer # zero-argument callable, so the model loads only when needed
+        self.overlap = datetime.timedelta(seconds=Config.DASHBOARD_REFRESH_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds)
+        self.df = pd.DataFrame()
+        self.last_id = 0
+        self.since = None # updated_at lower bound of the next delta
+        self.refreshed_at = None
+        self.version = 0
+        self.product_versions = {}
+        self.last_delta = {"new": 0, "updated": 0, "products": []}
+        self._lock = threading.Lock()
+
+    def is_stale(self, max_age_seconds=None):
+        max_age = Config.DASHBOARD_REFRESH_SECONDS if max_age_seconds is None else max_age_seconds
+        return self.refreshed_at is None or (datetime.datetime.now() - self.refreshed_at).total_seconds() >= max_age
+
+    def version_of(self, product_name=None):
+        """Version of one product's reviews (None: all products); changes whenever a delta touches them."""
+        return self.version if product_name is None else self.product_versions.get(product_name, 0)
+
+    def refresh(self):
+        """Applies the reviews changed since the last refresh; returns the number of new or changed rows."""
+        with self._lock:
+            self.refreshed_at = datetime.datetime.now()
+            delta = self._fetch_delta()
+            if delta.empty:
+                self.last_delta = {"new": 0, "updated": 0, "products": []}
+                return 0
+            if 'sentiment_label' not in delta.columns:
+                delta['sentiment_label'] = None
+
+            is_new = ~delta['id'].isin(self.df['id']) if not self.df.empty else pd.Series(True, index=delta.index)
+            is_changed = is_new | self._changed(delta)
+            delta = self._score_new(delta, is_new)
+            # Unchanged rows (e.g. labels this cache stored itself) are upserted too, so their new updated_at is not re-read
+            self.df = _upsert(self.df, delta)
+            changed = delta[is_changed]
+            if changed.empty:
+                self.last_delta = {"new": 0, "updated": 0, "products": []}
+                return 0
+            products = sorted(changed['상품명'].astype(str).unique())
+            self.version += 1
+            for product in products:
+                self.product_versions[product] = self.product_versions.get(product, 0) + 1
+            new_count = int(is_new.sum())
+            self.last_delta = {"new": new_count, "updated": len(changed) - new_count, "products": products}
+            if self.analytics is not None:
+                self.analytics.refresh() # the SQL aggregations read the same reviews
+            logger.info(f"Dashboard data refreshed: {new_count} new, {len(changed) - new_count} updated reviews "
+                        f"in {len(products)} products ({len(self.df)} cached).")
+            return len(changed)
+
+    def _fetch_delta(self, chunk_size=1000):
+        """
+        Full rows of the reviews that are new or were updated since they were cached. The
+        (id, updated_at) versions are read first, so rows re-read only because they fall in
+        the overlap window cost a narrow index read, not a full row fetch.
+        """
+        started = datetime.datetime.now()
+        if self.df.empty:
+            rows = self.db_handler.get_all_reviews()
+        else:
+            versions = pd.DataFrame(self.db_handler.get_review_versions(self.last_id, self.since), columns=['id', 'updated_at'])
+            if versions.empty:
+                self.since = started - self.overlap
+                return pd.DataFrame()
+            cached = self.df.loc[self.df['id'].isin(versions['id']), ['id', 'updated_at']]
+            merged = versions.merge(cached, on='id', how='left', suffixes=('', '_cached'))
+            stale = merged['updated_at_cached'].isna() | (merged['updated_at'] != merged['updated_at_cached'])
+            review_ids = [int(review_id) for review_id in merged.loc[stale, 'id']]
+            rows = []
+            for start in range(0, len(review_ids), chunk_size):
+                rows.extend(self.db_handler.get_reviews_by_ids(review_ids[start:start + chunk_size]))
+        self.since = started - self.overlap
+        if not rows:
+            return pd.DataFrame()
+        delta = self.transformer.to_dataframe(rows)
+        if 'updated_at' not in delta.columns:
+            delta['updated_at'] = pd.NaT
+        delta['updated_at'] = pd.to_datetime(delta['updated_at'])
+        self.last_id = max(self.last_id, int(delta['id'].max()))
+        return delta
+
+    def _changed(self, delta):
+        """Rows of delta whose mutable columns differ from the cached copy."""
+        if self.df.empty:
+            return pd.Series(False, index=delta.index)
+        columns = [column for column in MUTABLE_COLUMNS if column in delta.columns and column in self.df.columns]
+        cached = self.df.set_index('id')[columns].reindex(delta['id'])
+        cached.index = delta.index
+        current = delta[columns]
+        differs = ~((current == cached) | (current.isna() & cached.isna())).fillna(False)
+        return differs.any(axis=1)
+
+    def _score_new(self, delta, is_new):
+        """Scores new reviews without a stored sentiment and persists the labels (each review is scored once)."""
+        pending = delta[is_new & delta['sentiment_label'].isna() & delta['리뷰본문'].fillna('').astype(bool)]
+        if pending.empty or self.sentiment_analyzer is None:
+            return delta
+        logger.info(f"Performing sentiment analysis on {len(pending)} new reviews...")
+        sentiments = self.sentiment_analyzer().analyze_sentiment(pending['리뷰본문'].tolist())
+        labels = {int(review_id): s['label'] for review_id, s in zip(pending['id'], sentiments) if s is not None and 'label' in s}
+        if not labels:
+            logger.warning("Sentiment analysis returned no valid results.")
+            return delta
+        delta = delta.copy()
+        delta['sentiment_label'] = delta['sentiment_label'].astype(object).fillna(delta['id'].map(labels))
+        try:
+            stamped_at = self.db_handler.update_sentiments(labels)
+            # The cached rows carry the new stamp, so the next refresh does not fetch them back
+            delta.loc[delta['id'].isin(labels), 'updated_at'] = pd.Timestamp(stamped_at)
+        except Exception as e:
+            logger.error(f"Failed to store dashboard sentiment labels: {e}")
+        return delta
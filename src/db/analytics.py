@@ -0,0 +1,329 @@
+import datetime
+import glob
+import json
+import os
+import re
+from contextlib import contextmanager
+import pandas as pd
+from sqlalchemy import text
+from src.config import Config
+from src.utils.logger import logger
+
+try:
+    import duckdb
+except ImportError: # DuckDB is optional; aggregations fall back to the primary database
+    duckdb = None
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+# Narrow, append-only columns copied into Parquet parts (review text is not needed for aggregates)
+SNAPSHOT_COLUMNS = ["id", "product_name", "brand", "price", "coupang_product_id", "review_title", "rating", "created_at", "seller"]
+# Columns rewritten after insert (ML results, duplicate flags) are exported by updated_at into separate label parts
+LABEL_COLUMNS = ["id", "sentiment", "is_duplicate", "updated_at"]
+# Fixed Parquet types, so a part whose column is all NULL does not break reading the parts together
+PARQUET_TYPES = {"id": "BIGINT", "rating": "DOUBLE", "created_at": "TIMESTAMP", "is_duplicate": "BOOLEAN", "updated_at": "TIMESTAMP"}
+
+class AnalyticsEngine:
+    """
+    Runs report and dashboard aggregations as SQL.
+
+    'duckdb': an in-process DuckDB reads Parquet snapshots of the reviews table.
+    refresh() runs under a file lock (pipeline, dashboard and API may refresh at once)
+    and writes every part atomically. Reviews are appended by id high-water mark,
+    re-checking the last ANALYTICS_ID_OVERLAP ids so a lower id committed after a higher
+    one is still exported; labels are appended by updated_at (less
+    ANALYTICS_LABEL_OVERLAP_SECONDS) and compacted into one part now and then.
+    The views keep one row per id, so a row exported twice is never counted twice.
+    'sql': the same queries run directly on the primary database (MySQL / SQLite).
+    """
+    def __init__(self, db_handler, backend=None, snapshot_dir=None):
+        self.db_handler = db_handler
+        self.backend = backend or Config.ANALYTICS_BACKEND
+        if self.backend == "duckdb" and duckdb is None:
+            logger.warning("duckdb is not installed. Running analytics on the primary database instead.")
+            self.backend = "sql"
+        if self.backend not in ("duckdb", "sql"):
+            raise ValueError(f"Unsupported ANALYTICS_BACKEND: {self.backend}")
+        self.snapshot_dir = snapshot_dir or Config.ANALYTICS_SNAPSHOT_DIR
+        self._parts_dir = os.path.join(self.snapshot_dir, "reviews")
+        self._labels_dir = os.path.join(self.snapshot_dir, "labels")
+        self._state_path = os.path.join(self.snapshot_dir, "state.json")
+        self._duck = None
+        logger.info(f"AnalyticsEngine initialized with backend: {self.backend}")
+
+    # --- snapshot maintenance (duckdb backend) ---
+
+    @contextmanager
+    def _refresh_lock(self):
+        """Exclusive lock on the snapshot directory, shared by every process that refreshes it."""
+        with open(os.path.join(self.snapshot_dir, ".refresh.lock"), "a+") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read_state(self):
+        try:
+            with open(self._state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_state(self, state):
+        tmp_path = self._state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._state_path)
+
+    def _snapshot_high_water_mark(self):
+        ends = [int(m.group(1)) for m in (re.search(r'part-\d+-(\d+)\.parquet$', path) for path in glob.glob(os.path.join(self._parts_dir, "*.parquet"))) if m]
+        return max(ends, default=0)
+
+    def _exported_ids(self, above):
+        """Ids above the given id that are already in the review parts."""
+        parts = os.path.join(self._parts_dir, "*.parquet")
+        if not glob.glob(parts):
+            return set()
+        con = duckdb.connect()
+        try:
+            return {row[0] for row in con.execute(f"SELECT id FROM read_parquet('{parts}') WHERE id > ?", [above]).fetchall()}
+        finally:
+            con.close()
+
+    def refresh(self, chunk_size=100000):
+        """
+        Brings the Parquet snapshot up to date with the primary database.
+        A no-op for the 'sql' backend.
+        """
+        if self.backend != "duckdb":
+            return 0
+        os.makedirs(self._parts_dir, exist_ok=True)
+        os.makedirs(self._labels_dir, exist_ok=True)
+        with self._refresh_lock():
+            exported = self._export_reviews(chunk_size)
+            labels = self._export_labels()
+        self._duck = None # re-create views over the new files
+        logger.info(f"Analytics snapshot refreshed: {exported} new reviews, {labels} labels exported.")
+        return exported
+
+    def _export_reviews(self, chunk_size):
+        low = max(self._snapshot_high_water_mark() - Config.ANALYTICS_ID_OVERLAP, 0)
+        exported_ids = self._exported_ids(low)
+        exported = 0
+        query = text(f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM reviews WHERE id > :low ORDER BY id")
+        with self.db_handler.engine.connect() as conn:
+            for chunk in pd.read_sql(query, conn, params={"low": low}, chunksize=chunk_size):
+                chunk = chunk[~chunk['id'].isin(exported_ids)]
+                if chunk.empty:
+                    continue
+                chunk = chunk.assign(created_at=pd.to_datetime(chunk['created_at'], errors='coerce'))
+                path = os.path.join(self._parts_dir, f"part-{int(chunk['id'].min()):012d}-{int(chunk['id'].max()):012d}.parquet")
+                if os.path.exists(path): # a late id inside an exported range
+                    path = path.replace(".parquet", f"-{datetime.datetime.now():%Y%m%d%H%M%S%f}.parquet")
+                self._write_parquet(chunk, path)
+                exported += len(chunk)
+        return exported
+
+    def _export_labels(self):
+        """
+        Appends the labels updated since the last export as a new part; re-exports all labels
+        into one part the first time and whenever ANALYTICS_LABEL_MAX_PARTS parts exist.
+        """
+        state = self._read_state()
+        since = state.get("labels_since")
+        existing = sorted(glob.glob(os.path.join(self._labels_dir, "*.parquet")))
+        full = since is None or not existing or len(existing) >= Config.ANALYTICS_LABEL_MAX_PARTS
+        query = f"SELECT {', '.join(LABEL_COLUMNS)} FROM reviews"
+        params = {}
+        if not full:
+            query += " WHERE updated_at >= :since"
+            params["since"] = datetime.datetime.fromisoformat(since)
+        with self.db_handler.engine.connect() as conn:
+            labels = pd.read_sql(text(query), conn, params=params)
+        sequence = state.get("labels_sequence", 0) + 1
+        if not labels.empty or full:
+            labels['is_duplicate'] = labels['is_duplicate'].fillna(False).astype(bool)
+            labels['updated_at'] = pd.to_datetime(labels['updated_at'], errors='coerce')
+            self._write_parquet(labels, os.path.join(self._labels_dir, f"part-{sequence:012d}.parquet"))
+            state["labels_sequence"] = sequence
+            if full:
+                for path in existing: # superseded by the full part
+                    os.remove(path)
+            legacy_path = os.path.join(self.snapshot_dir, "labels.parquet") # single-file layout of earlier versions
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+        latest = labels['updated_at'].max() if not labels.empty else None
+        if pd.notna(latest):
+            # Measured on the writers' stamps, not this clock; the overlap covers late commits
+            state["labels_since"] = (latest.to_pydatetime() - datetime.timedelta(seconds=Config.ANALYTICS_LABEL_OVERLAP_SECONDS)).isoformat()
+        elif since is None:
+            state["labels_since"] = datetime.datetime(1970, 1, 1).isoformat()
+        self._write_state(state)
+        return len(labels)
+
+    def _write_parquet(self, df, path):
+        tmp_path = path + ".tmp"
+        con = duckdb.connect()
+        try:
+            con.register("frame", df)
+            columns = ", ".join(f'CAST("{c}" AS {PARQUET_TYPES.get(c, "VARCHAR")}) AS "{c}"' for c in df.columns)
+            con.execute(f"COPY (SELECT {columns} FROM frame) TO '{tmp_path}' (FORMAT PARQUET)")
+        finally:
+            con.close()
+        os.replace(tmp_path, path) # readers never see a half-written file
+
+    def _duckdb(self):
+        if self._duck is None:
+            if not glob.glob(os.path.join(self._parts_dir, "*.parquet")):
+                self.refresh()
+            con = duckdb.connect()
+            parts = os.path.join(self._parts_dir, "*.parquet")
+            labels = os.path.join(self._labels_dir, "*.parquet")
+            if glob.glob(parts) and glob.glob(labels):
+                # One row per id: overlapping exports may repeat a review, and the newest label part wins.
+                # The labels are resolved once per snapshot into a small in-memory table.
+                review_columns = ", ".join(f"any_value({c}) AS {c}" for c in SNAPSHOT_COLUMNS[1:])
+                con.execute(f"""
+                    CREATE TABLE labels AS
+                    SELECT id, arg_max(sentiment, filename) AS sentiment, arg_max(is_duplicate, filename) AS is_duplicate
+                    FROM read_parquet('{labels}', filename = true) GROUP BY id
+                """)
+                con.execute(f"""
+                    CREATE VIEW reviews AS
+                    SELECT r.*, CAST(l.sentiment AS VARCHAR) AS sentiment, l.is_duplicate
+                    FROM (SELECT id, {review_columns} FROM read_parquet('{parts}') GROUP BY id) r
+                    LEFT JOIN labels l USING (id)
+                """)
+            else:
+                columns = ", ".join(f"NULL::VARCHAR AS {c}" for c in SNAPSHOT_COLUMNS[1:] + ["sentiment"])
+                con.execute(f"CREATE VIEW reviews AS SELECT NULL::BIGINT AS id, {columns}, NULL::BOOLEAN AS is_duplicate WHERE FALSE")
+            self._duck = con
+        return self._duck
+
+    # --- query execution ---
+
+    def query(self, sql, params=None):
+        """
+        Runs a SELECT against the 'reviews' relation and returns a DataFrame.
+        Parameters use :name placeholders on both backends.
+        """
+        params = params or {}
+        if self.backend == "duckdb":
+            duck_sql = re.sub(r':(\w+)', r'$\1', sql)
+            return self._duckdb().execute(duck_sql, params).fetchdf()
+        with self.db_handler.engine.connect() as conn:
+            return pd.read_sql(text(sql), conn, params=params)
+
+    def _date_expression(self):
+        if self.backend == "duckdb" or self.db_handler.engine.dialect.name == "mysql":
+            return "CAST(created_at AS DATE)"
+        return "date(created_at)"
+
+    def _where(self, product_name=None, exclude_duplicates=True):
+        conditions, params = ["1 = 1"], {}
+        if exclude_duplicates:
+            conditions.append("NOT COALESCE(is_duplicate, FALSE)")
+        if product_name:
+            conditions.append("product_name = :product_name")
+            params["product_name"] = product_name
+        return " AND ".join(conditions), params
+
+    # --- aggregates used by ReportGenerator and the dashboard ---
+
+    def overview(self, product_name=None, exclude_duplicates=True):
+        where, params = self._where(product_name, exclude_duplicates=False)
+        keep = "NOT COALESCE(is_duplicate, FALSE)" if exclude_duplicates else "TRUE"
+        row = self.query(f"""
+            SELECT COUNT(*) AS all_reviews,
+                   SUM(CASE WHEN {keep} THEN 1 ELSE 0 END) AS total_reviews,
+                   COUNT(DISTINCT CASE WHEN {keep} THEN product_name END) AS unique_products,
+                   AVG(CASE WHEN {keep} THEN rating END) AS average_rating,
+                   SUM(CASE WHEN {keep} AND sentiment = 'positive' THEN 1 ELSE 0 END) AS positive_reviews
+            FROM reviews WHERE {where}
+        """, params).iloc[0]
+        total_reviews = int(row['total_reviews'] or 0)
+        return {
+            "total_reviews": total_reviews,
+            "unique_products": int(row['unique_products'] or 0),
+            "average_rating": float(row['average_rating']) if pd.notna(row['average_rating']) else None,
+            "positive_reviews": int(row['positive_reviews'] or 0),
+            "duplicates_excluded": int(row['all_reviews'] or 0) - total_reviews,
+        }
+
+    def sentiment_distribution(self, product_name=None, exclude_duplicates=True):
+        """Share of each sentiment label among scored reviews (pd.Series, label -> fraction)."""
+        where, params = self._where(product_name, exclude_duplicates)
+        df = self.query(f"""
+            SELECT sentiment, COUNT(*) AS n FROM reviews
+            WHERE {where} AND sentiment IS NOT NULL
+            GROUP BY sentiment ORDER BY n DESC
+        """, params)
+        if df.empty:
+            return pd.Series(dtype=float)
+        return pd.Series(df['n'].values / df['n'].sum(), index=df['sentiment'].values)
+
+    def product_stats(self, exclude_duplicates=True):
+        where, params = self._where(None, exclude_duplicates)
+        df = self.query(f"""
+            SELECT product_name AS 상품명, COUNT(review_title) AS total_reviews, AVG(rating) AS average_rating
+            FROM reviews WHERE {where}
+            GROUP BY product_name ORDER BY total_reviews DESC
+        """, params)
+        df['average_rating'] = df['average_rating'].astype(float).round(2)
+        return df
+
+    def top_products(self, order_by="total_reviews", limit=5, exclude_duplicates=True):
+        where, params = self._where(None, exclude_duplicates)
+        params["limit"] = int(limit)
+        order = "total_reviews DESC" if order_by == "total_reviews" else "average_rating DESC"
+        return self.query(f"""
+            SELECT product_name AS 상품명, COUNT(*) AS total_reviews, AVG(rating) AS average_rating
+            FROM reviews WHERE {where}
+            GROUP BY product_name ORDER BY {order}, product_name LIMIT :limit
+        """, params)
+
+    def reviews_per_date(self, product_name=None, exclude_duplicates=True):
+        """
+        Review counts per day (pd.Series indexed by date), read from the incrementally
+        maintained review_rollups; computed from the reviews when no rollups exist yet.
+        """
+        rollups = self.db_handler.get_rollups("day", product_name=product_name)
+        if rollups:
+            counts = [row['review_count'] - (row['duplicate_count'] if exclude_duplicates else 0) for row in rollups]
+            return pd.Series(counts, index=[row['period_start'].date() for row in rollups])
+        where, params = self._where(product_name, exclude_duplicates)
+        date_expr = self._date_expression()
+        df = self.query(f"""
+            SELECT {date_expr} AS review_date, COUNT(*) AS n FROM reviews
+            WHERE {where} AND created_at IS NOT NULL
+            GROUP BY {date_expr} ORDER BY review_date
+        """, params)
+        if df.empty:
+            return pd.Series(dtype=int)
+        return pd.Series(df['n'].values, index=pd.to_datetime(df['review_date']).dt.date)
+
+    def summary_stats(self, exclude_duplicates=True):
+        """All figures of the summary report, in the shape ReportGenerator formats."""
+        overview = self.overview(exclude_duplicates=exclude_duplicates)
+        by_count = self.top_products("total_reviews", exclude_duplicates=exclude_duplicates)
+        by_rating = self.top_products("average_rating", exclude_duplicates=exclude_duplicates)
+        return {
+            **overview,
+            "sentiment_distribution": (self.sentiment_distribution(exclude_duplicates=exclude_duplicates) * 100).to_dict(),
+            "top_products_by_count": list(zip(by_count['상품명'], by_count['total_reviews'])),
+            "top_products_by_rating": list(zip(by_rating['상품명'], by_rating['average_rating'].astype(float))),
+            "reviews_per_date": list(self.reviews_per_date(exclude_duplicates=exclude_duplicates).tail(5).items()),
+        }
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from sqlalchemy import select, func
+from src.db.database_handler import Review, ReviewAspect, ReviewAlert, ReviewImage, survey_distribution_query, survey_distribution_rows
+from src.db.engine_registry import database_url, get_async_session_factory
+from src.utils.logger import logger
+
+def _review_dict(review):
+    # Same shape as DatabaseHandler results (column attributes, no ORM state)
+    return {column.name: getattr(review, column.key) for column in Review.__table__.columns}
+
+class AsyncReviewReader:
+    """
+    Read-only queries for the API on an asyncio SQLAlchemy engine (aiomysql / aiosqlite).
+
+    The engine's connections belong to one event loop, so the reader owns a loop
+    running in a daemon thread. Request threads submit coroutines to it with call();
+    concurrent requests are multiplexed on the async pool instead of each holding
+    a sync connection while it waits.
+    """
+    def __init__(self, db_url=None):
+        self.db_url = db_url or database_url()
+        self.Session = get_async_session_factory(self.db_url)
+        self._loop = None
+        if self.Session is not None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="async-db-reader", daemon=True).start()
+            logger.info("AsyncReviewReader initialized.")
+
+    @property
+    def available(self):
+        return self.Session is not None
+
+    def call(self, method, *args, **kwargs):
+        """Runs one of the async query methods on the reader loop and waits for its result."""
+        future = asyncio.run_coroutine_threadsafe(method(*args, **kwargs), self._loop)
+        return future.result()
+
+    async def get_reviews_by_ids(self, review_ids):
+        if not review_ids:
+            return []
+        try:
+            async with self.Session() as session:
+                result = await session.execute(select(Review).where(Review.id.in_(review_ids)))
+                by_id = {review.id: _review_dict(review) for review in result.scalars()}
+            return [by_id[review_id] for review_id in review_ids if review_id in by_id]
+        except Exception as e:
+            logger.error(f"Failed to retrieve reviews by id: {e}")
+            return []
+
+    async def get_aspect_counts(self, product_id=None):
+        try:
+            query = select(ReviewAspect.aspect, ReviewAspect.sentiment, func.count(func.distinct(ReviewAspect.review_id)))
+            if product_id:
+                query = query.where(ReviewAspect.coupang_product_id == product_id)
+            async with self.Session() as session:
+                result = await session.execute(query.group_by(ReviewAspect.aspect, ReviewAspect.sentiment))
+                return [{"aspect": aspect, "sentiment": sentiment, "count": count} for aspect, sentiment, count in result]
+        except Exception as e:
+            logger.error(f"Failed to retrieve aspect counts: {e}")
+            return []
+
+    async def get_aspect_reviews(self, aspect, product_id=None, sentiment=None, limit=50):
+        try:
+            review_ids = select(ReviewAspect.review_id).where(ReviewAspect.aspect == aspect)
+            if product_id:
+                review_ids = review_ids.where(ReviewAspect.coupang_product_id == product_id)
+            if sentiment:
+                review_ids = review_ids.where(ReviewAspect.sentiment == sentiment)
+            query = select(Review).where(Review.id.in_(review_ids.distinct())).order_by(Review.id.desc()).limit(limit)
+            async with self.Session() as session:
+                result = await session.execute(query)
+                return [_review_dict(review) for review in result.scalars()]
+        except Exception as e:
+            logger.error(f"Failed to retrieve reviews for aspect '{aspect}': {e}")
+            return []
+
+    async def get_alerts(self, product_name=None, period=None, since=None, limit=50):
+        try:
+            table = ReviewAlert.__table__
+            query = select(table).order_by(table.c.period_start.desc(), func.abs(table.c.z_score).desc()).limit(limit)
+            if product_name:
+                query = query.where(table.c.product_name == product_name)
+            if period:
+                query = query.where(table.c.period == period)
+            if since is not None:
+                query = query.where(table.c.period_start >= since)
+            async with self.Session() as session:
+                result = await session.execute(query)
+                return [dict(row._mapping) for row in result]
+        except Exception as e:
+            logger.error(f"Failed to retrieve review alerts: {e}")
+            return []
+
+    async def get_survey_distribution(self, product_name=None, question=None):
+        try:
+            query, keys = survey_distribution_query(product_name, question)
+            async with self.Session() as session:
+                return survey_distribution_rows(await session.execute(query), keys)
+        except Exception as e:
+            logger.error(f"Failed to retrieve survey answer distribution: {e}")
+            return []
+
+    async def get_review_images(self, review_ids):
+        if not review_ids:
+            return {}
+        try:
+            table = ReviewImage.__table__
+            query = select(table.c.review_id, table.c.image_url).where(table.c.review_id.in_(list(review_ids))).order_by(table.c.review_id, table.c.position)
+            images = {}
+            async with self.Session() as session:
+                for review_id, image_url in await session.execute(query):
+                    images.setdefault(review_id, []).append(image_url)
+            return images
+        except Exception as e:
+            logger.error(f"Failed to retrieve review images: {e}")
+            return {}
@@ -1,9 +1,12 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Float, Boolean, LargeBinary, ForeignKey, Index, inspect, text, func, update, delete, select, bindparam, case, or_
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from src.config import Config
+from sqlalchemy.exc import IntegrityError
+from src.db.engine_registry import database_url, get_engine, get_session_factory
 from src.utils.logger import logger
+from src.utils import metrics
+from src.etl.records import review_key
 import datetime
+import time
 
 Base = declarative_base()
 
@@ -27,36 +30,322 @@ class Review(Base):
     images = Column(Text) # 이미지 URL들은 세미콜론으로 구분된 문자열로 저장
     survey_response = Column(Text)
     helpful_count = Column(Integer) # 도움수는 숫자로 저장
+    sentiment = Column(String(20)) # (ML) 감성 분석 결과: positive / negative / neutral
+    duplicate_cluster_id = Column(Integer, index=True) # 유사 중복 클러스터 (대표 리뷰 id), 미검사 시 NULL
+    is_duplicate = Column(Boolean, default=False) # 먼저 수집된 리뷰와 거의 같은 복붙/템플릿 리뷰
+    product_key = Column(String(64), index=True) # 링크에서 추출한 상품 키 (products.product_key)
+    updated_at = Column(DateTime, index=True) # 삽입 / 감성 / 중복 플래그 변경 시각 (대시보드 증분 갱신)
 
     def __repr__(self):
         return f"<Review(product_name='{self.product_name}', review_title='{self.review_title}')>"
 
+class ReviewAspect(Base):
+    """Inverted index of aspect mentions: one row per (review, aspect, source)."""
+    __tablename__ = 'review_aspects'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    review_id = Column(Integer, ForeignKey('reviews.id'), nullable=False, index=True)
+    coupang_product_id = Column(String(255))
+    aspect = Column(String(50), nullable=False)
+    source = Column(String(20)) # 'text' (리뷰 제목/본문) 또는 'survey' (설문응답)
+    detail = Column(String(255)) # 매칭된 키워드 또는 설문 답변
+    sentiment = Column(String(20)) # 리뷰 감성 결과를 복사해 두어 집계 시 조인 불필요
+
+    __table_args__ = (
+        Index('ix_review_aspects_lookup', 'aspect', 'coupang_product_id', 'sentiment'),
+        Index('ix_review_aspects_product', 'coupang_product_id', 'aspect'),
+    )
+
+class ReviewSurveyAnswer(Base):
+    """설문응답 parsed into one row per (review, question, answer)."""
+    __tablename__ = 'review_survey_answers'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    review_id = Column(Integer, ForeignKey('reviews.id'), nullable=False, index=True)
+    product_name = Column(String(255)) # 리뷰의 상품명 복사 (상품별 집계 시 조인 불필요)
+    question = Column(String(100), nullable=False)
+    answer = Column(String(255), nullable=False)
+
+    __table_args__ = (
+        Index('ix_review_survey_answers_answer', 'question', 'answer', 'product_name'),
+        Index('ix_review_survey_answers_product', 'product_name', 'question', 'answer'),
+    )
+
+class ReviewImage(Base):
+    """이미지들 parsed into one row per (review, image URL)."""
+    __tablename__ = 'review_images'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    review_id = Column(Integer, ForeignKey('reviews.id'), nullable=False, index=True)
+    position = Column(Integer, nullable=False) # 리뷰 내 이미지 순서
+    image_url = Column(String(1000), nullable=False)
+
+class SurveyAnswerCount(Base):
+    """Precomputed answer distribution: reviews per (product, question, answer), kept current on insert."""
+    __tablename__ = 'survey_answer_counts'
+
+    product_name = Column(String(255), primary_key=True)
+    question = Column(String(100), primary_key=True)
+    answer = Column(String(255), primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime)
+
+class ReviewSignature(Base):
+    """MinHash signature of a review's 리뷰본문 (num_perm uint32 values)."""
+    __tablename__ = 'review_signatures'
+
+    review_id = Column(Integer, ForeignKey('reviews.id'), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+class ReviewLshBucket(Base):
+    """LSH band buckets: reviews sharing a band_key are near-duplicate candidates."""
+    __tablename__ = 'review_lsh_buckets'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    band_key = Column(BigInteger, nullable=False, index=True)
+    review_id = Column(Integer, ForeignKey('reviews.id'), nullable=False)
+
+class Product(Base):
+    """Product registry shared by all keywords and jobs, keyed by the link's productId/vendorItemId."""
+    __tablename__ = 'products'
+
+    product_key = Column(String(64), primary_key=True) # '<productId>:<vendorItemId>'
+    link_product_id = Column(String(32), index=True)
+    vendor_item_id = Column(String(32))
+    product_name = Column(String(255))
+    price = Column(String(50)) # 마지막으로 검색 결과에서 본 가격 (예약 수집 작업에 사용)
+    link = Column(Text)
+    first_seen_at = Column(DateTime)
+    last_crawled_at = Column(DateTime) # 마지막으로 리뷰 수집을 끝낸 시각
+    last_crawl_mode = Column(String(20)) # full / incremental
+    review_count = Column(Integer, default=0) # 수집해 저장한 리뷰 수 (누적)
+    newest_review_date = Column(DateTime) # 수집된 리뷰 중 가장 최근 작성일 (증분 수집 기준)
+    crawl_lease_owner = Column(String(64)) # 수집 중인 작업 (동시 작업이 같은 상품을 중복 수집하지 않도록)
+    crawl_lease_until = Column(DateTime)
+    crawl_seconds = Column(Float) # 리뷰 수집에 쓴 브라우저 시간 (초, 지수이동평균) - 스케줄러 예산 추정
+
+class ProductKeyword(Base):
+    """Which search keywords surfaced a product."""
+    __tablename__ = 'product_keywords'
+
+    product_key = Column(String(64), ForeignKey('products.product_key'), primary_key=True)
+    keyword = Column(String(255), primary_key=True, index=True)
+    last_seen_at = Column(DateTime)
+
+class CrawlTask(Base):
+    """Distributed crawl work item: a keyword, one of its search pages, or one product."""
+    __tablename__ = 'crawl_tasks'
+    __table_args__ = (
+        Index('ix_crawl_tasks_claim', 'status', 'available_at'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_type = Column(String(20), nullable=False) # keyword / search / product
+    dedupe_key = Column(String(255), nullable=False, index=True) # 같은 작업이 대기/진행 중이면 다시 등록하지 않음
+    keyword = Column(String(255))
+    page = Column(Integer)
+    product_key = Column(String(64))
+    payload = Column(Text) # JSON (pages, 상품명/가격/링크 ...)
+    status = Column(String(20), nullable=False, default='pending') # pending / leased / done / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False) # 재시도 대기 (백오프)
+    lease_owner = Column(String(64))
+    lease_until = Column(DateTime) # visibility timeout: 이 시각까지 하트비트가 없으면 다른 워커가 가져감
+    heartbeat_at = Column(DateTime)
+    created_at = Column(DateTime, nullable=False)
+    completed_at = Column(DateTime)
+    result_count = Column(Integer)
+    last_error = Column(Text)
+
+class CrawlWatch(Base):
+    """Watchlist of keywords and products the scheduler crawls on a recurring basis."""
+    __tablename__ = 'crawl_watchlist'
+    __table_args__ = (
+        Index('ix_crawl_watchlist_target', 'kind', 'target', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(20), nullable=False) # keyword / product
+    target = Column(String(255), nullable=False) # 키워드 또는 product_key
+    pages = Column(Integer, default=1) # keyword: 다시 검색할 검색 결과 페이지 수
+    enabled = Column(Boolean, nullable=False, default=True)
+    added_at = Column(DateTime)
+    last_scheduled_at = Column(DateTime)
+
+class CrawlBudget(Base):
+    """Browser seconds reserved by the scheduler per day."""
+    __tablename__ = 'crawl_budget'
+
+    day = Column(DateTime, primary_key=True)
+    reserved_seconds = Column(Float, nullable=False, default=0.0)
+
+class ReviewRollup(Base):
+    """Per-product daily / weekly review aggregates, kept current by insert, sentiment and duplicate updates."""
+    __tablename__ = 'review_rollups'
+
+    period = Column(String(10), primary_key=True) # day / week
+    period_start = Column(DateTime, primary_key=True) # 작성일 기준 일자 (week: 해당 주 월요일)
+    product_name = Column(String(255), primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0) # 평균 평점 = rating_sum / review_count
+    scored_count = Column(Integer, nullable=False, default=0) # 감성 라벨이 있는 리뷰 수
+    negative_count = Column(Integer, nullable=False, default=0) # 부정 비율 = negative_count / scored_count
+    duplicate_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, index=True) # AnomalyDetector re-checks buckets updated since its last run
+
+class ReviewAlert(Base):
+    """An anomalous rollup bucket found by AnomalyDetector (one row per bucket and metric)."""
+    __tablename__ = 'review_alerts'
+    __table_args__ = (
+        Index('ix_review_alerts_bucket', 'product_name', 'period', 'period_start', 'metric', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_name = Column(String(255), nullable=False)
+    period = Column(String(10), nullable=False)
+    period_start = Column(DateTime, nullable=False, index=True)
+    metric = Column(String(20), nullable=False) # negative_share / rating / review_count
+    value = Column(Float)
+    baseline_mean = Column(Float)
+    baseline_std = Column(Float)
+    z_score = Column(Float)
+    review_count = Column(Integer)
+    detected_at = Column(DateTime)
+
+ROLLUP_PERIODS = ("day", "week")
+ROLLUP_COUNTERS = ("review_count", "rating_sum", "scored_count", "negative_count", "duplicate_count")
+
+def rollup_period_start(created_at, period):
+    """Start of the day (or of the Monday-based week) a review date falls in."""
+    day = datetime.datetime(created_at.year, created_at.month, created_at.day)
+    return day - datetime.timedelta(days=day.weekday()) if period == "week" else day
+
+def _add_rollup_contribution(deltas, product_name, created_at, rating, sentiment, is_duplicate, sign=1):
+    """Adds (sign=1) or removes (sign=-1) one review's counts in {(period, period_start, product_name): [counters]}."""
+    if created_at is None or not product_name:
+        return
+    values = (1, rating or 0.0, 1 if sentiment else 0, 1 if sentiment == 'negative' else 0, 1 if is_duplicate else 0)
+    for period in ROLLUP_PERIODS:
+        counters = deltas.setdefault((period, rollup_period_start(created_at, period), product_name), [0, 0.0, 0, 0, 0])
+        for index, value in enumerate(values):
+            counters[index] += sign * value
+
+def survey_rows(review_id, product_name, survey_answers):
+    """review_survey_answers rows for one review; a repeated (question, answer) pair is stored once."""
+    rows = {}
+    for question, answer in survey_answers:
+        question, answer = question[:100], answer[:255]
+        rows.setdefault((question, answer), {"review_id": review_id, "product_name": product_name, "question": question, "answer": answer})
+    return list(rows.values())
+
+def image_rows(review_id, image_urls):
+    return [{"review_id": review_id, "position": position, "image_url": url[:1000]} for position, url in enumerate(image_urls)]
+
+def survey_distribution_query(product_name=None, question=None, product_names=None):
+    """(query, result keys) for an answer distribution, per product when product_name(s) is given."""
+    table = SurveyAnswerCount.__table__
+    per_product = product_name is not None or product_names is not None
+    columns = [table.c.product_name] if per_product else []
+    query = (select(*columns, table.c.question, table.c.answer, func.sum(table.c.review_count))
+             .group_by(*columns, table.c.question, table.c.answer))
+    if product_name is not None:
+        query = query.where(table.c.product_name == product_name)
+    if product_names is not None:
+        query = query.where(table.c.product_name.in_(list(product_names)))
+    if question is not None:
+        query = query.where(table.c.question == question)
+    return query, (["product_name"] if per_product else []) + ["question", "answer", "count"]
+
+def survey_distribution_rows(result, keys):
+    rows = [dict(zip(keys, row)) for row in result]
+    for row in rows:
+        row["count"] = int(row["count"])
+    rows.sort(key=lambda row: (row.get("product_name") or "", row["question"], -row["count"]))
+    return survey_shares(rows)
+
+def survey_shares(rows):
+    """Adds 'share' (count / reviews answering the question) to answer count rows, per product when rows have one."""
+    totals = {}
+    for row in rows:
+        key = (row.get("product_name"), row["question"])
+        totals[key] = totals.get(key, 0) + row["count"]
+    for row in rows:
+        row["share"] = row["count"] / totals[(row.get("product_name"), row["question"])]
+    return rows
+
 class DatabaseHandler:
-    def __init__(self):
-        self.engine = self._create_engine()
-        self.Session = sessionmaker(bind=self.engine)
+    def __init__(self, db_url=None):
+        self.db_url = db_url or database_url()
+        # Engines and sessions are shared per process; see engine_registry
+        self.engine = get_engine(self.db_url)
+        self.Session = get_session_factory(self.db_url) # thread-scoped: each thread gets its own Session
+        self.insert_hooks = []
+        self.sentiment_hooks = []
 
-    def _create_engine(self):
-        db_url = f"mysql+pymysql://{Config.DB_USER}:{Config.DB_PASSWORD}@{Config.DB_HOST}/{Config.DB_NAME}"
-        try:
-            engine = create_engine(db_url, echo=False) # echo=True for SQL logging
-            logger.info("Database engine created successfully.")
-            return engine
-        except Exception as e:
-            logger.error(f"Failed to create database engine: {e}")
-            raise
+    def add_insert_hook(self, hook):
+        """
+        Registers a callable run after every successful insert_reviews() commit.
+        It receives the inserted review dicts (Korean keys plus the new 'id').
+        """
+        self.insert_hooks.append(hook)
+
+    def add_sentiment_hook(self, hook):
+        """
+        Registers a callable run after every successful update_sentiments() commit.
+        It receives the stored labels ({review_id: label}).
+        """
+        self.sentiment_hooks.append(hook)
+
+    def _run_insert_hooks(self, reviews_data, hooks=None):
+        for hook in self.insert_hooks if hooks is None else hooks:
+            try:
+                with metrics.timed(metrics.INSERT_HOOK_SECONDS.labels(hook=getattr(hook, '__qualname__', type(hook).__name__))):
+                    hook(reviews_data)
+            except Exception as e:
+                # Derived indexes can be rebuilt; never fail the insert because of them
+                logger.error(f"Insert hook {getattr(hook, '__qualname__', hook)} failed: {e}")
 
     def create_tables(self):
         try:
             Base.metadata.create_all(self.engine)
+            self._ensure_columns()
             logger.info("Database tables created or already exist.")
         except Exception as e:
             logger.error(f"Failed to create tables: {e}")
             raise
 
+    def _ensure_columns(self):
+        """
+        Adds columns that were introduced after a table was first created.
+        create_all() only creates missing tables, so existing deployments need this.
+        """
+        inspector = inspect(self.engine)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=self.engine.dialect)
+                with self.engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    for index in table.indexes:
+                        if [indexed.name for indexed in index.columns] == [column.name]:
+                            index.create(conn)
+                logger.info(f"Added missing column {table.name}.{column.name}.")
+
     def insert_reviews(self, reviews_data):
+        """
+        Inserts transformed reviews with their aspect postings, survey answers and images.
+        Each review dict gets its new database id under 'id'; the ids are also returned.
+        """
+        start = time.perf_counter()
+        now = datetime.datetime.now()
         session = self.Session()
         try:
+            pending = []
             for review_dict in reviews_data:
                 # Convert '평점' to float, '도움수' to int, '작성일' to datetime
                 try:
@@ -86,10 +375,46 @@ class DatabaseHandler:
                     actual_purchase_product_name=review_dict.get('실제구매상품명', ''),
                     images=review_dict.get('이미지들', ''),
                     survey_response=review_dict.get('설문응답', ''),
-                    helpful_count=review_dict.get('도움수', 0)
+                    helpful_count=review_dict.get('도움수', 0),
+                    product_key=review_dict.get('상품키'),
+                    updated_at=now
                 )
                 session.add(review)
+                pending.append((review, review_dict))
+
+            # Flush once to obtain review ids for the aspect postings
+            session.flush()
+            for review, review_dict in pending:
+                review_dict['id'] = review.id
+                for mention in review_dict.get('측면', []):
+                    session.add(ReviewAspect(
+                        review_id=review.id,
+                        coupang_product_id=review.coupang_product_id,
+                        aspect=mention['aspect'],
+                        source=mention.get('source'),
+                        detail=mention.get('detail'),
+                        sentiment=review.sentiment
+                    ))
+            answers, images, answer_deltas = [], [], {}
+            for review, review_dict in pending:
+                for row in survey_rows(review.id, review.product_name, review_dict.get('설문답변') or ()):
+                    answers.append(row)
+                    key = (review.product_name, row["question"], row["answer"])
+                    answer_deltas[key] = answer_deltas.get(key, 0) + 1
+                images.extend(image_rows(review.id, review_dict.get('이미지목록') or ()))
+            if answers:
+                session.execute(ReviewSurveyAnswer.__table__.insert(), answers)
+            if images:
+                session.execute(ReviewImage.__table__.insert(), images)
+            self._apply_survey_counts(session, answer_deltas)
+            self._update_product_stats(session, [review for review, _ in pending])
+            deltas = {}
+            for review, _ in pending:
+                _add_rollup_contribution(deltas, review.product_name, review.created_at, review.rating, review.sentiment, review.is_duplicate)
+            self._apply_rollup_deltas(session, deltas)
             session.commit()
+            metrics.INSERT_BATCH_SECONDS.observe(time.perf_counter() - start)
+            metrics.INSERT_ROWS.inc(len(pending))
             logger.info(f"Successfully inserted {len(reviews_data)} reviews into the database.")
         except Exception as e:
             session.rollback()
@@ -98,6 +423,9 @@ class DatabaseHandler:
         finally:
             session.close()
 
+        self._run_insert_hooks(reviews_data)
+        return [review_dict['id'] for _, review_dict in pending]
+
     def get_all_reviews(self):
         session = self.Session()
         try:
@@ -108,3 +436,856 @@ class DatabaseHandler:
             return []
         finally:
             session.close()
+
+    def iter_reviews(self, chunk_size=5000):
+        """
+        Yields every review as lists of at most chunk_size dicts, in id order. Pages by id
+        (keyset), so each chunk is one indexed range read and memory stays flat.
+        """
+        last_id = 0
+        while True:
+            session = self.Session()
+            try:
+                reviews = session.query(Review).filter(Review.id > last_id).order_by(Review.id).limit(chunk_size).all()
+                chunk = [review.__dict__ for review in reviews]
+            finally:
+                session.close()
+            if not chunk:
+                return
+            last_id = chunk[-1]['id']
+            yield chunk
+
+    def get_review_versions(self, last_id=0, since=None):
+        """
+        (id, updated_at) of reviews inserted after last_id or updated (sentiment, duplicate
+        flags) at or after since: a narrow read to find what changed since a cached copy.
+        """
+        session = self.Session()
+        try:
+            condition = Review.id > last_id
+            if since is not None:
+                condition = or_(condition, Review.updated_at >= since)
+            return session.query(Review.id, Review.updated_at).filter(condition).order_by(Review.id).all()
+        except Exception as e:
+            logger.error(f"Failed to retrieve changed reviews: {e}")
+            return []
+        finally:
+            session.close()
+
+    def get_reviews_by_ids(self, review_ids):
+        """
+        Returns reviews for the given ids in the same order (ids that no longer exist are skipped).
+        """
+        if not review_ids:
+            return []
+        session = self.Session()
+        try:
+            reviews = session.query(Review).filter(Review.id.in_(review_ids)).all()
+            by_id = {review.id: review.__dict__ for review in reviews}
+            return [by_id[review_id] for review_id in review_ids if review_id in by_id]
+        except Exception as e:
+            logger.error(f"Failed to retrieve reviews by id: {e}")
+            return []
+        finally:
+            session.close()
+
+    def update_sentiments(self, sentiments):
+        """
+        Persists sentiment labels ({review_id: label}) on reviews and their aspect postings.
+        Returns the updated_at the reviews were stamped with.
+        """
+        if not sentiments:
+            return None
+        now = datetime.datetime.now()
+        session = self.Session()
+        try:
+            params = [{"rid": int(review_id), "label": label} for review_id, label in sentiments.items()]
+            previous = self._rollup_rows(session, [param["rid"] for param in params])
+            session.execute(
+                update(Review.__table__).where(Review.__table__.c.id == bindparam("rid"))
+                .values(sentiment=bindparam("label"), updated_at=now),
+                params
+            )
+            session.execute(
+                update(ReviewAspect.__table__).where(ReviewAspect.__table__.c.review_id == bindparam("rid")).values(sentiment=bindparam("label")),
+                params
+            )
+            labels = {param["rid"]: param["label"] for param in params}
+            deltas = {}
+            for review_id, product_name, created_at, rating, sentiment, is_duplicate in previous:
+                _add_rollup_contribution(deltas, product_name, created_at, rating, sentiment, is_duplicate, sign=-1)
+                _add_rollup_contribution(deltas, product_name, created_at, rating, labels[review_id], is_duplicate)
+            self._apply_rollup_deltas(session, deltas)
+            session.commit()
+            logger.info(f"Stored sentiment for {len(params)} reviews.")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to update sentiments: {e}")
+            raise
+        finally:
+            session.close()
+
+        self._run_insert_hooks(sentiments, hooks=self.sentiment_hooks)
+        return now
+
+    def get_aspect_counts(self, product_id=None):
+        """
+        Returns aspect mention counts per sentiment, e.g.
+        [{'aspect': '배송', 'sentiment': 'negative', 'count': 12}, ...].
+        Served from the review_aspects index; review text is never scanned.
+        """
+        session = self.Session()
+        try:
+            query = session.query(ReviewAspect.aspect, ReviewAspect.sentiment, func.count(func.distinct(ReviewAspect.review_id)))
+            if product_id:
+                query = query.filter(ReviewAspect.coupang_product_id == product_id)
+            rows = query.group_by(ReviewAspect.aspect, ReviewAspect.sentiment).all()
+            return [{"aspect": aspect, "sentiment": sentiment, "count": count} for aspect, sentiment, count in rows]
+        except Exception as e:
+            logger.error(f"Failed to retrieve aspect counts: {e}")
+            return []
+        finally:
+            session.close()
+
+    def get_aspect_reviews(self, aspect, product_id=None, sentiment=None, limit=50):
+        """
+        Drill-down: returns reviews mentioning an aspect, optionally narrowed to a product and sentiment.
+        """
+        session = self.Session()
+        try:
+            review_ids = session.query(ReviewAspect.review_id).filter(ReviewAspect.aspect == aspect)
+            if product_id:
+                review_ids = review_ids.filter(ReviewAspect.coupang_product_id == product_id)
+            if sentiment:
+                review_ids = review_ids.filter(ReviewAspect.sentiment == sentiment)
+            reviews = (session.query(Review)
+                       .filter(Review.id.in_(review_ids.distinct()))
+                       .order_by(Review.id.desc())
+                       .limit(limit)
+                       .all())
+            return [review.__dict__ for review in reviews]
+        except Exception as e:
+            logger.error(f"Failed to retrieve reviews for aspect '{aspect}': {e}")
+            return []
+        finally:
+            session.close()
+
+    def get_lsh_bucket_members(self, band_keys, chunk_size=1000):
+        """
+        Returns {band_key: [review_id, ...]} for the stored buckets among band_keys.
+        """
+        members = {}
+        band_keys = list(band_keys)
+        session = self.Session()
+        try:
+            for start in range(0, len(band_keys), chunk_size):
+                rows = (session.query(ReviewLshBucket.band_key, ReviewLshBucket.review_id)
+                        .filter(ReviewLshBucket.band_key.in_(band_keys[start:start + chunk_size]))
+                        .all())
+                for band_key, review_id in rows:
+                    members.setdefault(band_key, []).append(review_id)
+            return members
+        finally:
+            session.close()
+
+    def get_review_signatures(self, review_ids, chunk_size=1000):
+        """
+        Returns {review_id: (signature_bytes, duplicate_cluster_id)} for signed reviews.
+        """
+        signatures = {}
+        review_ids = list(review_ids)
+        session = self.Session()
+        try:
+            for start in range(0, len(review_ids), chunk_size):
+                rows = (session.query(ReviewSignature.review_id, ReviewSignature.signature, Review.duplicate_cluster_id)
+                        .join(Review, Review.id == ReviewSignature.review_id)
+                        .filter(ReviewSignature.review_id.in_(review_ids[start:start + chunk_size]))
+                        .all())
+                for review_id, signature, cluster_id in rows:
+                    signatures[review_id] = (signature, cluster_id)
+            return signatures
+        finally:
+            session.close()
+
+    def store_near_duplicate_results(self, results):
+        """
+        Persists NearDuplicateDetector output: signatures, LSH buckets and the
+        duplicate_cluster_id / is_duplicate flags on reviews.
+        """
+        if not results:
+            return
+        session = self.Session()
+        try:
+            previous = self._rollup_rows(session, [r["review_id"] for r in results])
+            signatures = [{"review_id": r["review_id"], "signature": r["signature"]} for r in results if r["signature"] is not None]
+            if signatures:
+                session.execute(ReviewSignature.__table__.insert(), signatures)
+            buckets = [{"band_key": key, "review_id": r["review_id"]} for r in results for key in r["band_keys"]]
+            if buckets:
+                session.execute(ReviewLshBucket.__table__.insert(), buckets)
+            session.execute(
+                update(Review.__table__).where(Review.__table__.c.id == bindparam("rid"))
+                .values(duplicate_cluster_id=bindparam("cluster"), is_duplicate=bindparam("dup"), updated_at=datetime.datetime.now()),
+                [{"rid": r["review_id"], "cluster": r["cluster_id"], "dup": r["is_duplicate"]} for r in results]
+            )
+            flags = {r["review_id"]: r["is_duplicate"] for r in results}
+            deltas = {}
+            for review_id, product_name, created_at, rating, sentiment, is_duplicate in previous:
+                if bool(is_duplicate) != bool(flags[review_id]):
+                    _add_rollup_contribution(deltas, product_name, created_at, rating, sentiment, is_duplicate, sign=-1)
+                    _add_rollup_contribution(deltas, product_name, created_at, rating, sentiment, flags[review_id])
+            self._apply_rollup_deltas(session, deltas)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to store near-duplicate results: {e}")
+            raise
+        finally:
+            session.close()
+
+    def _update_product_stats(self, session, reviews):
+        """Adds stored review counts and the newest review date to the registry rows, in the insert transaction."""
+        stats = {}
+        for review in reviews:
+            if not review.product_key:
+                continue
+            count, newest = stats.get(review.product_key, (0, None))
+            if review.created_at and (newest is None or review.created_at > newest):
+                newest = review.created_at
+            stats[review.product_key] = (count + 1, newest)
+        if not stats:
+            return
+        for product in session.query(Product).filter(Product.product_key.in_(list(stats))):
+            count, newest = stats[product.product_key]
+            product.review_count = (product.review_count or 0) + count
+            if newest and (product.newest_review_date is None or newest > product.newest_review_date):
+                product.newest_review_date = newest
+
+    def register_products(self, products, keyword=None, attempts=3):
+        """
+        Upserts products seen on a search page ([{'product_key', 'link_product_id', 'vendor_item_id',
+        'product_name', 'link'}]) and links them to keyword.
+        Returns {product_key: {'last_crawled_at', 'newest_review_date', 'review_count'}}.
+        """
+        if not products:
+            return {}
+        for attempt in range(attempts):
+            try:
+                return self._register_products(products, keyword)
+            except IntegrityError as e:
+                # Another job registered some of the same products first; the retry sees their rows
+                if attempt == attempts - 1:
+                    logger.error(f"Failed to register products: {e}")
+                    raise
+
+    def _register_products(self, products, keyword):
+        now = datetime.datetime.now()
+        by_key = {product['product_key']: product for product in products}
+        session = self.Session()
+        try:
+            existing = {row.product_key: row for row in session.query(Product).filter(Product.product_key.in_(list(by_key)))}
+            for key, product in by_key.items():
+                row = existing.get(key)
+                if row is None:
+                    row = Product(first_seen_at=now, review_count=0, **product)
+                    session.add(row)
+                    existing[key] = row
+                else:
+                    row.product_name, row.link = product['product_name'] or row.product_name, product['link']
+                    row.price = product.get('price') or row.price
+            if keyword:
+                linked = {key for (key,) in session.query(ProductKeyword.product_key)
+                          .filter(ProductKeyword.keyword == keyword, ProductKeyword.product_key.in_(list(by_key)))}
+                session.execute(update(ProductKeyword.__table__)
+                                .where(ProductKeyword.__table__.c.keyword == keyword, ProductKeyword.__table__.c.product_key.in_(list(linked)))
+                                .values(last_seen_at=now))
+                session.add_all(ProductKeyword(product_key=key, keyword=keyword, last_seen_at=now) for key in by_key if key not in linked)
+            session.commit()
+            return {key: {"last_crawled_at": row.last_crawled_at, "newest_review_date": row.newest_review_date,
+                          "review_count": row.review_count or 0} for key, row in existing.items()}
+        except IntegrityError:
+            session.rollback()
+            raise
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to register products: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_product_states(self, product_keys):
+        """{product_key: {'last_crawled_at', 'newest_review_date', 'review_count'}} for registered products."""
+        session = self.Session()
+        try:
+            return {row.product_key: {"last_crawled_at": row.last_crawled_at, "newest_review_date": row.newest_review_date,
+                                      "review_count": row.review_count or 0}
+                    for row in session.query(Product).filter(Product.product_key.in_(list(product_keys)))}
+        except Exception as e:
+            logger.error(f"Failed to retrieve product states: {e}")
+            return {}
+        finally:
+            session.close()
+
+    def claim_product(self, product_key, owner, lease_seconds, crawled_before=None):
+        """
+        Atomically leases a product for crawling (conditional UPDATE, safe across processes).
+        Fails when another job holds an unexpired lease or, with crawled_before, when the
+        product was crawled after that time. Returns the product's crawl state, or None.
+        """
+        now = datetime.datetime.now()
+        session = self.Session()
+        try:
+            table = Product.__table__
+            statement = (
+                update(table)
+                .where(table.c.product_key == product_key)
+                .where((table.c.crawl_lease_until.is_(None)) | (table.c.crawl_lease_until < now) | (table.c.crawl_lease_owner == owner))
+                .values(crawl_lease_owner=owner, crawl_lease_until=now + datetime.timedelta(seconds=lease_seconds))
+            )
+            if crawled_before is not None:
+                statement = statement.where((table.c.last_crawled_at.is_(None)) | (table.c.last_crawled_at < crawled_before))
+            if session.execute(statement).rowcount != 1:
+                session.rollback()
+                return None
+            session.commit()
+            row = session.get(Product, product_key)
+            return {"last_crawled_at": row.last_crawled_at, "newest_review_date": row.newest_review_date,
+                    "review_count": row.review_count or 0}
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to claim product {product_key}: {e}")
+            return None
+        finally:
+            session.close()
+
+    def complete_product_crawl(self, product_key, owner, mode, browser_seconds=None):
+        """
+        Records a finished crawl (time, mode and browser time) and releases the lease.
+        Review counts are updated when the reviews are stored (insert_reviews).
+        """
+        session = self.Session()
+        try:
+            table = Product.__table__
+            values = dict(last_crawled_at=datetime.datetime.now(), last_crawl_mode=mode)
+            if browser_seconds is not None:
+                # Exponential moving average, so the estimate follows full vs incremental crawls
+                values["crawl_seconds"] = case((table.c.crawl_seconds.is_(None), browser_seconds),
+                                               else_=table.c.crawl_seconds * 0.7 + browser_seconds * 0.3)
+            session.execute(update(table).where(table.c.product_key == product_key).values(**values))
+            session.execute(update(table).where(table.c.product_key == product_key, table.c.crawl_lease_owner == owner)
+                            .values(crawl_lease_owner=None, crawl_lease_until=None))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to record crawl of product {product_key}: {e}")
+        finally:
+            session.close()
+
+    def release_product(self, product_key, owner):
+        session = self.Session()
+        try:
+            table = Product.__table__
+            session.execute(update(table).where(table.c.product_key == product_key, table.c.crawl_lease_owner == owner)
+                            .values(crawl_lease_owner=None, crawl_lease_until=None))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to release product {product_key}: {e}")
+        finally:
+            session.close()
+
+    def get_known_review_keys(self, product_key, since):
+        """records.review_key of the stored reviews of a product written on or after since."""
+        session = self.Session()
+        try:
+            rows = (session.query(Review.author, Review.review_title, Review.created_at, Review.review_content)
+                    .filter(Review.product_key == product_key, Review.created_at >= since).all())
+            return {review_key(*row) for row in rows}
+        except Exception as e:
+            logger.error(f"Failed to retrieve known reviews of product {product_key}: {e}")
+            return set()
+        finally:
+            session.close()
+
+    # --- review_rollups / review_alerts ---
+
+    def _rollup_rows(self, session, review_ids, chunk_size=1000):
+        """(id, product_name, created_at, rating, sentiment, is_duplicate) of reviews, i.e. their current rollup contribution."""
+        rows = []
+        table = Review.__table__
+        for start in range(0, len(review_ids), chunk_size):
+            rows.extend(session.execute(
+                select(table.c.id, table.c.product_name, table.c.created_at, table.c.rating, table.c.sentiment, table.c.is_duplicate)
+                .where(table.c.id.in_(review_ids[start:start + chunk_size]))
+            ).all())
+        return rows
+
+    def _apply_rollup_deltas(self, session, deltas, attempts=3):
+        """
+        Adds counter deltas to the rollup buckets in the caller's transaction:
+        one executemany UPDATE for existing buckets, one INSERT for new ones.
+        """
+        pending = {key: counters for key, counters in deltas.items() if any(counters)}
+        if not pending:
+            return
+        table = ReviewRollup.__table__
+        now = datetime.datetime.now()
+        for attempt in range(attempts):
+            existing = set(tuple(row) for row in session.execute(
+                select(table.c.period, table.c.period_start, table.c.product_name)
+                .where(table.c.product_name.in_({key[2] for key in pending}), table.c.period_start >= min(key[1] for key in pending))
+            ))
+            updates = [key for key in pending if key in existing]
+            if updates:
+                session.execute(
+                    update(table)
+                    .where(table.c.period == bindparam("b_period"), table.c.period_start == bindparam("b_start"), table.c.product_name == bindparam("b_product"))
+                    .values(updated_at=now, **{name: table.c[name] + bindparam(f"d_{name}") for name in ROLLUP_COUNTERS}),
+                    [{"b_period": key[0], "b_start": key[1], "b_product": key[2],
+                      **{f"d_{name}": value for name, value in zip(ROLLUP_COUNTERS, pending.pop(key))}} for key in updates]
+                )
+            if not pending:
+                return
+            try:
+                with session.begin_nested(): # a concurrent writer may create the same bucket first
+                    session.execute(table.insert(), [
+                        {"period": key[0], "period_start": key[1], "product_name": key[2], "updated_at": now, **dict(zip(ROLLUP_COUNTERS, counters))}
+                        for key, counters in pending.items()
+                    ])
+                return
+            except IntegrityError:
+                # Those buckets exist now; the next round adds to them
+                if attempt == attempts - 1:
+                    raise
+
+    def _apply_survey_counts(self, session, deltas, attempts=3):
+        """Adds {(product_name, question, answer): reviews} to survey_answer_counts in the caller's transaction."""
+        pending = {key: count for key, count in deltas.items() if count}
+        if not pending:
+            return
+        table = SurveyAnswerCount.__table__
+        now = datetime.datetime.now()
+        for attempt in range(attempts):
+            existing = set(tuple(row) for row in session.execute(
+                select(table.c.product_name, table.c.question, table.c.answer)
+                .where(table.c.product_name.in_({key[0] for key in pending}), table.c.question.in_({key[1] for key in pending}))
+            ))
+            updates = [key for key in pending if key in existing]
+            if updates:
+                session.execute(
+                    update(table)
+                    .where(table.c.product_name == bindparam("b_product"), table.c.question == bindparam("b_question"), table.c.answer == bindparam("b_answer"))
+                    .values(review_count=table.c.review_count + bindparam("d_count"), updated_at=now),
+                    [{"b_product": key[0], "b_question": key[1], "b_answer": key[2], "d_count": pending.pop(key)} for key in updates]
+                )
+            if not pending:
+                return
+            try:
+                with session.begin_nested(): # a concurrent writer may add the same answer first
+                    session.execute(table.insert(), [
+                        {"product_name": key[0], "question": key[1], "answer": key[2], "review_count": count, "updated_at": now}
+                        for key, count in pending.items()
+                    ])
+                return
+            except IntegrityError:
+                if attempt == attempts - 1:
+                    raise
+
+    def backfill_review_details(self, parse_survey, parse_images, chunk_size=5000):
+        """
+        Converts the stored 설문응답 / 이미지들 strings into review_survey_answers and
+        review_images rows (replacing any existing rows, so it can be re-run) and
+        recomputes survey_answer_counts. Returns (answer rows, image rows).
+        """
+        table = Review.__table__
+        answer_table, image_table = ReviewSurveyAnswer.__table__, ReviewImage.__table__
+        answers_total = images_total = 0
+        last_id = 0
+        session = self.Session()
+        try:
+            while True:
+                rows = session.execute(
+                    select(table.c.id, table.c.product_name, table.c.survey_response, table.c.images)
+                    .where(table.c.id > last_id).order_by(table.c.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                answers, images = [], []
+                for review_id, product_name, survey_response, images_text in rows:
+                    answers.extend(survey_rows(review_id, product_name, parse_survey(survey_response or "")))
+                    images.extend(image_rows(review_id, parse_images(images_text or "")))
+                review_ids = [row[0] for row in rows]
+                session.execute(delete(answer_table).where(answer_table.c.review_id.in_(review_ids)))
+                session.execute(delete(image_table).where(image_table.c.review_id.in_(review_ids)))
+                if answers:
+                    session.execute(answer_table.insert(), answers)
+                if images:
+                    session.execute(image_table.insert(), images)
+                session.commit() # one transaction per chunk keeps locks and undo logs small
+                answers_total += len(answers)
+                images_total += len(images)
+
+            counts = SurveyAnswerCount.__table__
+            session.execute(delete(counts))
+            session.execute(counts.insert().from_select(
+                ["product_name", "question", "answer", "review_count", "updated_at"],
+                select(answer_table.c.product_name, answer_table.c.question, answer_table.c.answer,
+                       func.count(answer_table.c.review_id), func.current_timestamp())
+                .where(answer_table.c.product_name.is_not(None))
+                .group_by(answer_table.c.product_name, answer_table.c.question, answer_table.c.answer)
+            ))
+            session.commit()
+            logger.info(f"Backfilled {answers_total} survey answers and {images_total} images up to review id {last_id}.")
+            return answers_total, images_total
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to backfill survey answers and images: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_survey_distribution(self, product_name=None, question=None, product_names=None):
+        """
+        Answer distribution from survey_answer_counts:
+        [{'product_name', 'question', 'answer', 'count', 'share'}] ordered by question and count.
+        Summed over all products (no 'product_name') unless product_name / product_names is given.
+        """
+        query, keys = survey_distribution_query(product_name, question, product_names)
+        session = self.Session()
+        try:
+            return survey_distribution_rows(session.execute(query), keys)
+        except Exception as e:
+            logger.error(f"Failed to retrieve survey answer distribution: {e}")
+            return []
+        finally:
+            session.close()
+
+    def get_review_images(self, review_ids):
+        """{review_id: [image URLs in review order]} for the given reviews."""
+        if not review_ids:
+            return {}
+        table = ReviewImage.__table__
+        session = self.Session()
+        try:
+            images = {}
+            for review_id, image_url in session.execute(
+                    select(table.c.review_id, table.c.image_url).where(table.c.review_id.in_(list(review_ids))).order_by(table.c.review_id, table.c.position)):
+                images.setdefault(review_id, []).append(image_url)
+            return images
+        except Exception as e:
+            logger.error(f"Failed to retrieve review images: {e}")
+            return {}
+        finally:
+            session.close()
+
+    def rebuild_rollups(self, chunk_size=10000):
+        """Recomputes review_rollups from the reviews table (new deployments or after manual edits)."""
+        table = Review.__table__
+        deltas = {}
+        last_id = 0
+        session = self.Session()
+        try:
+            while True:
+                rows = session.execute(
+                    select(table.c.id, table.c.product_name, table.c.created_at, table.c.rating, table.c.sentiment, table.c.is_duplicate)
+                    .where(table.c.id > last_id).order_by(table.c.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                for review_id, product_name, created_at, rating, sentiment, is_duplicate in rows:
+                    _add_rollup_contribution(deltas, product_name, created_at, rating, sentiment, is_duplicate)
+                last_id = rows[-1][0]
+            session.execute(delete(ReviewRollup.__table__))
+            self._apply_rollup_deltas(session, deltas)
+            session.commit()
+            logger.info(f"Rebuilt {len(deltas)} review rollup buckets.")
+            return len(deltas)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to rebuild review rollups: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_changed_rollups(self, since=None):
+        """(period, period_start, product_name) of rollup buckets updated at or after since (all buckets when None)."""
+        table = ReviewRollup.__table__
+        session = self.Session()
+        try:
+            query = select(table.c.period, table.c.period_start, table.c.product_name)
+            if since is not None:
+                query = query.where(table.c.updated_at >= since)
+            return [tuple(row) for row in session.execute(query)]
+        except Exception as e:
+            logger.error(f"Failed to retrieve changed rollups: {e}")
+            return []
+        finally:
+            session.close()
+
+    def get_rollups(self, period="day", product_name=None, since=None):
+        """
+        Rollup buckets ordered by period_start, as dicts with the ROLLUP_COUNTERS.
+        Without product_name the counters are summed over all products.
+        """
+        table = ReviewRollup.__table__
+        session = self.Session()
+        try:
+            if product_name:
+                query = select(table.c.period_start, *(table.c[name] for name in ROLLUP_COUNTERS)).where(table.c.product_name == product_name)
+            else:
+                query = (select(table.c.period_start, *(func.sum(table.c[name]).label(name) for name in ROLLUP_COUNTERS))
+                         .group_by(table.c.period_start))
+            query = query.where(table.c.period == period)
+            if since is not None:
+                query = query.where(table.c.period_start >= since)
+            # SUM() comes back as Decimal on MySQL
+            return [{"period_start": row.period_start, **{name: (float if name == "rating_sum" else int)(getattr(row, name) or 0) for name in ROLLUP_COUNTERS}}
+                    for row in session.execute(query.order_by(table.c.period_start))]
+        except Exception as e:
+            logger.error(f"Failed to retrieve review rollups: {e}")
+            return []
+        finally:
+            session.close()
+
+    def get_product_rollups(self, product_names, period="day", chunk_size=500):
+        """{product_name: [rollup rows ordered by period_start]} for the given products."""
+        table = ReviewRollup.__table__
+        product_names = list(product_names)
+        rollups = {name: [] for name in product_names}
+        session = self.Session()
+        try:
+            for start in range(0, len(product_names), chunk_size):
+                query = (select(table.c.product_name, table.c.period_start, *(table.c[name] for name in ROLLUP_COUNTERS))
+                         .where(table.c.period == period, table.c.product_name.in_(product_names[start:start + chunk_size]))
+                         .order_by(table.c.product_name, table.c.period_start))
+                for row in session.execute(query):
+                    rollups[row.product_name].append({"period_start": row.period_start, **{name: getattr(row, name) for name in ROLLUP_COUNTERS}})
+            return rollups
+        except Exception as e:
+            logger.error(f"Failed to retrieve product rollups: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_rollup_watermarks(self):
+        """{product_name: last rollup update}, i.e. when each product last got new reviews or labels."""
+        table = ReviewRollup.__table__
+        session = self.Session()
+        try:
+            return dict(session.execute(select(table.c.product_name, func.max(table.c.updated_at)).group_by(table.c.product_name)).all())
+        except Exception as e:
+            logger.error(f"Failed to retrieve rollup watermarks: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_keyword_products(self):
+        """{keyword: sorted product names} from the product registry."""
+        session = self.Session()
+        try:
+            keywords = {}
+            rows = (session.query(ProductKeyword.keyword, Product.product_name)
+                    .join(Product, Product.product_key == ProductKeyword.product_key).all())
+            for keyword, product_name in rows:
+                if product_name:
+                    keywords.setdefault(keyword, set()).add(product_name)
+            return {keyword: sorted(names) for keyword, names in keywords.items()}
+        except Exception as e:
+            logger.error(f"Failed to retrieve keyword products: {e}")
+            raise
+        finally:
+            session.close()
+
+    def store_alerts(self, alerts, evaluated):
+        """
+        Replaces the alerts of the evaluated (product_name, period, period_start) buckets with alerts.
+        An alert that was already open keeps its detected_at. Returns the number of new alerts.
+        """
+        if not evaluated:
+            return 0
+        table = ReviewAlert.__table__
+        session = self.Session()
+        try:
+            evaluated = set(evaluated)
+            opened = {}
+            for product_name, period, period_start, metric, detected_at in session.execute(
+                    select(table.c.product_name, table.c.period, table.c.period_start, table.c.metric, table.c.detected_at)
+                    .where(table.c.product_name.in_({key[0] for key in evaluated}), table.c.period_start >= min(key[2] for key in evaluated))):
+                if (product_name, period, period_start) in evaluated:
+                    opened[(product_name, period, period_start, metric)] = detected_at
+            if opened:
+                session.execute(
+                    delete(table).where(table.c.product_name == bindparam("b_product"), table.c.period == bindparam("b_period"),
+                                        table.c.period_start == bindparam("b_start")),
+                    [{"b_product": key[0], "b_period": key[1], "b_start": key[2]} for key in {key[:3] for key in opened}]
+                )
+            new_alerts = 0
+            for alert in alerts:
+                key = (alert["product_name"], alert["period"], alert["period_start"], alert["metric"])
+                if key in opened:
+                    alert = dict(alert, detected_at=opened[key])
+                else:
+                    new_alerts += 1
+                session.execute(table.insert().values(**alert))
+            session.commit()
+            return new_alerts
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to store review alerts: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_alerts(self, product_name=None, period=None, since=None, limit=50, product_names=None):
+        """Alerts, most recent bucket first (and strongest deviation first within a bucket)."""
+        table = ReviewAlert.__table__
+        session = self.Session()
+        try:
+            query = select(table).order_by(table.c.period_start.desc(), func.abs(table.c.z_score).desc())
+            if limit:
+                query = query.limit(limit)
+            if product_name:
+                query = query.where(table.c.product_name == product_name)
+            if product_names is not None:
+                query = query.where(table.c.product_name.in_(list(product_names)))
+            if period:
+                query = query.where(table.c.period == period)
+            if since is not None:
+                query = query.where(table.c.period_start >= since)
+            return [dict(row._mapping) for row in session.execute(query)]
+        except Exception as e:
+            logger.error(f"Failed to retrieve review alerts: {e}")
+            return []
+        finally:
+            session.close()
+
+    # --- crawl scheduler (watchlist, budget) ---
+
+    def add_watch(self, kind, target, pages=1):
+        """Adds (or re-enables) a watchlist entry. Returns its id."""
+        session = self.Session()
+        try:
+            entry = session.query(CrawlWatch).filter(CrawlWatch.kind == kind, CrawlWatch.target == target).one_or_none()
+            if entry is None:
+                entry = CrawlWatch(kind=kind, target=target, pages=pages, enabled=True, added_at=datetime.datetime.now())
+                session.add(entry)
+            else:
+                entry.enabled, entry.pages = True, pages
+            session.commit()
+            return entry.id
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to add {kind} '{target}' to the watchlist: {e}")
+            raise
+        finally:
+            session.close()
+
+    def remove_watch(self, target):
+        """Disables every watchlist entry for target. Returns the number of entries disabled."""
+        session = self.Session()
+        try:
+            table = CrawlWatch.__table__
+            removed = session.execute(update(table).where(table.c.target == target, table.c.enabled == True).values(enabled=False)).rowcount
+            session.commit()
+            return removed
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to remove '{target}' from the watchlist: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_watchlist(self):
+        """Enabled watchlist entries as dicts."""
+        table = CrawlWatch.__table__
+        session = self.Session()
+        try:
+            return [dict(row._mapping) for row in session.execute(select(table).where(table.c.enabled == True).order_by(table.c.id))]
+        except Exception as e:
+            logger.error(f"Failed to retrieve the watchlist: {e}")
+            return []
+        finally:
+            session.close()
+
+    def mark_watch_scheduled(self, watch_id, scheduled_at):
+        session = self.Session()
+        try:
+            table = CrawlWatch.__table__
+            session.execute(update(table).where(table.c.id == watch_id).values(last_scheduled_at=scheduled_at))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to update watchlist entry {watch_id}: {e}")
+        finally:
+            session.close()
+
+    def get_watched_products(self, product_keys, keywords):
+        """
+        Registry rows (product_key, product_name, price, link, last_crawled_at, crawl_seconds)
+        of the given products and of every product found under the given keywords.
+        """
+        table = Product.__table__
+        session = self.Session()
+        try:
+            linked = select(ProductKeyword.__table__.c.product_key).where(ProductKeyword.__table__.c.keyword.in_(list(keywords)))
+            query = (select(table.c.product_key, table.c.product_name, table.c.price, table.c.link, table.c.last_crawled_at, table.c.crawl_seconds)
+                     .where(table.c.product_key.in_(list(product_keys)) | table.c.product_key.in_(linked)))
+            return [dict(row._mapping) for row in session.execute(query)]
+        except Exception as e:
+            logger.error(f"Failed to retrieve watched products: {e}")
+            return []
+        finally:
+            session.close()
+
+    def get_review_velocity(self, since):
+        """{product_name: reviews written since `since`} from the daily rollups."""
+        table = ReviewRollup.__table__
+        session = self.Session()
+        try:
+            rows = session.execute(select(table.c.product_name, func.sum(table.c.review_count))
+                                   .where(table.c.period == "day", table.c.period_start >= since)
+                                   .group_by(table.c.product_name))
+            return {product_name: int(count or 0) for product_name, count in rows}
+        except Exception as e:
+            logger.error(f"Failed to retrieve review velocity: {e}")
+            return {}
+        finally:
+            session.close()
+
+    def get_budget_used(self, day):
+        session = self.Session()
+        try:
+            row = session.get(CrawlBudget, day)
+            return row.reserved_seconds if row else 0.0
+        finally:
+            session.close()
+
+    def reserve_budget(self, day, seconds, limit_seconds):
+        """
+        Reserves browser seconds for day unless that would exceed limit_seconds
+        (conditional UPDATE, so concurrent schedulers share one budget). Returns True on success.
+        """
+        table = CrawlBudget.__table__
+        for attempt in range(2):
+            session = self.Session()
+            try:
+                if session.get(CrawlBudget, day) is None:
+                    if seconds > limit_seconds:
+                        return False
+                    session.add(CrawlBudget(day=day, reserved_seconds=seconds))
+                    session.commit()
+                    return True
+                reserved = session.execute(update(table).where(table.c.day == day, table.c.reserved_seconds + seconds <= limit_seconds)
+                                           .values(reserved_seconds=table.c.reserved_seconds + seconds)).rowcount == 1
+                session.commit()
+                return reserved
+            except IntegrityError:
+                session.rollback() # another scheduler created today's row first; reserve on it
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Failed to reserve crawl budget: {e}")
+                return False
+            finally:
+                session.close()
+        return False
@@ -0,0 +1,153 @@
+import os
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from src.config import Config
+from src.utils.logger import logger
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+except ImportError: # async support needs greenlet
+    create_async_engine = None
+
+# Sync driver -> asyncio driver used by the API's read endpoints
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+_lock = threading.Lock()
+_engines = {}
+_sessions = {}
+_async_engines = {}
+
+def database_url():
+    """
+    Resolves the configured database: DB_URL if set, otherwise DB_BACKEND
+    ('mysql' for the production OLTP server, 'sqlite' for an embedded file).
+    """
+    if Config.DB_URL:
+        return Config.DB_URL
+    if Config.DB_BACKEND == "sqlite":
+        return f"sqlite:///{Config.SQLITE_PATH}"
+    if Config.DB_BACKEND == "mysql":
+        return f"mysql+pymysql://{Config.DB_USER}:{Config.DB_PASSWORD}@{Config.DB_HOST}/{Config.DB_NAME}"
+    raise ValueError(f"Unsupported DB_BACKEND: {Config.DB_BACKEND}")
+
+def _is_sqlite_memory(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def _engine_options(url):
+    options = {"pool_pre_ping": Config.DB_POOL_PRE_PING, "pool_recycle": Config.DB_POOL_RECYCLE}
+    if _is_sqlite_memory(url):
+        # In-memory SQLite lives in a single connection; a sized pool does not apply
+        return options
+    options.update(pool_size=Config.DB_POOL_SIZE, max_overflow=Config.DB_MAX_OVERFLOW, pool_timeout=Config.DB_POOL_TIMEOUT)
+    return options
+
+def _prepare_sqlite_file(url):
+    if url.get_backend_name() == "sqlite" and not _is_sqlite_memory(url):
+        db_dir = os.path.dirname(url.database)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    # WAL lets the dashboard read while the pipeline writes
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+def get_engine(db_url=None):
+    """
+    Returns the process-wide Engine for db_url (default: the configured database),
+    creating it on first use. Every DatabaseHandler on the same URL shares one pool.
+    """
+    db_url = db_url or database_url()
+    engine = _engines.get(db_url)
+    if engine is not None:
+        return engine
+    with _lock:
+        if db_url not in _engines:
+            url = make_url(db_url)
+            _prepare_sqlite_file(url)
+            try:
+                engine = create_engine(url, echo=False, **_engine_options(url)) # echo=True for SQL logging
+            except Exception as e:
+                logger.error(f"Failed to create database engine: {e}")
+                raise
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _configure_sqlite)
+            _engines[db_url] = engine
+            logger.info(f"Database engine created successfully ({engine.dialect.name}, pool: {engine.pool.status()}).")
+        return _engines[db_url]
+
+def get_session_factory(db_url=None):
+    """
+    Returns the process-wide thread-scoped session registry for db_url.
+    Calling it yields the current thread's Session, so crawl threads and
+    request handlers never share a Session object.
+    """
+    db_url = db_url or database_url()
+    factory = _sessions.get(db_url)
+    if factory is not None:
+        return factory
+    engine = get_engine(db_url)
+    with _lock:
+        if db_url not in _sessions:
+            _sessions[db_url] = scoped_session(sessionmaker(bind=engine))
+        return _sessions[db_url]
+
+def get_async_engine(db_url=None):
+    """
+    Returns the process-wide AsyncEngine for db_url, swapping the sync driver for
+    its asyncio counterpart (aiomysql / aiosqlite). Returns None when no async
+    driver is available so callers can fall back to the sync engine.
+    """
+    db_url = db_url or database_url()
+    if db_url in _async_engines:
+        return _async_engines[db_url]
+    with _lock:
+        if db_url not in _async_engines:
+            _async_engines[db_url] = _create_async_engine(db_url)
+        return _async_engines[db_url]
+
+def _create_async_engine(db_url):
+    url = make_url(db_url)
+    async_driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if create_async_engine is None or async_driver is None:
+        logger.warning(f"No async driver for {url.get_backend_name()}. Async reads fall back to the sync engine.")
+        return None
+    options = _engine_options(url)
+    if "pool_size" in options:
+        options["poolclass"] = AsyncAdaptedQueuePool # aiosqlite would otherwise default to NullPool
+    try:
+        engine = create_async_engine(url.set(drivername=async_driver), **options)
+    except Exception as e: # e.g. aiomysql / aiosqlite not installed
+        logger.warning(f"Async engine unavailable ({e}). Async reads fall back to the sync engine.")
+        return None
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _configure_sqlite)
+    logger.info(f"Async database engine created successfully ({async_driver}).")
+    return engine
+
+def get_async_session_factory(db_url=None):
+    engine = get_async_engine(db_url)
+    if engine is None:
+        return None
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+def dispose_engines():
+    """Closes every pooled connection, e.g. in a forked worker or at shutdown."""
+    with _lock:
+        for factory in _sessions.values():
+            factory.remove()
+        for engine in _engines.values():
+            engine.dispose()
+        _sessions.clear()
+        _engines.clear()
+        # Async engines are bound to the event loop that used them; drop them without awaiting
+        _async_engines.clear()
@@ -0,0 +1,180 @@
+import datetime
+import json
+from sqlalchemy import select, insert, update, literal, exists, and_, or_, case, func
+from src.config import Config
+from src.db.database_handler import CrawlTask
+from src.utils.logger import logger
+
+OPEN_STATUSES = ("pending", "leased")
+# Dialects with SELECT ... FOR UPDATE SKIP LOCKED
+ROW_LOCKING_DIALECTS = {"mysql", "mariadb", "postgresql"}
+
+class LeasedTask:
+    """A task leased by one worker. payload is the decoded JSON payload."""
+    def __init__(self, row):
+        self.id = row.id
+        self.task_type = row.task_type
+        self.keyword = row.keyword
+        self.page = row.page
+        self.product_key = row.product_key
+        self.payload = json.loads(row.payload) if row.payload else {}
+        self.attempts = row.attempts
+
+    def __repr__(self):
+        return f"<{self.task_type} task {self.id} attempt {self.attempts}>"
+
+class TaskQueue:
+    """
+    Crawl tasks stored in the crawl_tasks table, shared by workers on any number of nodes.
+
+    lease() picks available tasks with SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8) and
+    takes each with a conditional UPDATE, which is also what keeps SQLite (no row locks)
+    correct. A leased task is invisible to other workers until lease_until; heartbeat()
+    extends it, and a worker that dies simply lets it expire so another worker retries it.
+    complete() and fail() only apply while the caller still holds the lease, so a late
+    worker cannot overwrite a task someone else finished.
+    """
+    def __init__(self, db_handler, lease_seconds=None, max_attempts=None):
+        self.db_handler = db_handler
+        self.lease_seconds = lease_seconds or Config.WORKER_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.WORKER_MAX_ATTEMPTS
+        self.table = CrawlTask.__table__
+
+    # --- producers ---
+
+    def enqueue(self, task_type, dedupe_key, keyword=None, page=None, product_key=None, payload=None):
+        """
+        Adds a task unless one with the same dedupe_key is still pending or leased.
+        Returns True when a task was added. Single INSERT ... SELECT ... WHERE NOT EXISTS statement.
+        """
+        now = datetime.datetime.now()
+        t = self.table
+        values = {
+            "task_type": task_type, "dedupe_key": dedupe_key, "keyword": keyword, "page": page,
+            "product_key": product_key, "payload": json.dumps(payload, ensure_ascii=False) if payload else None,
+            "status": "pending", "attempts": 0, "max_attempts": self.max_attempts,
+            "available_at": now, "created_at": now,
+        }
+        already_open = exists().where(t.c.dedupe_key == dedupe_key, t.c.status.in_(OPEN_STATUSES))
+        statement = insert(t).from_select(
+            list(values),
+            select(*[literal(value, t.c[column].type).label(column) for column, value in values.items()]).where(~already_open)
+        )
+        with self.db_handler.engine.begin() as conn:
+            return conn.execute(statement).rowcount == 1
+
+    def enqueue_keyword(self, keyword, pages=1, discover_only=False):
+        """discover_only: the search pages only register products; the scheduler decides which to crawl."""
+        return self.enqueue("keyword", f"keyword:{keyword}", keyword=keyword, payload={"pages": pages, "discover_only": discover_only})
+
+    def enqueue_search_page(self, keyword, page, discover_only=False):
+        return self.enqueue("search", f"search:{keyword}:{page}", keyword=keyword, page=page,
+                            payload={"discover_only": True} if discover_only else None)
+
+    def enqueue_product(self, keyword, product_key, name, price, link, fresh_hours=None):
+        # 키워드와 무관하게 상품당 하나의 열린 작업만 유지
+        payload = {"name": name, "price": price, "link": link}
+        if fresh_hours is not None:
+            payload["fresh_hours"] = fresh_hours
+        return self.enqueue("product", f"product:{product_key or link}", keyword=keyword, product_key=product_key, payload=payload)
+
+    # --- workers ---
+
+    def lease(self, owner, limit=1):
+        """Leases up to limit available tasks (pending, or leased with an expired visibility timeout)."""
+        now = datetime.datetime.now()
+        t = self.table
+        self._fail_exhausted(now)
+        available = or_(
+            and_(t.c.status == "pending", t.c.available_at <= now),
+            and_(t.c.status == "leased", t.c.lease_until < now),
+        )
+        values = dict(status="leased", lease_owner=owner, lease_until=now + datetime.timedelta(seconds=self.lease_seconds),
+                      heartbeat_at=now, attempts=t.c.attempts + 1)
+        candidates_query = select(t.c.id).where(available).order_by(t.c.available_at, t.c.id).limit(limit * 4)
+        leased = []
+        engine = self.db_handler.engine
+        if engine.dialect.name in ROW_LOCKING_DIALECTS:
+            with engine.begin() as conn:
+                # SKIP LOCKED lets concurrent workers pick different rows instead of queueing on the same ones
+                for task_id in conn.execute(candidates_query.with_for_update(skip_locked=True)).scalars().all():
+                    if conn.execute(update(t).where(t.c.id == task_id, available).values(**values)).rowcount == 1:
+                        leased.append(task_id)
+                        if len(leased) == limit:
+                            break
+        else:
+            # SQLite has no row locks: read outside the write transaction (a read upgraded to a write
+            # fails with SQLITE_BUSY in WAL mode) and let the conditional UPDATE decide who wins
+            with engine.connect() as conn:
+                candidates = conn.execute(candidates_query).scalars().all()
+            for task_id in candidates:
+                with engine.begin() as conn:
+                    if conn.execute(update(t).where(t.c.id == task_id, available).values(**values)).rowcount == 1:
+                        leased.append(task_id)
+                if len(leased) == limit:
+                    break
+        if not leased:
+            return []
+        with engine.connect() as conn:
+            rows = conn.execute(select(t).where(t.c.id.in_(leased)).order_by(t.c.id)).all()
+        return [LeasedTask(row) for row in rows]
+
+    def _fail_exhausted(self, now):
+        # Tasks whose worker died on every attempt would otherwise be retried forever
+        t = self.table
+        with self.db_handler.engine.begin() as conn:
+            result = conn.execute(
+                update(t).where(t.c.status == "leased", t.c.lease_until < now, t.c.attempts >= t.c.max_attempts)
+                .values(status="failed", lease_owner=None, lease_until=None, last_error="lease expired on the last attempt")
+            )
+        if result.rowcount:
+            logger.warning(f"{result.rowcount} crawl tasks failed after their last lease expired.")
+
+    def heartbeat(self, task_id, owner):
+        """Extends the lease. False means the lease was lost (expired and taken by another worker)."""
+        now = datetime.datetime.now()
+        t = self.table
+        with self.db_handler.engine.begin() as conn:
+            result = conn.execute(
+                update(t).where(t.c.id == task_id, t.c.status == "leased", t.c.lease_owner == owner)
+                .values(heartbeat_at=now, lease_until=now + datetime.timedelta(seconds=self.lease_seconds))
+            )
+        return result.rowcount == 1
+
+    def complete(self, task_id, owner, result_count=0):
+        """
+        Marks a leased task done. Idempotent: completing an already finished task is a no-op
+        returning True; False means another worker owns the task now.
+        """
+        t = self.table
+        with self.db_handler.engine.begin() as conn:
+            result = conn.execute(
+                update(t).where(t.c.id == task_id, t.c.status == "leased", t.c.lease_owner == owner)
+                .values(status="done", completed_at=datetime.datetime.now(), result_count=result_count,
+                        lease_owner=None, lease_until=None, last_error=None)
+            )
+            if result.rowcount == 1:
+                return True
+            return conn.execute(select(t.c.status).where(t.c.id == task_id)).scalar() == "done"
+
+    def fail(self, task_id, owner, error, retry_delay=60):
+        """Returns a task to the queue after retry_delay seconds, or marks it failed after max_attempts."""
+        now = datetime.datetime.now()
+        t = self.table
+        with self.db_handler.engine.begin() as conn:
+            conn.execute(
+                update(t).where(t.c.id == task_id, t.c.status == "leased", t.c.lease_owner == owner)
+                .values(status=case((t.c.attempts >= t.c.max_attempts, "failed"), else_="pending"),
+                        available_at=now + datetime.timedelta(seconds=retry_delay),
+                        lease_owner=None, lease_until=None, last_error=str(error)[:2000])
+            )
+
+    def stats(self):
+        """Task counts by type and status."""
+        t = self.table
+        with self.db_handler.engine.connect() as conn:
+            rows = conn.execute(select(t.c.task_type, t.c.status, func.count()).group_by(t.c.task_type, t.c.status)).all()
+        counts = {}
+        for task_type, status, count in rows:
+            counts.setdefault(task_type, {})[status] = count
+        return counts
@@ -0,0 +1,93 @@
+import json
+from src.config import Config
+from src.utils.logger import logger
+
+# 기본 측면(aspect) 사전: 측면 이름 -> 리뷰 텍스트에서 찾을 키워드 목록
+DEFAULT_ASPECT_LEXICON = {
+    "배송": ["배송", "택배", "배달", "도착", "로켓"],
+    "가격": ["가격", "가성비", "저렴", "비싸", "할인", "값어치"],
+    "품질": ["품질", "퀄리티", "마감", "내구성", "불량", "고장", "하자"],
+    "사이즈": ["사이즈", "크기", "치수", "핏이", "작아요", "커요"],
+    "포장": ["포장", "박스", "뽁뽁이", "파손", "찌그러"],
+    "디자인": ["디자인", "색상", "색깔", "예뻐", "예쁘"],
+    "서비스": ["교환", "반품", "환불", "고객센터", "A/S", "AS"],
+}
+
+def parse_survey(survey_text):
+    """
+    Splits a '질문: 답변; 질문: 답변' survey string into (question, answer) pairs.
+    """
+    pairs = []
+    if not survey_text:
+        return pairs
+    for chunk in survey_text.split(";"):
+        if ":" not in chunk:
+            continue
+        question, answer = chunk.split(":", 1)
+        question, answer = question.strip(), answer.strip()
+        if question:
+            pairs.append((question, answer))
+    return pairs
+
+def parse_images(images_text):
+    """
+    Splits a '; '-joined image URL string into its distinct URLs, in order.
+    """
+    if not images_text:
+        return []
+    return list(dict.fromkeys(url.strip() for url in images_text.split(";") if url.strip()))
+
+class AspectExtractor:
+    def __init__(self, lexicon=None):
+        self.lexicon = lexicon or self._load_lexicon()
+        logger.info(f"AspectExtractor initialized with {len(self.lexicon)} aspects.")
+
+    def _load_lexicon(self):
+        if not Config.ASPECT_LEXICON_PATH:
+            return DEFAULT_ASPECT_LEXICON
+        try:
+            with open(Config.ASPECT_LEXICON_PATH, encoding="utf-8") as f:
+                lexicon = json.load(f)
+            logger.info(f"Loaded aspect lexicon from {Config.ASPECT_LEXICON_PATH}")
+            return lexicon
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load aspect lexicon {Config.ASPECT_LEXICON_PATH}: {e}. Using default lexicon.")
+            return DEFAULT_ASPECT_LEXICON
+
+    def _match_aspect(self, text):
+        for aspect, keywords in self.lexicon.items():
+            for keyword in keywords:
+                if keyword.lower() in text:
+                    return aspect, keyword
+        return None, None
+
+    def extract(self, review_dict):
+        """
+        Returns the aspects mentioned by a review as a list of dicts
+        ({'aspect', 'source', 'detail'}), one entry per aspect and source.
+        Text mentions come from '리뷰제목'/'리뷰본문', survey answers from '설문응답'.
+        """
+        aspects = []
+        seen = set()
+
+        text = f"{review_dict.get('리뷰제목', '')} {review_dict.get('리뷰본문', '')}".lower()
+        for aspect, keywords in self.lexicon.items():
+            for keyword in keywords:
+                if keyword.lower() in text:
+                    aspects.append({"aspect": aspect, "source": "text", "detail": keyword})
+                    seen.add((aspect, "text"))
+                    break
+
+        # Transformed reviews carry the parsed pairs already
+        survey_answers = review_dict.get('설문답변') or parse_survey(review_dict.get('설문응답', ''))
+        for question, answer in survey_answers:
+            # Survey questions that match the lexicon share the aspect name,
+            # anything else is indexed under the question itself.
+            aspect, _ = self._match_aspect(question.lower())
+            aspect = aspect or question[:50]
+            if (aspect, "survey") in seen:
+                continue
+            aspects.append({"aspect": aspect, "source": "survey", "detail": answer[:255]})
+            seen.add((aspect, "survey"))
+
+        return aspects
@@ -0,0 +1,153 @@
+import hashlib
+import re
+import zlib
+import numpy as np
+from src.config import Config
+from src.utils.logger import logger
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_NON_WORD = re.compile(r'[^\w]+')
+
+class NearDuplicateDetector:
+    """
+    Flags templated / copy-pasted reviews with MinHash signatures over character
+    shingles of 리뷰본문 and LSH banding for candidate lookup.
+
+    Each new review is only compared with reviews that share at least one LSH band
+    bucket, so the cost per review is independent of corpus size (no all-pairs scan).
+    Signatures and bucket keys are persisted, which makes detection incremental.
+    """
+    def __init__(self, db_handler, num_perm=None, bands=None, threshold=None, shingle_size=None, min_chars=None, seed=1):
+        self.db_handler = db_handler
+        self.num_perm = num_perm or Config.NEAR_DUP_NUM_PERM
+        self.bands = bands or Config.NEAR_DUP_BANDS
+        self.threshold = threshold or Config.NEAR_DUP_THRESHOLD
+        self.shingle_size = shingle_size or Config.NEAR_DUP_SHINGLE_SIZE
+        self.min_chars = min_chars if min_chars is not None else Config.NEAR_DUP_MIN_CHARS
+        if self.num_perm % self.bands != 0:
+            raise ValueError(f"num_perm ({self.num_perm}) must be divisible by bands ({self.bands}).")
+        self.rows_per_band = self.num_perm // self.bands
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, (1 << 61) - 1, size=self.num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, (1 << 61) - 1, size=self.num_perm, dtype=np.uint64)
+        logger.info(f"NearDuplicateDetector initialized (perm={self.num_perm}, bands={self.bands}, threshold={self.threshold}).")
+
+    def _normalize(self, text):
+        return _NON_WORD.sub(" ", (text or "").lower()).strip()
+
+    def signature(self, text):
+        """
+        Returns the MinHash signature (uint32 array of num_perm values), or None for
+        texts too short to tell a template from a common phrase like '좋아요'.
+        """
+        normalized = self._normalize(text)
+        if len(normalized) < self.min_chars:
+            return None
+        k = self.shingle_size
+        shingles = {normalized[i:i + k] for i in range(max(len(normalized) - k + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (a * h + b) mod p, truncated to 32 bits; uint64 overflow in a * h is intentional
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature):
+        """One stable 63-bit bucket key per band (band index is mixed into the hash)."""
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes()
+            digest = hashlib.blake2b(chunk, digest_size=8, person=band.to_bytes(2, "little")).digest()
+            keys.append(int.from_bytes(digest, "little") >> 1)
+        return keys
+
+    def similarity(self, signature, other):
+        """Estimated Jaccard similarity of two signatures."""
+        return float(np.count_nonzero(signature == other)) / self.num_perm
+
+    def process_reviews(self, reviews):
+        """
+        Assigns a duplicate cluster to each new review (dicts with 'id' and '리뷰본문').
+        A review joins the cluster of its most similar earlier review when the estimated
+        similarity reaches the threshold and is then flagged as a duplicate; otherwise it
+        starts its own cluster. Used as a DatabaseHandler insert hook.
+        """
+        pending, results = [], []
+        for review in reviews:
+            if review.get('id') is None:
+                continue
+            signature = self.signature(review.get('리뷰본문'))
+            if signature is None:
+                # Too short to sign: its own cluster, recorded so backfills skip it
+                results.append({"review_id": int(review['id']), "signature": None, "band_keys": [],
+                                "cluster_id": int(review['id']), "is_duplicate": False})
+            else:
+                pending.append((int(review['id']), signature, self.band_keys(signature)))
+        if not pending:
+            self.db_handler.store_near_duplicate_results(results)
+            return 0
+
+        # Existing reviews that share a bucket with any new review
+        all_keys = {key for _, _, keys in pending for key in keys}
+        stored_buckets = self.db_handler.get_lsh_bucket_members(all_keys)
+        candidate_ids = {review_id for members in stored_buckets.values() for review_id in members}
+        known = {}
+        for review_id, (signature_bytes, cluster_id) in self.db_handler.get_review_signatures(candidate_ids).items():
+            known[review_id] = (np.frombuffer(signature_bytes, dtype=np.uint32), cluster_id)
+
+        batch_buckets = {}
+        duplicates = 0
+        for review_id, signature, keys in pending:
+            candidates = set()
+            for key in keys:
+                candidates.update(stored_buckets.get(key, ()))
+                candidates.update(batch_buckets.get(key, ()))
+            candidates.discard(review_id)
+
+            best_id, best_similarity = None, 0.0
+            for candidate_id in candidates:
+                similarity = self.similarity(signature, known[candidate_id][0])
+                # Highest similarity wins; ties go to the oldest review
+                if similarity > best_similarity or (similarity == best_similarity and best_id is not None and candidate_id < best_id):
+                    best_id, best_similarity = candidate_id, similarity
+
+            if best_id is not None and best_similarity >= self.threshold:
+                cluster_id = known[best_id][1] or best_id
+                is_duplicate = True
+                duplicates += 1
+            else:
+                cluster_id = review_id
+                is_duplicate = False
+
+            known[review_id] = (signature, cluster_id)
+            for key in keys:
+                batch_buckets.setdefault(key, []).append(review_id)
+            results.append({
+                "review_id": review_id,
+                "signature": signature.tobytes(),
+                "band_keys": keys,
+                "cluster_id": cluster_id,
+                "is_duplicate": is_duplicate
+            })
+
+        self.db_handler.store_near_duplicate_results(results)
+        logger.info(f"Near-duplicate check: {len(results)} reviews signed, {duplicates} flagged as duplicates.")
+        return duplicates
+
+    def backfill(self, db_handler=None, batch_size=1000):
+        """
+        Signs every stored review that has not been checked yet, oldest first.
+        """
+        db_handler = db_handler or self.db_handler
+        unchecked = [
+            {"id": review['id'], "리뷰본문": review.get('review_content')}
+            for review in db_handler.get_all_reviews()
+            if review.get('duplicate_cluster_id') is None
+        ]
+        unchecked.sort(key=lambda review: review['id'])
+        duplicates = 0
+        for start in range(0, len(unchecked), batch_size):
+            duplicates += self.process_reviews(unchecked[start:start + batch_size])
+        logger.info(f"Near-duplicate backfill finished: {len(unchecked)} reviews checked, {duplicates} duplicates.")
+        return duplicates
@@ -0,0 +1,157 @@
+import hashlib
+import sys
+from dataclasses import dataclass, field
+
+@dataclass(slots=True, frozen=True)
+class ProductInfo:
+    """Product-level fields, stored once per product and shared by all of its reviews."""
+    name: str = ""
+    brand: str = ""
+    price: str = ""
+    coupang_product_id: str = ""
+    option: str = ""
+
+# Korean review keys used throughout the pipeline -> ProductInfo attribute
+PRODUCT_KEYS = {"상품명": "name", "브랜드": "brand", "가격": "price", "쿠팡상품번호": "coupang_product_id", "옵션": "option"}
+# Korean review keys -> ReviewRecord attribute
+REVIEW_KEYS = {
+    "리뷰제목": "title",
+    "리뷰본문": "content",
+    "리뷰페이지": "page",
+    "작성자": "author",
+    "평점": "rating",
+    "작성일": "created_at",
+    "판매자": "seller",
+    "실제구매상품명": "actual_purchase_product_name",
+    "이미지들": "images",
+    "설문응답": "survey",
+    "도움수": "helpful",
+    "상품키": "product_key",
+    "측면": "aspects",
+    "설문답변": "survey_answers",
+    "이미지목록": "image_urls",
+    "id": "id",
+}
+
+@dataclass(slots=True)
+class ReviewRecord:
+    """
+    One review without the per-review dict: __slots__ storage, product fields held
+    by a shared ProductInfo. Reads and writes with the pipeline's Korean keys
+    (record['리뷰본문'], record.get('상품명')), so code written for review dicts works unchanged.
+    """
+    product: ProductInfo
+    title: str = ""
+    content: str = ""
+    page: object = 0
+    author: str = ""
+    rating: object = ""
+    created_at: object = ""
+    seller: str = ""
+    actual_purchase_product_name: str = ""
+    images: str = ""
+    survey: str = ""
+    helpful: object = ""
+    product_key: str = None
+    aspects: list = field(default_factory=list)
+    survey_answers: tuple = () # parsed (question, answer) pairs of survey, set by the transformer
+    image_urls: tuple = () # parsed images; the shared empty tuple costs nothing for reviews without any
+    id: int = None
+
+    def __getitem__(self, key):
+        if key in PRODUCT_KEYS:
+            return getattr(self.product, PRODUCT_KEYS[key])
+        try:
+            return getattr(self, REVIEW_KEYS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key in PRODUCT_KEYS:
+            raise KeyError(f"{key} is a shared product field; set it on the ProductInfo")
+        try:
+            setattr(self, REVIEW_KEYS[key], value)
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in PRODUCT_KEYS or key in REVIEW_KEYS
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(PRODUCT_KEYS) + list(REVIEW_KEYS)
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+class ProductCatalog:
+    """Interns ProductInfo objects so equal product fields are stored once."""
+    def __init__(self):
+        self._products = {}
+
+    def get(self, name="", brand="", price="", coupang_product_id="", option=""):
+        key = (name, brand, price, coupang_product_id, option)
+        product = self._products.get(key)
+        if product is None:
+            product = self._products[key] = ProductInfo(*key)
+        return product
+
+    def __len__(self):
+        return len(self._products)
+
+# Low-cardinality review fields whose strings are interned (one copy per distinct value)
+INTERNED_FIELDS = ("seller", "created_at", "helpful")
+
+def intern_value(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def record_from_dict(review_dict, catalog):
+    """Builds a ReviewRecord from a review dict (crawler / CSV row); unknown keys are dropped."""
+    product = catalog.get(*(review_dict.get(key, "") for key in PRODUCT_KEYS))
+    values = {attribute: review_dict[key] for key, attribute in REVIEW_KEYS.items() if key in review_dict}
+    for attribute in INTERNED_FIELDS:
+        if attribute in values:
+            values[attribute] = intern_value(values[attribute])
+    return ReviewRecord(product, **values)
+
+def record_from_article(parsed, product, page, product_key=None):
+    """Builds a ReviewRecord from one HtmlParser.parse_review_articles result (live crawl and archive re-parse)."""
+    return ReviewRecord(
+        product,
+        title=parsed["headline"],
+        content=parsed["content"],
+        page=page,
+        author=parsed["author"],
+        rating=parsed["rating"],
+        created_at=intern_value(parsed["date"]),
+        seller=intern_value(parsed["seller"]),
+        actual_purchase_product_name=parsed["real_product"],
+        images=parsed["images"],
+        survey=parsed["survey"],
+        helpful=intern_value(parsed["helpful"]),
+        product_key=product_key
+    )
+
+def review_key(author, title, created_at, content):
+    """
+    Identity of a review within one product, for skipping reviews already stored.
+    Coupang masks author names ('김*수') and titles are often empty, so the date
+    (YYYY.MM.DD) and a hash of the whitespace-normalized text are part of it.
+    """
+    if hasattr(created_at, "strftime"):
+        created_at = created_at.strftime("%Y.%m.%d")
+    text = " ".join(str(content or "").split())
+    return (str(author or "").strip(), str(title or "").strip(), str(created_at or "").strip(),
+            hashlib.sha1(text.encode("utf-8")).hexdigest()[:16])
+
+def record_key(review):
+    """review_key of a review dict or ReviewRecord (Korean keys)."""
+    return review_key(review.get('작성자'), review.get('리뷰제목'), review.get('작성일'), review.get('리뷰본문'))
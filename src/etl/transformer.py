@@ -1,75 +1,98 @@
 import pandas as pd
 from src.utils.logger import logger
+from src.utils import metrics
 import re # Import re module
+import time
+from src.etl.aspect_extractor import AspectExtractor, parse_survey, parse_images
+from src.etl.records import ReviewRecord, ProductCatalog, PRODUCT_KEYS, record_from_dict
+
+# ReviewRecord string fields cleaned by transform (product fields are cleaned on the shared ProductInfo)
+STRING_FIELDS = ("title", "content", "author", "seller", "actual_purchase_product_name", "images", "survey")
+
+def _clean_string(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if not isinstance(value, str):
+        value = str(value) # Ensure it's a string
+    return value.strip()
+
+# to_dataframe dtypes
+CATEGORICAL_COLUMNS = ['상품명', '브랜드', '판매자']
+NULLABLE_DTYPES = {'id': 'Int64', '평점': 'Float64', '도움수': 'Int64', '리뷰페이지': 'Int64',
+                   'duplicate_cluster_id': 'Int64', 'is_duplicate': 'boolean'}
 
 class ReviewTransformer:
-    def __init__(self):
+    def __init__(self, aspect_extractor=None):
+        self.aspect_extractor = aspect_extractor or AspectExtractor()
         logger.info("ReviewTransformer initialized.")
 
     def transform(self, raw_reviews):
         """
         Transforms raw review data into a structured format suitable for database insertion.
         This can include data cleaning, type conversion, normalization, etc.
+        Accepts ReviewRecords (crawler) or review dicts (CSV import) and returns ReviewRecords,
+        normalized in place; product fields are cleaned once per product, not once per review.
         """
         if not raw_reviews:
             logger.warning("No raw reviews to transform.")
             return []
 
+        start = time.perf_counter()
+        raw_catalog, catalog = ProductCatalog(), ProductCatalog()
+        cleaned_products = {}
         transformed_reviews = []
-        for review_dict in raw_reviews:
-            processed_review = review_dict.copy()
-
-            # Handle NaN for string fields by converting to empty string
-            string_fields = [
-                "상품명", "브랜드", "가격", "쿠팡상품번호", "옵션",
-                "리뷰제목", "리뷰본문", "작성자", "판매자",
-                "실제구매상품명", "이미지들", "설문응답"
-            ]
-            for field in string_fields:
-                if pd.isna(processed_review.get(field)):
-                    processed_review[field] = ""
-                elif not isinstance(processed_review[field], str):
-                    processed_review[field] = str(processed_review[field]) # Ensure it's a string
+        for raw_review in raw_reviews:
+            record = raw_review if isinstance(raw_review, ReviewRecord) else record_from_dict(raw_review, raw_catalog)
+
+            product = cleaned_products.get(record.product)
+            if product is None:
+                product = cleaned_products[record.product] = catalog.get(
+                    *(_clean_string(getattr(record.product, attribute)) for attribute in PRODUCT_KEYS.values()))
+            record.product = product
+
+            # Handle NaN for string fields by converting to empty string, then strip whitespace
+            for attribute in STRING_FIELDS:
+                setattr(record, attribute, _clean_string(getattr(record, attribute)))
+            if isinstance(record.created_at, str):
+                record.created_at = record.created_at.strip()
 
             # Convert '평점' to float
             try:
-                processed_review['평점'] = float(processed_review.get('평점', 0)) if processed_review.get('평점') else 0.0
+                record.rating = float(record.rating) if record.rating and not pd.isna(record.rating) else 0.0
             except ValueError:
-                logger.warning(f"Could not convert rating '{processed_review.get('평점')}' to float. Setting to 0.0.")
-                processed_review['평점'] = 0.0
+                logger.warning(f"Could not convert rating '{record.rating}' to float. Setting to 0.0.")
+                record.rating = 0.0
 
             # Convert '도움수' to int, extracting number from string like '48 명에게 도움 됨'
-            try:
-                helpful_text = str(processed_review.get('도움수', '0'))
-                match = re.search(r'(\d+)', helpful_text)
-                if match:
-                    processed_review['도움수'] = int(match.group(1))
-                else:
-                    processed_review['도움수'] = 0
-            except ValueError:
-                logger.warning(f"Could not convert helpful_count '{processed_review.get('도움수')}' to int. Setting to 0.")
-                processed_review['도움수'] = 0
+            match = re.search(r'(\d+)', str(record.helpful if record.helpful is not None else '0'))
+            record.helpful = int(match.group(1)) if match else 0
 
-            # Clean up string fields (strip whitespace) - apply after NaN handling
-            for key, value in processed_review.items():
-                if isinstance(value, str):
-                    processed_review[key] = value.strip()
+            # 설문응답 / 이미지들 feed the review_survey_answers / review_images tables
+            record.survey_answers = tuple(parse_survey(record.survey))
+            record.image_urls = tuple(parse_images(record.images))
 
-            transformed_reviews.append(processed_review)
+            # Aspect mentions (배송, 가격, ...) feed the review_aspects inverted index
+            record.aspects = self.aspect_extractor.extract(record)
 
-        logger.info(f"Transformed {len(transformed_reviews)} reviews.")
+            transformed_reviews.append(record)
+
+        metrics.TRANSFORM_SECONDS.observe(time.perf_counter() - start)
+        metrics.TRANSFORM_ROWS.inc(len(transformed_reviews))
+        logger.info(f"Transformed {len(transformed_reviews)} reviews ({len(catalog)} products).")
         return transformed_reviews
 
     def to_dataframe(self, reviews_data):
         """
         Converts a list of review dictionaries into a pandas DataFrame.
         Useful for ML processing and dashboard visualization.
+        Product, brand and seller are categorical (a few hundred distinct values over
+        many reviews); numeric columns use nullable dtypes so missing values stay NA.
         """
         if not reviews_data:
             logger.warning("No review data to convert to DataFrame.")
             return pd.DataFrame()
         
-        df = pd.DataFrame(reviews_data)
+        df = pd.DataFrame(reviews_data).drop(columns=['_sa_instance_state'], errors='ignore')
 
         # Map SQLAlchemy column names to Korean names for consistency with dashboard/report
         column_mapping = {
@@ -88,10 +111,19 @@ class ReviewTransformer:
             'actual_purchase_product_name': '실제구매상품명',
             'images': '이미지들',
             'survey_response': '설문응답',
-            'helpful_count': '도움수'
+            'helpful_count': '도움수',
+            'sentiment': 'sentiment_label'
         }
         # Apply mapping only if the column exists in the DataFrame
         df.rename(columns={k: v for k, v in column_mapping.items() if k in df.columns}, inplace=True)
 
+        for column in CATEGORICAL_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].astype('category')
+        for column, dtype in NULLABLE_DTYPES.items():
+            if column in df.columns:
+                values = df[column] if dtype == 'boolean' else pd.to_numeric(df[column], errors='coerce')
+                df[column] = values.astype(dtype)
+
         logger.info(f"Converted {len(reviews_data)} reviews to DataFrame with shape {df.shape}.")
         return df
@@ -0,0 +1,304 @@
+import json
+import os
+import re
+import threading
+from collections import Counter
+import numpy as np
+from src.config import Config
+from src.utils.logger import logger
+
+_TERM_PATTERN = re.compile(r'[가-힣A-Za-z]{2,}')
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped store of review embeddings keyed by review id.
+
+    Vectors are L2-normalized and stored as float16 (or int8, scaled by 127) in a raw
+    file next to an int64 id file, so appending new reviews never rewrites the corpus.
+    An IVF coarse quantizer (k-means centroids + one list id per row) provides
+    approximate nearest-neighbour search by scanning only the nprobe closest lists.
+    """
+    INT8_SCALE = 127.0
+
+    def __init__(self, store_dir=None, dtype=None):
+        self.store_dir = store_dir or Config.EMBEDDING_DIR
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._paths = {name: os.path.join(self.store_dir, name) for name in ("meta.json", "vectors.bin", "ids.bin", "lists.bin", "centroids.npy")}
+        self._lock = threading.Lock()
+        self.meta = self._load_meta(dtype or Config.EMBEDDING_DTYPE)
+        self.centroids = np.load(self._paths["centroids.npy"]) if os.path.exists(self._paths["centroids.npy"]) else None
+        self._row_of = {}
+        self._rows_loaded = 0
+        self._refresh()
+        logger.info(f"EmbeddingStore opened at {self.store_dir} with {len(self)} vectors.")
+
+    def _load_meta(self, dtype):
+        if os.path.exists(self._paths["meta.json"]):
+            with open(self._paths["meta.json"], encoding="utf-8") as f:
+                return json.load(f)
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        return {"dim": None, "dtype": dtype}
+
+    def _save_meta(self):
+        with open(self._paths["meta.json"], "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+
+    @property
+    def dim(self):
+        return self.meta["dim"]
+
+    def _file_rows(self, name, row_bytes):
+        path = self._paths[name]
+        return os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+
+    def _row_count(self):
+        if not self.dim:
+            return 0
+        itemsize = np.dtype(self.meta["dtype"]).itemsize
+        # Readers only trust rows that are complete in every file (appends write vectors first)
+        return min(self._file_rows("vectors.bin", self.dim * itemsize), self._file_rows("ids.bin", 8), self._file_rows("lists.bin", 4))
+
+    def _refresh(self):
+        """Picks up rows appended by other processes since the last call."""
+        rows = self._row_count()
+        if rows != self._rows_loaded:
+            ids = np.fromfile(self._paths["ids.bin"], dtype=np.int64, count=rows)
+            self._row_of = {int(review_id): row for row, review_id in enumerate(ids)}
+            self._rows_loaded = rows
+        return rows
+
+    def __len__(self):
+        return self._rows_loaded
+
+    def __contains__(self, review_id):
+        return int(review_id) in self._row_of
+
+    def _memmap(self, name, dtype, shape):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._paths[name], dtype=dtype, mode="r", shape=shape)
+
+    def _vectors(self):
+        return self._memmap("vectors.bin", self.meta["dtype"], (self._rows_loaded, self.dim))
+
+    def _lists(self):
+        return self._memmap("lists.bin", np.int32, (self._rows_loaded,))
+
+    def _encode(self, vectors):
+        if self.meta["dtype"] == "int8":
+            return np.clip(np.round(vectors * self.INT8_SCALE), -127, 127).astype(np.int8)
+        return vectors.astype(np.float16)
+
+    def _decode(self, stored):
+        vectors = stored.astype(np.float32)
+        if self.meta["dtype"] == "int8":
+            vectors /= self.INT8_SCALE
+        return vectors
+
+    def _assign_lists(self, vectors):
+        if self.centroids is None:
+            return np.full(len(vectors), -1, dtype=np.int32)
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def append(self, review_ids, vectors):
+        """
+        Appends embeddings for reviews not stored yet; returns how many were added.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(review_ids) == 0:
+            return 0
+        with self._lock:
+            self._refresh()
+            if self.dim is None:
+                self.meta["dim"] = int(vectors.shape[1])
+                self._save_meta()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}.")
+
+            keep = [i for i, review_id in enumerate(review_ids) if int(review_id) not in self._row_of]
+            if not keep:
+                return 0
+            new_ids = np.asarray([int(review_ids[i]) for i in keep], dtype=np.int64)
+            new_vectors = vectors[keep]
+            new_vectors /= np.maximum(np.linalg.norm(new_vectors, axis=1, keepdims=True), 1e-12)
+
+            with open(self._paths["vectors.bin"], "ab") as f:
+                f.write(self._encode(new_vectors).tobytes())
+            with open(self._paths["lists.bin"], "ab") as f:
+                f.write(self._assign_lists(new_vectors).tobytes())
+            with open(self._paths["ids.bin"], "ab") as f:
+                f.write(new_ids.tobytes())
+            self._refresh()
+        return len(keep)
+
+    def get_vectors(self, review_ids):
+        """Returns (found_ids, float32 vectors) for the given review ids that are stored."""
+        self._refresh()
+        found = [int(review_id) for review_id in review_ids if int(review_id) in self._row_of]
+        if not found:
+            return [], np.empty((0, self.dim or 0), dtype=np.float32)
+        rows = np.asarray([self._row_of[review_id] for review_id in found])
+        return found, self._decode(self._vectors()[rows])
+
+    def train_ivf(self, n_lists=None, sample_size=100000):
+        """
+        Trains the coarse quantizer on a sample and assigns every stored row to a list.
+        Rows appended afterwards are assigned on append, so retraining is only needed
+        when the data distribution drifts a lot.
+        """
+        with self._lock:
+            rows = self._refresh()
+            n_lists = min(n_lists or Config.EMBEDDING_IVF_LISTS, rows)
+            if n_lists < 2:
+                logger.warning("Not enough embeddings to train the IVF index.")
+                return
+            vectors = self._vectors()
+            from sklearn.cluster import MiniBatchKMeans # scikit-learn is only needed for training
+            sample = np.random.RandomState(0).choice(rows, size=min(sample_size, rows), replace=False)
+            kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=0, n_init=3, batch_size=4096).fit(self._decode(vectors[np.sort(sample)]))
+            centroids = kmeans.cluster_centers_.astype(np.float32)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+            lists = np.empty(rows, dtype=np.int32)
+            for start in range(0, rows, 65536):
+                lists[start:start + 65536] = np.argmax(self._decode(vectors[start:start + 65536]) @ centroids.T, axis=1)
+            lists.tofile(self._paths["lists.bin"])
+            np.save(self._paths["centroids.npy"], centroids)
+            self.centroids = centroids
+        logger.info(f"Trained IVF index with {n_lists} lists over {rows} embeddings.")
+
+    def search(self, query_vector, k=10, nprobe=None, exclude_ids=()):
+        """
+        Returns the k most similar stored reviews as [(review_id, cosine_similarity)].
+        Scans the nprobe nearest IVF lists when trained, otherwise every row.
+        """
+        rows = self._refresh()
+        if rows == 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        query /= max(np.linalg.norm(query), 1e-12)
+
+        if self.centroids is not None:
+            nprobe = min(nprobe or Config.EMBEDDING_NPROBE, len(self.centroids))
+            probes = np.argsort(-(self.centroids @ query))[:nprobe]
+            lists = self._lists()
+            # Rows appended before training (-1) are always scanned
+            candidates = np.flatnonzero(np.isin(lists, probes) | (lists < 0))
+        else:
+            candidates = np.arange(rows)
+
+        ids = self._memmap("ids.bin", np.int64, (rows,))
+        excluded = {int(review_id) for review_id in exclude_ids}
+        vectors = self._vectors()
+        best_rows, best_scores = [], []
+        for start in range(0, len(candidates), 65536):
+            chunk = candidates[start:start + 65536]
+            scores = self._decode(vectors[chunk]) @ query
+            top = np.argsort(-scores)[:k + len(excluded)]
+            best_rows.extend(chunk[top])
+            best_scores.extend(scores[top])
+        order = np.argsort(-np.asarray(best_scores))
+        results = []
+        for i in order:
+            review_id = int(ids[best_rows[i]])
+            if review_id in excluded:
+                continue
+            results.append((review_id, float(best_scores[i])))
+            if len(results) == k:
+                break
+        return results
+
+    def similar_to(self, review_id, k=10, nprobe=None):
+        """Nearest neighbours of a stored review (the review itself is excluded)."""
+        found, vectors = self.get_vectors([review_id])
+        if not found:
+            return []
+        return self.search(vectors[0], k=k, nprobe=nprobe, exclude_ids=[review_id])
+
+class EmbeddingIndexer:
+    """
+    Embeds new reviews in batches and appends them to an EmbeddingStore.
+    Used as a DatabaseHandler insert hook; already-embedded reviews are skipped.
+    """
+    def __init__(self, embedder, store=None):
+        self.embedder = embedder
+        self.store = store or EmbeddingStore()
+
+    def index_reviews(self, reviews):
+        pending = [(int(r['id']), r.get('리뷰본문')) for r in reviews
+                   if r.get('id') is not None and r.get('리뷰본문') and int(r['id']) not in self.store]
+        if not pending:
+            return 0
+        added = 0
+        batch_size = self.embedder.batch_size * 16 # keep memory bounded on large backfills
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            vectors = self.embedder.embed([text for _, text in batch])
+            if vectors is None:
+                return added
+            added += self.store.append([review_id for review_id, _ in batch], vectors)
+        if self.store.centroids is None and len(self.store) >= Config.EMBEDDING_IVF_MIN_ROWS:
+            self.store.train_ivf()
+        logger.info(f"Embedded {added} new reviews ({len(self.store)} in store).")
+        return added
+
+    def backfill(self, db_handler):
+        """Embeds every stored review that is not in the store yet."""
+        reviews = [{"id": r['id'], "리뷰본문": r.get('review_content')} for r in db_handler.get_all_reviews()]
+        return self.index_reviews(reviews)
+
+def find_themes(vectors, texts, n_themes=3, top_terms=5):
+    """
+    Clusters review embeddings into themes. Each theme reports its size, share,
+    distinctive terms and the review closest to the cluster centre.
+    """
+    n_themes = min(n_themes, len(texts))
+    if n_themes < 1:
+        return []
+    from sklearn.cluster import KMeans
+    kmeans = KMeans(n_clusters=n_themes, n_init=10, random_state=0).fit(vectors)
+
+    term_sets = [set(_TERM_PATTERN.findall(text or "")) for text in texts]
+    document_frequency = Counter(term for terms in term_sets for term in terms)
+    themes = []
+    for cluster in range(n_themes):
+        members = np.flatnonzero(kmeans.labels_ == cluster)
+        if len(members) == 0:
+            continue
+        cluster_frequency = Counter(term for i in members for term in term_sets[i])
+        # Terms over-represented in this cluster relative to the product's reviews overall
+        distinctive = sorted(
+            cluster_frequency,
+            key=lambda term: cluster_frequency[term] / len(members) - document_frequency[term] / len(texts),
+            reverse=True
+        )
+        representative = members[np.argmax(vectors[members] @ kmeans.cluster_centers_[cluster])]
+        themes.append({
+            "size": int(len(members)),
+            "share": len(members) / len(texts),
+            "keywords": distinctive[:top_terms],
+            "example": texts[representative]
+        })
+    return sorted(themes, key=lambda theme: theme["size"], reverse=True)
+
+def find_complaint_themes(store, df, top_products=5, n_themes=3, min_reviews=10):
+    """
+    Returns {상품명: [theme, ...]} for the products with the most negative reviews,
+    clustering those negative reviews' stored embeddings.
+    """
+    if df.empty or 'sentiment_label' not in df.columns:
+        return {}
+    negative = df[df['sentiment_label'] == 'negative']
+    if 'is_duplicate' in negative.columns:
+        negative = negative[negative['is_duplicate'].fillna(False) == False]
+
+    complaint_themes = {}
+    for product in negative['상품명'].value_counts().head(top_products).index:
+        product_reviews = negative[negative['상품명'] == product]
+        texts_by_id = dict(zip(product_reviews['id'], product_reviews['리뷰본문']))
+        found, vectors = store.get_vectors(list(texts_by_id))
+        if len(found) < min_reviews:
+            continue
+        complaint_themes[product] = find_themes(vectors, [texts_by_id[review_id] for review_id in found], n_themes=n_themes)
+    return complaint_themes
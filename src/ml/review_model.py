@@ -1,22 +1,54 @@
-from transformers import pipeline
+import threading
+from src.config import Config
 from src.utils.logger import logger
-import pandas as pd
+from src.utils import metrics
+import numpy as np
+
+# transformers / torch take seconds to import, so they are imported when a model is
+# first used: constructing an analyzer (API startup, dashboard) costs nothing.
+
+def _load_pipeline(task, model_name, description):
+    """A transformers pipeline, or None (logged) when the model or the library is unavailable."""
+    try:
+        from transformers import pipeline
+        loaded = pipeline(task, model=model_name)
+        logger.info(f"{description.capitalize()} pipeline loaded with model: {model_name}")
+        return loaded
+    except Exception as e:
+        logger.error(f"Failed to load {description} model {model_name}: {e}")
+        logger.warning(f"{description.capitalize()} will not be available.")
+        return None
+
+class LazyModel:
+    """Loads a model once, on first access, thread-safely; a failed load is not retried."""
+    def __init__(self, loader):
+        self._loader = loader
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._loader()
+                    self._loaded = True
+        return self._value
 
 class SentimentAnalyzer:
     def __init__(self, model_name="snunlp/KR-FinBert-SC"): # A more suitable sentiment model
         self.model_name = model_name
-        self.sentiment_pipeline = None
-        try:
-            # Attempt to load a sentiment analysis pipeline. 
-            # Note: A specific sentiment analysis model might be needed, 
-            # this is a general Korean ELECTRA model.
-            # For actual sentiment analysis, you might need a model fine-tuned for sentiment.
-            # Example: 'snunlp/KR-FinBert-SC'
-            self.sentiment_pipeline = pipeline("sentiment-analysis", model=model_name)
-            logger.info(f"Sentiment analysis pipeline loaded with model: {model_name}")
-        except Exception as e:
-            logger.error(f"Failed to load sentiment analysis model {model_name}: {e}")
-            logger.warning("Sentiment analysis will not be available.")
+        # Note: a model fine-tuned for sentiment is needed (e.g. 'snunlp/KR-FinBert-SC');
+        # it is downloaded / loaded on the first analyze_sentiment call.
+        self._pipeline = LazyModel(lambda: _load_pipeline("sentiment-analysis", model_name, "sentiment analysis"))
+
+    @property
+    def sentiment_pipeline(self):
+        return self._pipeline.get()
 
     def analyze_sentiment(self, texts):
         if not self.sentiment_pipeline:
@@ -25,7 +57,10 @@ class SentimentAnalyzer:
         
         logger.info(f"Analyzing sentiment for {len(texts)} texts...")
         try:
-            results = self.sentiment_pipeline(texts)
+            with metrics.timed(metrics.INFERENCE_SECONDS.labels(model="sentiment")):
+                results = self.sentiment_pipeline(texts)
+            metrics.INFERENCE_TEXTS.labels(model="sentiment").inc(len(texts))
+            metrics.INFERENCE_BATCH_SIZE.labels(model="sentiment").observe(len(texts))
             # The output format might vary based on the model. 
             # Assuming it returns a list of dicts like [{'label': 'LABEL_0', 'score': 0.99}]
             # We'll map labels to 'positive', 'negative', or 'neutral' and return scores.
@@ -48,13 +83,11 @@ class SentimentAnalyzer:
 class ReviewSummarizer:
     def __init__(self, model_name="gogamza/kobart-base-v2"): # Example Korean summarization model
         self.model_name = model_name
-        self.summarization_pipeline = None
-        try:
-            self.summarization_pipeline = pipeline("summarization", model=model_name)
-            logger.info(f"Summarization pipeline loaded with model: {model_name}")
-        except Exception as e:
-            logger.error(f"Failed to load summarization model {model_name}: {e}")
-            logger.warning("Review summarization will not be available.")
+        self._pipeline = LazyModel(lambda: _load_pipeline("summarization", model_name, "review summarization"))
+
+    @property
+    def summarization_pipeline(self):
+        return self._pipeline.get()
 
     def summarize_reviews(self, texts, max_length=150, min_length=30):
         if not self.summarization_pipeline:
@@ -70,6 +103,65 @@ class ReviewSummarizer:
             logger.error(f"Error during review summarization: {e}")
             return [None] * len(texts)
 
+class ReviewEmbedder:
+    def __init__(self, model_name=None, batch_size=None, max_length=128):
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.batch_size = batch_size or Config.EMBEDDING_BATCH_SIZE
+        self.max_length = max_length
+        self._model = LazyModel(self._load)
+
+    def _load(self):
+        try:
+            from transformers import AutoTokenizer, AutoModel
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModel.from_pretrained(self.model_name)
+            model.eval()
+            logger.info(f"Sentence embedding model loaded: {self.model_name}")
+            return tokenizer, model
+        except Exception as e:
+            logger.error(f"Failed to load embedding model {self.model_name}: {e}")
+            logger.warning("Review embeddings will not be available.")
+            return None, None
+
+    @property
+    def tokenizer(self):
+        return self._model.get()[0]
+
+    @property
+    def model(self):
+        return self._model.get()[1]
+
+    def embed(self, texts):
+        """
+        Returns an (n, dim) float32 array of L2-normalized sentence embeddings
+        (mean pooling over tokens), computed in batches on CPU.
+        """
+        if not self.model:
+            logger.warning("Embedding model not loaded. Returning no embeddings.")
+            return None
+
+        import torch
+
+        logger.info(f"Embedding {len(texts)} texts...")
+        batches = []
+        try:
+            with torch.no_grad():
+                for start in range(0, len(texts), self.batch_size):
+                    batch = texts[start:start + self.batch_size]
+                    with metrics.timed(metrics.INFERENCE_SECONDS.labels(model="embedding")):
+                        encoded = self.tokenizer(batch, padding=True, truncation=True,
+                                                 max_length=self.max_length, return_tensors="pt")
+                        token_embeddings = self.model(**encoded).last_hidden_state
+                        mask = encoded["attention_mask"].unsqueeze(-1).to(token_embeddings.dtype)
+                        pooled = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                        batches.append(torch.nn.functional.normalize(pooled, dim=1).numpy())
+                    metrics.INFERENCE_TEXTS.labels(model="embedding").inc(len(batch))
+                    metrics.INFERENCE_BATCH_SIZE.labels(model="embedding").observe(len(batch))
+            return np.concatenate(batches).astype(np.float32)
+        except Exception as e:
+            logger.error(f"Error during review embedding: {e}")
+            return None
+
 # Example usage (for testing purposes)
 if __name__ == "__main__":
     # Ensure you have the necessary models downloaded or internet access
@@ -0,0 +1,157 @@
+import datetime
+import math
+from src.config import Config
+from src.utils.logger import logger
+from src.utils import metrics
+
+PERIOD_STEPS = {"day": datetime.timedelta(days=1), "week": datetime.timedelta(weeks=1)}
+# metric -> (alert direction, minimum baseline std). The floor keeps a perfectly flat
+# baseline (e.g. 0% negative for two weeks) from turning a single bad review into z = inf;
+# evaluate() raises it further to the sampling noise of shares, ratings and counts.
+ALERT_METRICS = {
+    "negative_share": (1, 0.05),
+    "rating": (-1, 0.25),
+    "review_count": (1, 1.0),
+}
+
+def _poisson_tail(count, mean):
+    """P(X >= count) for X ~ Poisson(mean)."""
+    if count <= 0:
+        return 1.0
+    if mean <= 0:
+        return 0.0
+    if count <= mean:
+        return 1.0 # never a burst; saves summing the bulk of the distribution
+    # Summed from count upwards in log space, so large means neither underflow nor lose the tail to 1 - cdf
+    k = int(math.ceil(count))
+    tail = 0.0
+    while True:
+        term = math.exp(-mean + k * math.log(mean) - math.lgamma(k + 1))
+        tail += term
+        if term <= tail * 1e-12:
+            return min(tail, 1.0)
+        k += 1
+
+def _mean_std(values):
+    mean = sum(values) / len(values)
+    return mean, math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+
+class AnomalyDetector:
+    """
+    Flags unusual days / weeks per product from the review_rollups table: a jump in
+    negative-sentiment share, a drop in mean rating, or a burst of reviews (review bombs).
+
+    Each bucket is compared with the product's previous baseline_periods buckets by
+    z-score. Buckets without reviews count as zero for the volume check (from the
+    product's first reviewed bucket in the window on) and are left out of the rate
+    checks. Only buckets updated since the last check are evaluated, so running it
+    after every micro-batch costs one small query per touched product.
+    """
+    def __init__(self, db_handler, baseline_periods=None, z_threshold=None, min_reviews=None, min_baseline=None, min_count_excess=None):
+        self.db_handler = db_handler
+        self.baseline_periods = baseline_periods or Config.ANOMALY_BASELINE_PERIODS
+        self.z_threshold = z_threshold or Config.ANOMALY_Z_THRESHOLD
+        self.min_reviews = min_reviews or Config.ANOMALY_MIN_REVIEWS # smaller buckets are never flagged
+        self.min_baseline = min_baseline or Config.ANOMALY_MIN_BASELINE # baseline buckets with reviews needed
+        self.min_count_excess = Config.ANOMALY_MIN_COUNT_EXCESS if min_count_excess is None else min_count_excess
+        self._tail_probability = 0.5 * math.erfc(self.z_threshold / math.sqrt(2)) # one-sided normal tail beyond z_threshold
+        self._checked_at = datetime.datetime.now() # buckets updated before startup are covered by check(since=...)
+        logger.info(f"AnomalyDetector initialized (baseline={self.baseline_periods} periods, z>={self.z_threshold}).")
+
+    def process_reviews(self, reviews):
+        """DatabaseHandler insert hook: re-checks the buckets the new reviews landed in."""
+        return self.check()
+
+    def process_sentiments(self, sentiments):
+        """DatabaseHandler sentiment hook: negative shares change when labels arrive."""
+        return self.check()
+
+    def check(self, since=None):
+        """
+        Evaluates rollup buckets updated since the last check (or since `since`;
+        datetime.datetime.min re-evaluates everything) and stores the alerts.
+        Returns the number of new alerts.
+        """
+        started = datetime.datetime.now()
+        changed = {}
+        for period, period_start, product_name in self.db_handler.get_changed_rollups(since or self._checked_at):
+            changed.setdefault((product_name, period), []).append(period_start)
+        self._checked_at = started
+        if not changed:
+            return 0
+
+        alerts, evaluated = [], []
+        for (product_name, period), starts in changed.items():
+            step = PERIOD_STEPS[period]
+            history = self.db_handler.get_rollups(period, product_name=product_name, since=min(starts) - step * self.baseline_periods)
+            buckets = {row["period_start"]: row for row in history}
+            for period_start in starts:
+                evaluated.append((product_name, period, period_start))
+                for metric, (value, mean, std, z_score, review_count) in self.evaluate(buckets, period_start, step).items():
+                    alerts.append({
+                        "product_name": product_name, "period": period, "period_start": period_start, "metric": metric,
+                        "value": value, "baseline_mean": mean, "baseline_std": std, "z_score": z_score,
+                        "review_count": review_count, "detected_at": started,
+                    })
+
+        new_alerts = self.db_handler.store_alerts(alerts, evaluated)
+        metrics.ANOMALY_ALERTS.inc(new_alerts)
+        if new_alerts:
+            logger.warning(f"Anomaly check: {new_alerts} new alerts in {len(evaluated)} updated buckets.")
+        return new_alerts
+
+    def evaluate(self, buckets, period_start, step):
+        """
+        {metric: (value, baseline mean, baseline std, z-score, review count)} for the
+        anomalous metrics of the bucket at period_start; buckets maps period_start -> rollup row.
+        """
+        current = buckets.get(period_start)
+        if not current or current["review_count"] < self.min_reviews:
+            return {}
+        baseline = [buckets.get(period_start - step * offset) for offset in range(1, self.baseline_periods + 1)]
+        while baseline and not baseline[-1]: # buckets before the product's first review in the window are not zeros
+            baseline.pop()
+        if sum(1 for row in baseline if row and row["review_count"]) < self.min_baseline:
+            return {}
+
+        series = {
+            "review_count": (current["review_count"], [row["review_count"] if row else 0 for row in baseline]),
+            "rating": (current["rating_sum"] / current["review_count"],
+                       [row["rating_sum"] / row["review_count"] for row in baseline if row and row["review_count"]]),
+        }
+        if current["scored_count"] >= self.min_reviews:
+            scored = [row for row in baseline if row and row["scored_count"]]
+            if len(scored) >= self.min_baseline:
+                series["negative_share"] = (current["negative_count"] / current["scored_count"],
+                                            [row["negative_count"] / row["scored_count"] for row in scored])
+
+        anomalies = {}
+        for metric, (value, history) in series.items():
+            direction, std_floor = ALERT_METRICS[metric]
+            mean, std = _mean_std(history)
+            if metric == "negative_share":
+                # A share over few reviews is noisy by itself: never use less than its binomial standard error
+                std_floor = max(std_floor, math.sqrt(mean * (1 - mean) / current["scored_count"]))
+            elif metric == "rating":
+                # Same for a mean rating over few reviews. Ratings lie in [1, 5], so their variance is at most
+                # (m - 1) * (5 - m) for the pooled mean m of baseline and current reviews (as in a two-proportion
+                # test, a flat all-5-star baseline must not make the spread look like zero); the current and the
+                # baseline mean both carry that sampling error.
+                rated = [row for row in baseline if row] + [current]
+                baseline_reviews = sum(row["review_count"] for row in rated) - current["review_count"]
+                pooled = sum(row["rating_sum"] for row in rated) / (baseline_reviews + current["review_count"])
+                variance = max(pooled - 1, 0.0) * max(5 - pooled, 0.0)
+                std_floor = max(std_floor, math.sqrt(variance * (1 / current["review_count"] + 1 / baseline_reviews)))
+            elif metric == "review_count":
+                # Review arrivals are Poisson: the count varies by sqrt(mean) even when nothing happens, and
+                # for small means its tail is heavier than the normal one. A burst must also be as unlikely
+                # under Poisson as z_threshold is under the normal distribution, taking the rate at the
+                # upper end of what the (short, noisy) baseline allows.
+                std_floor = max(std_floor, math.sqrt(mean))
+                rate = mean + self.z_threshold * math.sqrt(max(mean, 1.0) / len(history))
+                if value - mean < self.min_count_excess or _poisson_tail(value, rate) > self._tail_probability:
+                    continue
+            z_score = (value - mean) / max(std, std_floor)
+            if z_score * direction >= self.z_threshold:
+                anomalies[metric] = (float(value), mean, std, z_score, int(current["review_count"]))
+        return anomalies
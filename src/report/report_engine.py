@@ -0,0 +1,274 @@
+import datetime
+import hashlib
+import html
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from src.config import Config
+from src.db.database_handler import survey_shares
+from src.utils.logger import logger
+from src.utils import metrics
+
+try:
+    import duckdb
+except ImportError: # Parquet is written with pandas (pyarrow) when DuckDB is not installed
+    duckdb = None
+
+FORMATS = ("html", "json", "parquet")
+MANIFEST_NAME = "manifest.json"
+TREND_WEEKS = 26 # weeks shown in the HTML trend table
+
+def report_slug(name):
+    """File-system safe, collision-free file stem for a product name or keyword."""
+    readable = re.sub(r"[^\w]+", "_", name).strip("_")[:60]
+    return f"{readable}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+
+def summarize(daily):
+    """Totals of a list of daily rollup rows."""
+    totals = {name: sum(row[name] for row in daily) for name in ("review_count", "rating_sum", "scored_count", "negative_count", "duplicate_count")}
+    return {
+        "total_reviews": totals["review_count"],
+        "duplicate_reviews": totals["duplicate_count"],
+        "average_rating": round(totals["rating_sum"] / totals["review_count"], 3) if totals["review_count"] else None,
+        "negative_share": round(totals["negative_count"] / totals["scored_count"], 4) if totals["scored_count"] else None,
+        "scored_reviews": totals["scored_count"],
+        "first_review_date": daily[0]["period_start"].date().isoformat() if daily else None,
+        "last_review_date": daily[-1]["period_start"].date().isoformat() if daily else None,
+    }
+
+def trend_frame(rows):
+    """Rollup rows as a DataFrame with the derived average rating and negative share."""
+    df = pd.DataFrame(rows, columns=["period_start", "review_count", "rating_sum", "scored_count", "negative_count", "duplicate_count"])
+    df["average_rating"] = (df["rating_sum"] / df["review_count"].where(df["review_count"] > 0)).round(3)
+    df["negative_share"] = (df["negative_count"] / df["scored_count"].where(df["scored_count"] > 0)).round(4)
+    return df.drop(columns=["rating_sum"])
+
+def sum_rollups(series):
+    """Adds several products' rollup rows bucket by bucket."""
+    buckets = {}
+    for rows in series:
+        for row in rows:
+            bucket = buckets.setdefault(row["period_start"], {"period_start": row["period_start"], "review_count": 0, "rating_sum": 0.0,
+                                                             "scored_count": 0, "negative_count": 0, "duplicate_count": 0})
+            for name in ("review_count", "rating_sum", "scored_count", "negative_count", "duplicate_count"):
+                bucket[name] += row[name]
+    return [buckets[start] for start in sorted(buckets)]
+
+def sum_survey(series):
+    """Adds several products' survey answer counts into one distribution (with shares)."""
+    counts = {}
+    for rows in series:
+        for row in rows:
+            key = (row["question"], row["answer"])
+            counts[key] = counts.get(key, 0) + row["count"]
+    rows = [{"question": question, "answer": answer, "count": count} for (question, answer), count in counts.items()]
+    return survey_shares(sorted(rows, key=lambda row: (row["question"], -row["count"])))
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _write_atomic(path, data, mode="w"):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, mode, **({"encoding": "utf-8"} if mode == "w" else {})) as f:
+        f.write(data)
+    os.replace(tmp_path, path) # readers never see a half-written report
+
+def _write_parquet(df, path):
+    tmp_path = path + ".tmp"
+    if duckdb is not None:
+        con = duckdb.connect()
+        try:
+            con.register("frame", df)
+            con.execute(f"COPY frame TO '{tmp_path}' (FORMAT PARQUET)")
+        finally:
+            con.close()
+    else:
+        df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def _html_table(columns, rows):
+    head = "".join(f"<th>{html.escape(str(column))}</th>" for column in columns)
+    body = "".join("<tr>" + "".join(f"<td>{html.escape('' if value is None or value != value else str(value))}</td>" for value in row) + "</tr>" for row in rows)
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+def _render_html(title, summary, weekly, alerts, products=None, survey=None):
+    sections = [f"<h1>{html.escape(title)}</h1>", _html_table(["Metric", "Value"], summary.items())]
+    if products is not None:
+        sections.append("<h2>Products</h2>")
+        sections.append(_html_table(["Product", "Reviews", "Average Rating", "Negative Share"],
+                                    [(p["product_name"], p["total_reviews"], p["average_rating"], p["negative_share"]) for p in products]))
+    if survey:
+        sections.append("<h2>Survey Answers</h2>")
+        sections.append(_html_table(["Question", "Answer", "Reviews", "Share"],
+                                    [(row["question"], row["answer"], row["count"], f"{row['share'] * 100:.1f}%") for row in survey]))
+    if alerts:
+        sections.append("<h2>Anomaly Alerts</h2>")
+        sections.append(_html_table(["Period Start", "Period", "Product", "Metric", "Value", "Baseline", "z"],
+                                    [(a["period_start"], a["period"], a["product_name"], a["metric"], round(a["value"], 3),
+                                      round(a["baseline_mean"], 3), round(a["z_score"], 1)) for a in alerts]))
+    recent = weekly.tail(TREND_WEEKS)
+    sections.append(f"<h2>Weekly Trend (last {len(recent)} weeks)</h2>")
+    sections.append(_html_table(list(recent.columns), recent.itertuples(index=False)))
+    style = "body{font-family:Arial,sans-serif;margin:20px}table{border-collapse:collapse;margin-bottom:20px}td,th{border:1px solid #ddd;padding:4px 8px}"
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(title)}</title><style>{style}</style></head><body>{''.join(sections)}</body></html>"
+
+def render_report(kind, name, payload, output_dir, formats=FORMATS):
+    """
+    Writes one product or keyword report (HTML / JSON / Parquet) from its aggregates.
+    Runs in a ReportEngine worker process, so it only takes plain data.
+    Returns {format: relative path}.
+    """
+    stem = os.path.join(kind + "s", report_slug(name))
+    os.makedirs(os.path.join(output_dir, kind + "s"), exist_ok=True)
+    summary = {"name": name, **summarize(payload["daily"]), "generated_at": payload["generated_at"]}
+    if payload.get("keywords") is not None:
+        summary["keywords"] = ", ".join(payload["keywords"])
+    daily, weekly = trend_frame(payload["daily"]), trend_frame(payload["weekly"])
+    files = {}
+    if "json" in formats:
+        files["json"] = stem + ".json"
+        document = {"kind": kind, **summary, "products": payload.get("products"), "alerts": payload["alerts"],
+                    "survey": payload.get("survey", []), "weekly": weekly.to_dict(orient="records")}
+        _write_atomic(os.path.join(output_dir, files["json"]), json.dumps(document, ensure_ascii=False, default=_json_default, indent=1))
+    if "html" in formats:
+        files["html"] = stem + ".html"
+        title = f"{'Product' if kind == 'product' else 'Keyword'} Report: {name}"
+        _write_atomic(os.path.join(output_dir, files["html"]), _render_html(title, summary, weekly, payload["alerts"], payload.get("products"), payload.get("survey")))
+    if "parquet" in formats:
+        files["parquet"] = stem + ".parquet" # daily series; the other formats carry the summary
+        _write_parquet(daily.assign(name=name), os.path.join(output_dir, files["parquet"]))
+    return files
+
+class ReportEngine:
+    """
+    Builds per-product and per-keyword reports (HTML, JSON, Parquet) under REPORT_DIR.
+
+    Inputs are the stored aggregates (review_rollups, review_alerts, survey_answer_counts
+    and the product registry's keyword links); review rows are never read. A manifest records each
+    report's rollup watermark, so a build only regenerates products whose rollups
+    changed since the last build and keywords with such a product or new members.
+    Reports are rendered in parallel in a process pool.
+    """
+    def __init__(self, db_handler, output_dir=None, workers=None, formats=None):
+        self.db_handler = db_handler
+        self.output_dir = output_dir or Config.REPORT_DIR
+        self.workers = workers or Config.REPORT_WORKERS or os.cpu_count()
+        self.formats = tuple(formats or FORMATS)
+        self.manifest_path = os.path.join(self.output_dir, MANIFEST_NAME)
+        logger.info(f"ReportEngine initialized (output: {self.output_dir}, workers: {self.workers}).")
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"products": {}, "keywords": {}}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable report manifest {self.manifest_path} ({e}); rebuilding all reports.")
+            return {"products": {}, "keywords": {}}
+
+    def build(self, force=False):
+        """
+        Regenerates stale reports (all of them with force=True) and the index page.
+        Returns {'products': built, 'keywords': built, 'skipped': up-to-date reports}.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = {"products": {}, "keywords": {}} if force else self._load_manifest()
+        watermarks = {name: updated_at.isoformat() for name, updated_at in self.db_handler.get_rollup_watermarks().items() if updated_at}
+        keyword_products = self.db_handler.get_keyword_products()
+
+        stale_products = [name for name, watermark in watermarks.items()
+                          if manifest["products"].get(name, {}).get("watermark") != watermark]
+        keyword_watermarks = {keyword: max((watermarks[name] for name in names if name in watermarks), default=None)
+                              for keyword, names in keyword_products.items()}
+        stale_keywords = [keyword for keyword, names in keyword_products.items()
+                          if keyword_watermarks[keyword] and (manifest["keywords"].get(keyword, {}).get("watermark") != keyword_watermarks[keyword]
+                                                              or manifest["keywords"][keyword].get("products") != names)]
+        skipped = len(watermarks) - len(stale_products) + len(keyword_products) - len(stale_keywords)
+        if not stale_products and not stale_keywords:
+            logger.info(f"Reports are up to date ({skipped} reports).")
+            return {"products": 0, "keywords": 0, "skipped": skipped}
+
+        jobs = self._jobs(stale_products, stale_keywords, keyword_products, watermarks)
+        with metrics.timed(metrics.REPORT_SECONDS.labels(source="engine")):
+            results = self._render(jobs)
+        for (kind, name, _), files in zip(jobs, results):
+            if files is None:
+                continue
+            if kind == "product":
+                manifest["products"][name] = {"watermark": watermarks[name], "files": files}
+            else:
+                manifest["keywords"][name] = {"watermark": keyword_watermarks[name], "products": keyword_products[name], "files": files}
+        _write_atomic(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=1))
+        self._write_index(manifest)
+
+        built_products = sum(1 for (kind, _, _), files in zip(jobs, results) if kind == "product" and files is not None)
+        built_keywords = sum(1 for (kind, _, _), files in zip(jobs, results) if kind == "keyword" and files is not None)
+        logger.info(f"Reports built: {built_products} products, {built_keywords} keywords ({skipped} up to date).")
+        return {"products": built_products, "keywords": built_keywords, "skipped": skipped}
+
+    def _jobs(self, stale_products, stale_keywords, keyword_products, watermarks):
+        """(kind, name, payload) per report to render, with the aggregates it needs."""
+        needed = set(stale_products) | {name for keyword in stale_keywords for name in keyword_products[keyword] if name in watermarks}
+        daily = self.db_handler.get_product_rollups(needed, "day")
+        weekly = self.db_handler.get_product_rollups(needed, "week")
+        alerts = {}
+        for alert in self.db_handler.get_alerts(product_names=needed, limit=None):
+            alerts.setdefault(alert["product_name"], []).append(alert)
+        survey = {}
+        for row in self.db_handler.get_survey_distribution(product_names=needed):
+            survey.setdefault(row.pop("product_name"), []).append(row)
+        product_keywords = {}
+        for keyword, names in keyword_products.items():
+            for name in names:
+                product_keywords.setdefault(name, []).append(keyword)
+        generated_at = datetime.datetime.now().isoformat(timespec="seconds")
+
+        jobs = []
+        for name in stale_products:
+            jobs.append(("product", name, {"daily": daily[name], "weekly": weekly[name], "alerts": alerts.get(name, [])[:20],
+                                           "survey": survey.get(name, []), "keywords": sorted(product_keywords.get(name, [])), "generated_at": generated_at}))
+        for keyword in stale_keywords:
+            members = [name for name in keyword_products[keyword] if name in watermarks]
+            products = sorted(({"product_name": name, **summarize(daily[name])} for name in members), key=lambda p: -p["total_reviews"])
+            keyword_alerts = sorted((alert for name in members for alert in alerts.get(name, [])), key=lambda a: a["period_start"], reverse=True)
+            jobs.append(("keyword", keyword, {"daily": sum_rollups(daily[name] for name in members),
+                                              "weekly": sum_rollups(weekly[name] for name in members),
+                                              "alerts": keyword_alerts[:20], "products": products,
+                                              "survey": sum_survey(survey.get(name, []) for name in members), "generated_at": generated_at}))
+        return jobs
+
+    def _render(self, jobs):
+        """Renders jobs in a process pool; a failed report is logged and retried on the next build."""
+        if self.workers <= 1 or len(jobs) < 2:
+            results = []
+            for kind, name, payload in jobs:
+                try:
+                    results.append(render_report(kind, name, payload, self.output_dir, self.formats))
+                except Exception as e:
+                    logger.error(f"Failed to build {kind} report '{name}': {e}")
+                    results.append(None)
+            return results
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as pool:
+            futures = [pool.submit(render_report, kind, name, payload, self.output_dir, self.formats) for kind, name, payload in jobs]
+            results = []
+            for (kind, name, _), future in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"Failed to build {kind} report '{name}': {e}")
+                    results.append(None)
+            return results
+
+    def _write_index(self, manifest):
+        sections = []
+        for kind, title in (("keywords", "Keywords"), ("products", "Products")):
+            links = "".join(f"<li><a href='{html.escape(entry['files']['html'])}'>{html.escape(name)}</a></li>"
+                            for name, entry in sorted(manifest[kind].items()) if "html" in entry.get("files", {}))
+            sections.append(f"<h2>{title}</h2><ul>{links}</ul>")
+        _write_atomic(os.path.join(self.output_dir, "index.html"),
+                      f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Review Reports</title></head><body><h1>Review Reports</h1>{''.join(sections)}</body></html>")
@@ -1,51 +1,127 @@
 import pandas as pd
 from src.utils.logger import logger
+from src.utils import metrics
 
 class ReportGenerator:
     def __init__(self):
         logger.info("ReportGenerator initialized.")
 
-    def generate_summary_report(self, df: pd.DataFrame):
+    def exclude_duplicates(self, df: pd.DataFrame):
+        """
+        Drops reviews flagged by NearDuplicateDetector, keeping one review per cluster.
+        """
+        if df.empty or 'is_duplicate' not in df.columns:
+            return df
+        return df[df['is_duplicate'].fillna(False) == False]
+
+    def generate_summary_report(self, df: pd.DataFrame, aspect_counts=None, complaint_themes=None, exclude_duplicates=True, alerts=None,
+                                survey_distribution=None):
         """
         Generates a summary report from the review DataFrame.
+        aspect_counts (from DatabaseHandler.get_aspect_counts) adds an aspect section,
+        complaint_themes (from embedding_index.find_complaint_themes) a complaint theme section,
+        alerts (from DatabaseHandler.get_alerts) an anomaly alert section and
+        survey_distribution (from DatabaseHandler.get_survey_distribution) a survey answer section.
+        Near-duplicate reviews are left out of the statistics unless exclude_duplicates is False.
         """
         if df.empty:
             logger.warning("DataFrame is empty, cannot generate report.")
             return "No data available for reporting."
 
+        with metrics.timed(metrics.REPORT_SECONDS.labels(source="dataframe")):
+            return self._generate_summary_report(df, aspect_counts, complaint_themes, exclude_duplicates, alerts, survey_distribution)
+
+    def _generate_summary_report(self, df, aspect_counts, complaint_themes, exclude_duplicates, alerts, survey_distribution):
+        duplicate_count = 0
+        if exclude_duplicates:
+            deduplicated_df = self.exclude_duplicates(df)
+            duplicate_count = len(df) - len(deduplicated_df)
+            df = deduplicated_df
+
+        stats = {
+            "total_reviews": len(df),
+            "duplicates_excluded": duplicate_count,
+            "unique_products": df['상품명'].nunique(),
+            "average_rating": df['평점'].mean(),
+            # Sentiment distribution (if sentiment analysis was performed)
+            "sentiment_distribution": (df['sentiment_label'].value_counts(normalize=True) * 100).to_dict() if 'sentiment_label' in df.columns else {},
+            # Top N products by review count / average rating
+            "top_products_by_count": list(df['상품명'].value_counts().head(5).items()),
+            "top_products_by_rating": list(df.groupby('상품명', observed=True)['평점'].mean().sort_values(ascending=False).head(5).items()),
+            "reviews_per_date": [],
+        }
+
+        # Reviews over time (simple count per day/month)
+        if 'created_at' in df.columns and not df['created_at'].isnull().all():
+            # A local Series: the caller's frame is never modified
+            review_dates = pd.to_datetime(df['created_at']).dt.date
+            stats["reviews_per_date"] = list(review_dates.value_counts().sort_index().tail(5).items())
+
+        return self._format_report(stats, aspect_counts, complaint_themes, alerts, survey_distribution)
+
+    def generate_summary_report_from_analytics(self, analytics, aspect_counts=None, complaint_themes=None, exclude_duplicates=True, alerts=None,
+                                               survey_distribution=None):
+        """
+        Generates the same summary report with every aggregate computed as SQL by an
+        AnalyticsEngine (DuckDB snapshot or the primary database) instead of in pandas.
+        """
+        with metrics.timed(metrics.REPORT_SECONDS.labels(source="analytics")):
+            stats = analytics.summary_stats(exclude_duplicates=exclude_duplicates)
+            if not stats["total_reviews"]:
+                logger.warning("No reviews in the analytics store, cannot generate report.")
+                return "No data available for reporting."
+            return self._format_report(stats, aspect_counts, complaint_themes, alerts, survey_distribution)
+
+    def _format_report(self, stats, aspect_counts=None, complaint_themes=None, alerts=None, survey_distribution=None):
         report_lines = []
         report_lines.append("--- Review Analysis Report ---")
-        report_lines.append(f"Total Reviews: {len(df)}")
-        report_lines.append(f"Unique Products: {df['상품명'].nunique()}")
-        report_lines.append(f"Average Rating: {df['평점'].mean():.2f} / 5.0")
+        report_lines.append(f"Total Reviews: {stats['total_reviews']}")
+        if stats['duplicates_excluded']:
+            report_lines.append(f"Near-Duplicate Reviews Excluded: {stats['duplicates_excluded']}")
+        report_lines.append(f"Unique Products: {stats['unique_products']}")
+        report_lines.append(f"Average Rating: {stats['average_rating']:.2f} / 5.0")
 
-        # Sentiment distribution (if sentiment analysis was performed)
-        if 'sentiment_label' in df.columns:
-            sentiment_counts = df['sentiment_label'].value_counts(normalize=True) * 100
+        if stats['sentiment_distribution']:
             report_lines.append("\nSentiment Distribution:")
-            for sentiment, percentage in sentiment_counts.items():
+            for sentiment, percentage in stats['sentiment_distribution'].items():
                 report_lines.append(f"  - {sentiment.capitalize()}: {percentage:.2f}%")
 
-        # Top N products by review count
-        top_products = df['상품명'].value_counts().head(5)
         report_lines.append("\nTop 5 Products by Review Count:")
-        for product, count in top_products.items():
+        for product, count in stats['top_products_by_count']:
             report_lines.append(f"  - {product}: {count} reviews")
 
-        # Top N products by average rating
-        avg_ratings = df.groupby('상품명')['평점'].mean().sort_values(ascending=False).head(5)
         report_lines.append("\nTop 5 Products by Average Rating:")
-        for product, rating in avg_ratings.items():
+        for product, rating in stats['top_products_by_rating']:
             report_lines.append(f"  - {product}: {rating:.2f}")
 
-        # Reviews over time (simple count per day/month)
-        if 'created_at' in df.columns and not df['created_at'].isnull().all():
-            df['review_date'] = pd.to_datetime(df['created_at']).dt.date
-            reviews_per_date = df['review_date'].value_counts().sort_index()
+        if stats['reviews_per_date']:
             report_lines.append("\nReviews per Date (Top 5 recent):")
-            for date, count in reviews_per_date.tail(5).items():
+            for date, count in stats['reviews_per_date']:
                 report_lines.append(f"  - {date}: {count} reviews")
 
+        if aspect_counts:
+            report_lines.append("\nAspect Mentions (positive / negative / total):")
+            for aspect, counts in self.get_aspect_summary(aspect_counts).items():
+                report_lines.append(f"  - {aspect}: {counts['positive']} / {counts['negative']} / {counts['total']}")
+
+        if survey_distribution:
+            report_lines.append("\nSurvey Answers (share of reviews answering):")
+            for question, answers in self.get_survey_summary(survey_distribution).items():
+                report_lines.append(f"  - {question}: " + ", ".join(f"{row['answer']} {row['share'] * 100:.0f}%" for row in answers))
+
+        if complaint_themes:
+            report_lines.append("\nTop Complaint Themes:")
+            for product, themes in complaint_themes.items():
+                report_lines.append(f"  - {product}:")
+                for theme in themes:
+                    example = theme['example'][:60].replace("\n", " ")
+                    report_lines.append(f"      * {theme['share'] * 100:.0f}% ({theme['size']} reviews) {', '.join(theme['keywords'])} - e.g. \"{example}\"")
+
+        if alerts:
+            report_lines.append("\nAnomaly Alerts (most recent):")
+            for alert in alerts:
+                report_lines.append(f"  - {self.format_alert(alert)}")
+
         logger.info("Summary report generated.")
         return "\n".join(report_lines)
 
@@ -56,7 +132,7 @@ class ReportGenerator:
         if df.empty:
             return pd.DataFrame()
         
-        product_stats = df.groupby('상품명').agg(
+        product_stats = df.groupby('상품명', observed=True).agg(
             total_reviews=('리뷰제목', 'count'),
             average_rating=('평점', 'mean')
         ).reset_index()
@@ -77,8 +153,40 @@ class ReportGenerator:
         """
         if df.empty or 'created_at' not in df.columns or df['created_at'].isnull().all():
             return pd.Series()
-        df['review_date'] = pd.to_datetime(df['created_at']).dt.date
-        return df['review_date'].value_counts().sort_index()
+        return pd.to_datetime(df['created_at']).dt.date.value_counts().sort_index()
+
+    def format_alert(self, alert):
+        """One-line description of a review_alerts row."""
+        period_start = alert['period_start'].date() if hasattr(alert['period_start'], 'date') else alert['period_start']
+        if alert['metric'] == 'negative_share':
+            change = f"negative share {alert['value'] * 100:.0f}% (baseline {alert['baseline_mean'] * 100:.0f}% ± {alert['baseline_std'] * 100:.0f}%)"
+        elif alert['metric'] == 'rating':
+            change = f"average rating {alert['value']:.2f} (baseline {alert['baseline_mean']:.2f} ± {alert['baseline_std']:.2f})"
+        else:
+            change = f"{alert['value']:.0f} reviews (baseline {alert['baseline_mean']:.1f} ± {alert['baseline_std']:.1f})"
+        return f"{period_start} [{alert['period']}] {alert['product_name']}: {change}, z={alert['z_score']:.1f}"
+
+    def get_survey_summary(self, survey_distribution, top_answers=5):
+        """
+        Groups answer distribution rows into {question: [top answers by count]}, questions ordered by responses.
+        """
+        summary = {}
+        for row in survey_distribution:
+            summary.setdefault(row['question'], []).append(row)
+        ordered = sorted(summary.items(), key=lambda item: sum(row['count'] for row in item[1]), reverse=True)
+        return {question: sorted(rows, key=lambda row: -row['count'])[:top_answers] for question, rows in ordered}
+
+    def get_aspect_summary(self, aspect_counts):
+        """
+        Folds aspect index counts into {aspect: {'positive', 'negative', 'total'}}, ordered by total.
+        """
+        summary = {}
+        for row in aspect_counts:
+            counts = summary.setdefault(row['aspect'], {'positive': 0, 'negative': 0, 'total': 0})
+            if row['sentiment'] in ('positive', 'negative'):
+                counts[row['sentiment']] += row['count']
+            counts['total'] += row['count']
+        return dict(sorted(summary.items(), key=lambda item: item[1]['total'], reverse=True))
 
 
 if __name__ == "__main__":
@@ -93,8 +201,14 @@ if __name__ == "__main__":
     sample_df = pd.DataFrame(data)
     sample_df['created_at'] = pd.to_datetime(sample_df['created_at'])
 
+    sample_aspects = [
+        {'aspect': '배송', 'sentiment': 'negative', 'count': 2},
+        {'aspect': '배송', 'sentiment': 'positive', 'count': 1},
+        {'aspect': '가격', 'sentiment': 'positive', 'count': 3},
+    ]
+
     generator = ReportGenerator()
-    report = generator.generate_summary_report(sample_df)
+    report = generator.generate_summary_report(sample_df, aspect_counts=sample_aspects)
     logger.info(report)
 
     product_stats = generator.get_product_review_stats(sample_df)
@@ -0,0 +1,200 @@
+import os
+import re
+import sqlite3
+import time
+import pandas as pd
+from contextlib import contextmanager
+from src.config import Config
+from src.utils.logger import logger
+
+# 한글/한자 등 띄어쓰기가 형태소 경계가 아닌 문자 (음절 바이그램으로 색인)
+CJK_PATTERN = re.compile(r'[가-힣ㄱ-ㆎ一-鿿]')
+WORD_PATTERN = re.compile(r'\w+')
+
+def tokenize(text):
+    """
+    Korean-aware n-gram tokenizer.
+    Hangul words become overlapping syllable bigrams ('배송이' -> '배송', '송이') so that
+    particles and compounds still match; other words are kept whole and lowercased.
+    """
+    tokens = []
+    if not text:
+        return tokens
+    for word in WORD_PATTERN.findall(text.lower()):
+        if CJK_PATTERN.search(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+def _present(value):
+    """value, or None when it is missing (None, or NaN / NaT / pd.NA from a DataFrame row)."""
+    return None if value is None or pd.isna(value) else value
+
+def product_token(product_id):
+    """Product ids are indexed as a single FTS token so product filters intersect posting lists."""
+    return "p" + "".join(ch for ch in str(product_id) if ch.isalnum())
+
+def build_match_query(query):
+    """
+    Turns a user query into an FTS5 MATCH expression: every word must match,
+    multi-syllable words as a phrase of adjacent bigrams, single syllables as a prefix.
+    """
+    clauses = []
+    for word in WORD_PATTERN.findall(query.lower()):
+        if CJK_PATTERN.search(word) and len(word) == 1:
+            clauses.append(f'"{word}"*')
+        else:
+            clauses.append('"' + " ".join(tokenize(word)) + '"')
+    return " AND ".join(clauses)
+
+class ReviewSearchIndex:
+    """
+    Full-text index over 리뷰제목/리뷰본문 kept in a SQLite FTS5 sidecar file.
+    Rows are keyed by review id, so results are resolved against the main database.
+    """
+    # bm25 column weights: title matches count twice as much as body matches
+    TITLE_WEIGHT = 2.0
+    CONTENT_WEIGHT = 1.0
+
+    def __init__(self, index_path=None, max_candidates=None):
+        self.index_path = index_path or Config.SEARCH_INDEX_PATH
+        self.max_candidates = Config.SEARCH_MAX_CANDIDATES if max_candidates is None else max_candidates
+        index_dir = os.path.dirname(self.index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self._create_schema()
+        logger.info(f"ReviewSearchIndex initialized at {self.index_path}")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn: # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_schema(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL") # readers never block the insert hook
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS review_docs (
+                    review_id INTEGER PRIMARY KEY,
+                    product_id TEXT,
+                    rating REAL,
+                    created_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS ix_review_docs_product ON review_docs (product_id, created_at);
+                CREATE INDEX IF NOT EXISTS ix_review_docs_created ON review_docs (created_at);
+                CREATE VIRTUAL TABLE IF NOT EXISTS review_fts USING fts5(title, content, product, tokenize='unicode61');
+            """)
+
+    def index_reviews(self, reviews):
+        """
+        Adds or replaces reviews in the index. Used as a DatabaseHandler insert hook,
+        so each review dict carries its database 'id'.
+        """
+        docs, texts = [], []
+        for review in reviews:
+            review_id = review.get('id')
+            if review_id is None:
+                continue
+            created_at = _present(review.get('작성일'))
+            rating = _present(review.get('평점'))
+            product_id = _present(review.get('쿠팡상품번호')) or None
+            docs.append((
+                int(review_id),
+                str(product_id) if product_id is not None else None,
+                float(rating) if rating is not None else None,
+                created_at.strftime('%Y-%m-%d') if hasattr(created_at, 'strftime') else None
+            ))
+            texts.append((
+                int(review_id),
+                " ".join(tokenize(_present(review.get('리뷰제목')))),
+                " ".join(tokenize(_present(review.get('리뷰본문')))),
+                product_token(product_id or "")
+            ))
+        if not docs:
+            return 0
+
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO review_docs (review_id, product_id, rating, created_at) VALUES (?, ?, ?, ?)", docs)
+            conn.executemany("DELETE FROM review_fts WHERE rowid = ?", [(doc[0],) for doc in docs])
+            conn.executemany("INSERT INTO review_fts (rowid, title, content, product) VALUES (?, ?, ?, ?)", texts)
+        logger.info(f"Indexed {len(docs)} reviews for full-text search.")
+        return len(docs)
+
+    def remove_reviews(self, review_ids):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM review_docs WHERE review_id = ?", [(int(i),) for i in review_ids])
+            conn.executemany("DELETE FROM review_fts WHERE rowid = ?", [(int(i),) for i in review_ids])
+
+    def rebuild(self, db_handler, transformer, chunk_size=5000):
+        """
+        Re-indexes every review in the main database (e.g. for rows stored before the index existed).
+        Reviews are streamed in id order, chunk_size at a time, so memory stays flat on large tables.
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM review_docs")
+            conn.execute("DELETE FROM review_fts")
+        indexed = 0
+        for chunk in db_handler.iter_reviews(chunk_size):
+            indexed += self.index_reviews(transformer.to_dataframe(chunk).to_dict(orient='records'))
+        with self._connect() as conn:
+            conn.execute("INSERT INTO review_fts (review_fts) VALUES ('optimize')")
+        logger.info(f"Rebuilt full-text index with {indexed} reviews.")
+        return indexed
+
+    def search(self, query, product_id=None, min_rating=None, max_rating=None, date_from=None, date_to=None, limit=20, offset=0):
+        """
+        Returns BM25-ranked matches as [{'review_id', 'score'}], best first.
+        Dates are 'YYYY-MM-DD' strings and bound the review's 작성일 inclusively.
+
+        With max_candidates (SEARCH_MAX_CANDIDATES) > 0 the search is recency-biased: a query
+        with more matches than that ranks only the newest max_candidates of them, so common
+        terms stay fast but older, more relevant reviews can be missed. With 0 every match is
+        scored (exact top-k; ~2 us per match, e.g. ~0.7 s for a term in a third of 1M reviews,
+        see benchmarks/bench_search.py).
+        """
+        match_query = build_match_query(query or "")
+        if not match_query:
+            return []
+        if product_id:
+            match_query += f' AND product : "{product_token(product_id)}"'
+
+        sql = [
+            f"SELECT review_fts.rowid AS rowid, bm25(review_fts, {self.TITLE_WEIGHT}, {self.CONTENT_WEIGHT}, 0.0) AS score",
+            "FROM review_fts JOIN review_docs d ON d.review_id = review_fts.rowid",
+            "WHERE review_fts MATCH ?"
+        ]
+        params = [match_query]
+        if min_rating is not None:
+            sql.append("AND d.rating >= ?")
+            params.append(float(min_rating))
+        if max_rating is not None:
+            sql.append("AND d.rating <= ?")
+            params.append(float(max_rating))
+        if date_from:
+            sql.append("AND d.created_at >= ?")
+            params.append(date_from)
+        if date_to:
+            sql.append("AND d.created_at <= ?")
+            params.append(date_to)
+        if self.max_candidates:
+            sql = ["SELECT rowid, score FROM ("] + sql + ["ORDER BY review_fts.rowid DESC LIMIT ?)"]
+            params.append(int(self.max_candidates))
+        sql.append("ORDER BY score LIMIT ? OFFSET ?")
+        params.extend([int(limit), int(offset)])
+
+        start = time.perf_counter()
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(" ".join(sql), params).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.error(f"Full-text search failed for query '{query}': {e}")
+            return []
+        logger.debug(f"Search '{query}' returned {len(rows)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+        # FTS5 bm25() is lower-is-better; flip the sign so higher scores rank first for callers
+        return [{"review_id": review_id, "score": -score} for review_id, score in rows]
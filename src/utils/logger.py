@@ -1,22 +1,112 @@
 from loguru import logger
+from dotenv import load_dotenv
+import datetime
+import json
+import os
 import sys
+import threading
+import time
+
+# src.config imports this module, so logging settings are read from the environment directly
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE_LEVEL = os.getenv("LOG_FILE_LEVEL", LOG_LEVEL)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json") # file sink format: json (one object per line) or text
+LOG_FILE = os.getenv("LOG_FILE", "logs/app.jsonl" if LOG_FORMAT == "json" else "logs/app.log")
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "true").lower() == "true" # write on a background thread
+# Hot-loop sampling: "key=rate,..." keeps roughly rate (0-1] of the messages logged under key
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "crawler.review=0.01")
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "20")) # max sampled messages per key per second
+
+# Structured context fields, set with logger.contextualize(...) or logger.bind(...)
+CONTEXT_FIELDS = ("stage", "product_id", "job_id")
+
+class LogSampler:
+    """
+    Decides whether a hot-loop message should be logged at all, so callers can skip
+    formatting it: `if sample("crawler.review"): logger.debug(...)`.
+    Keeps every Nth message per key (N = 1 / rate) and at most rate_limit per second.
+    """
+    def __init__(self, rates=None, rate_limit=None):
+        self.every = {key: max(1, round(1 / rate)) for key, rate in (rates or {}).items() if rate > 0}
+        self.rate_limit = rate_limit or LOG_RATE_LIMIT
+        self._counts = {}
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, key):
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+            if count % self.every.get(key, 1):
+                return False
+            window_start, emitted = self._windows.get(key, (0.0, 0))
+            now = time.monotonic()
+            if now - window_start >= 1.0:
+                window_start, emitted = now, 0
+            if emitted >= self.rate_limit:
+                self._windows[key] = (window_start, emitted)
+                return False
+            self._windows[key] = (window_start, emitted + 1)
+            return True
+
+    def seen(self, key):
+        """Total messages offered under key, logged or not."""
+        return self._counts.get(key, 0)
+
+def _parse_sampling(spec):
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, rate = item.partition("=")
+        try:
+            rates[key.strip()] = float(rate)
+        except ValueError:
+            pass
+    return rates
+
+def _json_format(record):
+    # Rendered into extra so loguru's formatter does not re-interpret braces in the payload
+    payload = {
+        "time": record["time"].astimezone(datetime.timezone.utc).isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    for field in CONTEXT_FIELDS:
+        if record["extra"].get(field) is not None:
+            payload[field] = record["extra"][field]
+    if record["exception"] is not None:
+        payload["exception"] = repr(record["exception"].value)
+    record["extra"]["_json"] = json.dumps(payload, ensure_ascii=False, default=str)
+    return "{extra[_json]}\n"
+
+def _context_suffix(record):
+    parts = [f"{field}={record['extra'][field]}" for field in CONTEXT_FIELDS if record["extra"].get(field) is not None]
+    record["extra"]["_context"] = f" [{' '.join(parts)}]" if parts else ""
 
 def setup_logging():
     logger.remove()  # Remove default handler
+    logger.configure(extra={field: None for field in CONTEXT_FIELDS}, patcher=_context_suffix)
     logger.add(
         sys.stderr,
-        level="INFO",
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        colorize=True
+        level=LOG_LEVEL,
+        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan>{extra[_context]} - <level>{message}</level>",
+        colorize=True,
+        enqueue=LOG_ENQUEUE
     )
     logger.add(
-        "logs/app.log",
+        LOG_FILE,
         rotation="10 MB",  # Rotate file every 10 MB
         retention="7 days", # Keep logs for 7 days
-        level="INFO",
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+        level=LOG_FILE_LEVEL,
+        format=_json_format if LOG_FORMAT == "json" else "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line}{extra[_context]} - {message}",
+        enqueue=LOG_ENQUEUE
     )
     return logger
 
 # Initialize logger
 logger = setup_logging()
+sample = LogSampler(_parse_sampling(LOG_SAMPLING))
@@ -0,0 +1,153 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+
+# Every pipeline metric is prefixed so the summary can tell them from process/GC collectors
+NAMESPACE = "coupang"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BATCH_BUCKETS = (1, 8, 16, 32, 64, 128, 256, 512, 1000, 5000, 10000)
+
+# Crawler
+SEARCH_PAGE_SECONDS = Histogram("search_page_fetch_seconds", "Latency of search result page requests.", namespace=NAMESPACE, buckets=LATENCY_BUCKETS)
+DETAIL_PAGE_SECONDS = Histogram("detail_page_fetch_seconds", "Latency of product detail page requests.", namespace=NAMESPACE, buckets=LATENCY_BUCKETS)
+PAGE_FETCH_ERRORS = Counter("page_fetch_errors", "Failed HTTP page requests.", ["page_type"], namespace=NAMESPACE)
+WEBDRIVER_COMMANDS = Counter("webdriver_commands", "Remote WebDriver commands sent (each one is a round trip to the browser).", ["command"], namespace=NAMESPACE)
+WEBDRIVER_CALLS_PER_PRODUCT = Histogram("webdriver_calls_per_product", "WebDriver commands needed to collect one product's reviews.", namespace=NAMESPACE,
+                                        buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000))
+PRODUCT_CRAWL_SECONDS = Histogram("product_review_crawl_seconds", "Time to collect all reviews of one product.", namespace=NAMESPACE, buckets=LATENCY_BUCKETS)
+PRODUCT_CRAWL_PLANS = Counter("product_crawl_plans", "Registry decisions per product (full, incremental, skip).", ["mode"], namespace=NAMESPACE)
+REVIEWS_COLLECTED = Counter("reviews_collected", "Reviews scraped from product pages.", namespace=NAMESPACE)
+CRAWL_RETRIES = Counter("crawl_retries", "Requests retried after a retryable failure.", ["page_type"], namespace=NAMESPACE)
+CRAWL_THROTTLE_EVENTS = Counter("crawl_throttle_events", "429/403 responses, block pages and timeouts.", ["page_type", "reason"], namespace=NAMESPACE)
+CRAWL_REQUEST_RATE = Gauge("crawl_request_rate", "Current AIMD request rate (requests per second).", namespace=NAMESPACE)
+CIRCUIT_STATE = Gauge("crawl_circuit_state", "Crawler circuit breaker state (0 closed, 1 half-open, 2 open).", namespace=NAMESPACE)
+PARSER_SELECTOR_FALLBACKS = Counter("parser_selector_fallbacks", "Fields found only by a fallback selector (selector config drift).", ["page", "field"], namespace=NAMESPACE)
+PARSER_SELECTOR_MISSES = Counter("parser_selector_misses", "Fields no configured selector matched.", ["page", "field"], namespace=NAMESPACE)
+CIRCUIT_TRIPS = Counter("crawl_circuit_trips", "Times the crawler circuit breaker opened.", namespace=NAMESPACE)
+ARCHIVED_PAGES = Counter("archived_pages", "Pages written to the raw page archive (stored, or deduplicated when unchanged).", ["page_type", "result"], namespace=NAMESPACE)
+SCHEDULED_CRAWLS = Counter("scheduled_crawls", "Crawl tasks queued by the watchlist scheduler.", ["kind"], namespace=NAMESPACE)
+BROWSER_BUDGET_USED = Gauge("scheduler_browser_budget_used_seconds", "Browser seconds reserved by the scheduler today.", namespace=NAMESPACE)
+
+# ETL
+TRANSFORM_SECONDS = Histogram("transform_seconds", "ReviewTransformer.transform call latency.", namespace=NAMESPACE, buckets=LATENCY_BUCKETS)
+TRANSFORM_ROWS = Counter("transform_rows", "Reviews transformed.", namespace=NAMESPACE)
+
+# Database
+INSERT_BATCH_SECONDS = Histogram("db_insert_batch_seconds", "DatabaseHandler.insert_reviews batch latency (commit included, hooks excluded).", namespace=NAMESPACE, buckets=LATENCY_BUCKETS)
+INSERT_ROWS = Counter("db_inserted_rows", "Reviews inserted.", namespace=NAMESPACE)
+INSERT_HOOK_SECONDS = Histogram("db_insert_hook_seconds", "Latency of insert / sentiment hooks (search index, near-duplicates, embeddings, anomaly checks).", ["hook"], namespace=NAMESPACE, buckets=LATENCY_BUCKETS)
+
+ANOMALY_ALERTS = Counter("review_anomaly_alerts", "New rollup anomaly alerts (rating drops, negative-share spikes, review bursts).", namespace=NAMESPACE)
+
+# ML
+INFERENCE_SECONDS = Histogram("inference_seconds", "Model inference call latency.", ["model"], namespace=NAMESPACE, buckets=LATENCY_BUCKETS)
+INFERENCE_TEXTS = Counter("inference_texts", "Texts sent to a model.", ["model"], namespace=NAMESPACE)
+INFERENCE_BATCH_SIZE = Histogram("inference_batch_size", "Texts per inference call.", ["model"], namespace=NAMESPACE, buckets=BATCH_BUCKETS)
+
+# Caches (label reuse, page cache, ...)
+CACHE_REQUESTS = Counter("cache_requests", "Cache lookups by result.", ["cache", "result"], namespace=NAMESPACE)
+
+# Reporting
+REPORT_SECONDS = Histogram("report_generation_seconds", "Summary report generation latency.", ["source"], namespace=NAMESPACE, buckets=LATENCY_BUCKETS)
+
+@contextmanager
+def timed(histogram):
+    """Observes the wall time of the with-block on histogram (already labelled if needed)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+def record_cache(cache, hits, misses=0):
+    CACHE_REQUESTS.labels(cache=cache, result="hit").inc(hits)
+    CACHE_REQUESTS.labels(cache=cache, result="miss").inc(misses)
+
+def export_metrics():
+    """Returns (body, content_type) in the Prometheus text exposition format."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+def _samples():
+    samples = {}
+    for metric in REGISTRY.collect():
+        if not metric.name.startswith(NAMESPACE + "_"):
+            continue
+        for sample in metric.samples:
+            key = (sample.name, tuple(sorted(sample.labels.items())))
+            samples[key] = sample.value
+    return samples
+
+def _total(samples, name, **labels):
+    """Sums a sample over all label sets matching the given labels."""
+    wanted = set(labels.items())
+    return sum(value for (sample_name, sample_labels), value in samples.items()
+               if sample_name == f"{NAMESPACE}_{name}" and wanted <= set(sample_labels))
+
+def _label_values(samples, name, label):
+    return sorted({dict(sample_labels)[label] for (sample_name, sample_labels) in samples
+                   if sample_name == f"{NAMESPACE}_{name}" and label in dict(sample_labels)})
+
+def _rate(count, seconds):
+    return f"{count / seconds:,.1f}/s" if seconds else "n/a"
+
+def _mean(total, count, unit="s"):
+    return f"{total / count:.3f}{unit}" if count else "n/a"
+
+def summary():
+    """Human-readable per-stage summary of everything recorded in this process."""
+    s = _samples()
+    lines = ["--- Pipeline Metrics ---"]
+
+    search_count = _total(s, "search_page_fetch_seconds_count")
+    detail_count = _total(s, "detail_page_fetch_seconds_count")
+    lines.append(f"Search page fetches: {search_count:.0f} (avg {_mean(_total(s, 'search_page_fetch_seconds_sum'), search_count)}), "
+                 f"detail page fetches: {detail_count:.0f} (avg {_mean(_total(s, 'detail_page_fetch_seconds_sum'), detail_count)}), "
+                 f"errors: {_total(s, 'page_fetch_errors_total'):.0f}")
+
+    products = _total(s, "product_review_crawl_seconds_count")
+    reviews = _total(s, "reviews_collected_total")
+    lines.append(f"Products crawled: {products:.0f}, reviews collected: {reviews:.0f} "
+                 f"({_rate(reviews, _total(s, 'product_review_crawl_seconds_sum'))} while on product pages)")
+    plans = {mode: _total(s, "product_crawl_plans_total", mode=mode) for mode in ("full", "incremental", "skip")}
+    if any(plans.values()):
+        lines.append(f"Product registry: {plans['full']:.0f} full, {plans['incremental']:.0f} incremental, {plans['skip']:.0f} skipped")
+    lines.append(f"Retries: {_total(s, 'crawl_retries_total'):.0f}, throttle/block events: {_total(s, 'crawl_throttle_events_total'):.0f}, "
+                 f"circuit trips: {_total(s, 'crawl_circuit_trips_total'):.0f}, final request rate: {_total(s, 'crawl_request_rate'):.2f}/s")
+    fallbacks, misses = _total(s, "parser_selector_fallbacks_total"), _total(s, "parser_selector_misses_total")
+    if fallbacks or misses:
+        lines.append(f"Parser selector drift: {fallbacks:.0f} fallback hits, {misses:.0f} misses")
+    lines.append(f"WebDriver commands: {_total(s, 'webdriver_commands_total'):.0f} "
+                 f"(avg {_mean(_total(s, 'webdriver_calls_per_product_sum'), products, '')} per product)")
+
+    lines.append(f"Transform: {_total(s, 'transform_rows_total'):.0f} rows ({_rate(_total(s, 'transform_rows_total'), _total(s, 'transform_seconds_sum'))})")
+
+    batches = _total(s, "db_insert_batch_seconds_count")
+    lines.append(f"DB insert: {_total(s, 'db_inserted_rows_total'):.0f} rows in {batches:.0f} batches "
+                 f"(avg {_mean(_total(s, 'db_insert_batch_seconds_sum'), batches)} per batch)")
+    for hook in _label_values(s, "db_insert_hook_seconds_count", "hook"):
+        calls = _total(s, "db_insert_hook_seconds_count", hook=hook)
+        lines.append(f"  hook {hook}: avg {_mean(_total(s, 'db_insert_hook_seconds_sum', hook=hook), calls)}")
+
+    alerts = _total(s, "review_anomaly_alerts_total")
+    if alerts:
+        lines.append(f"Anomaly alerts raised: {alerts:.0f}")
+
+    for model in _label_values(s, "inference_texts_total", "model"):
+        texts = _total(s, "inference_texts_total", model=model)
+        calls = _total(s, "inference_batch_size_count", model=model)
+        lines.append(f"Inference [{model}]: {texts:.0f} texts ({_rate(texts, _total(s, 'inference_seconds_sum', model=model))}), "
+                     f"avg batch {_mean(texts, calls, '')}")
+
+    for cache in _label_values(s, "cache_requests_total", "cache"):
+        hits = _total(s, "cache_requests_total", cache=cache, result="hit")
+        revalidated = _total(s, "cache_requests_total", cache=cache, result="revalidated")
+        lookups = _total(s, "cache_requests_total", cache=cache)
+        hit_rate = f"{hits / lookups * 100:.1f}%" if lookups else "n/a"
+        lines.append(f"Cache [{cache}]: {lookups:.0f} lookups, hit rate {hit_rate}"
+                     + (f", {revalidated:.0f} revalidated (304)" if revalidated else ""))
+
+    for source in _label_values(s, "report_generation_seconds_count", "source"):
+        calls = _total(s, "report_generation_seconds_count", source=source)
+        lines.append(f"Report [{source}]: {calls:.0f} generated (avg {_mean(_total(s, 'report_generation_seconds_sum', source=source), calls)})")
+    return "\n".join(lines)
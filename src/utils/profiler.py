@@ -0,0 +1,136 @@
+import cProfile
+import datetime
+import gc
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from src.config import Config
+from src.utils.logger import logger
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError: # the sampling profiler is optional; cProfile is always available
+    SamplingProfiler = None
+
+class StageProfiler:
+    """
+    Profiles named pipeline stages for `main.py --profile`.
+
+    Each `with profiler.stage("insert"):` block runs under cProfile (or pyinstrument's
+    sampling profiler when mode is 'sampling', or 'auto' and it is installed) plus
+    tracemalloc, and writes to the run directory:
+      NN_<stage>.prof / NN_<stage>.html  CPU profile (open .prof with snakeviz or pstats)
+      NN_<stage>.txt                     top-N functions by cumulative time (cProfile only)
+      NN_<stage>_alloc.txt               top-N allocation sites grown during the stage
+    write_summary() adds summary.json / summary.txt with wall time, CPU time and peak
+    traced memory per stage. A disabled profiler's stage() only tags log records with
+    the stage name.
+    """
+    def __init__(self, enabled=False, mode="auto", output_dir=None, top_n=25):
+        self.enabled = enabled
+        self.top_n = top_n
+        self.stages = []
+        self.run_dir = None
+        if not enabled:
+            return
+        if mode == "auto":
+            mode = "sampling" if SamplingProfiler is not None else "cprofile"
+        elif mode == "sampling" and SamplingProfiler is None:
+            logger.warning("pyinstrument is not installed. Falling back to cProfile.")
+            mode = "cprofile"
+        self.mode = mode
+        self.run_dir = os.path.join(output_dir or Config.PROFILE_DIR, datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(self.run_dir, exist_ok=True)
+        logger.info(f"Profiling enabled ({self.mode}). Writing profiles to {self.run_dir}")
+
+    @contextmanager
+    def stage(self, name):
+        # Log records inside a stage carry its name, profiled or not
+        with logger.contextualize(stage=name):
+            if not self.enabled:
+                yield
+            else:
+                with self._profile(name):
+                    yield
+
+    @contextmanager
+    def _profile(self, name):
+
+        prefix = os.path.join(self.run_dir, f"{len(self.stages) + 1:02d}_{name}")
+        gc.collect()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.take_snapshot()
+        baseline_memory = tracemalloc.get_traced_memory()[0]
+
+        cpu_profiler = SamplingProfiler(interval=0.001) if self.mode == "sampling" else cProfile.Profile()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if self.mode == "cprofile":
+            cpu_profiler.enable()
+        else:
+            cpu_profiler.start()
+        try:
+            yield
+        finally:
+            if self.mode == "cprofile":
+                cpu_profiler.disable()
+            else:
+                cpu_profiler.stop()
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+            self._write_cpu_profile(cpu_profiler, prefix)
+            self._write_allocations(snapshot, baseline, prefix)
+            self.stages.append({
+                "stage": name,
+                "wall_seconds": round(wall, 4),
+                "cpu_seconds": round(cpu, 4),
+                "peak_memory_mb": round((peak_memory - baseline_memory) / 1024 / 1024, 2),
+                "retained_memory_mb": round((current_memory - baseline_memory) / 1024 / 1024, 2),
+            })
+            logger.info(f"[profile] {name}: {wall:.2f}s wall, {cpu:.2f}s CPU, peak +{(peak_memory - baseline_memory) / 1024 / 1024:.1f} MB")
+
+    def _write_cpu_profile(self, cpu_profiler, prefix):
+        if self.mode == "sampling":
+            with open(prefix + ".html", "w", encoding="utf-8") as f:
+                f.write(cpu_profiler.output_html())
+            return
+        cpu_profiler.dump_stats(prefix + ".prof")
+        stream = io.StringIO()
+        pstats.Stats(cpu_profiler, stream=stream).sort_stats("cumulative").print_stats(self.top_n)
+        with open(prefix + ".txt", "w", encoding="utf-8") as f:
+            f.write(stream.getvalue())
+
+    def _write_allocations(self, snapshot, baseline, prefix):
+        # Exclude the profilers' own bookkeeping from the report
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, cProfile.__file__)]
+        stats = snapshot.filter_traces(filters).compare_to(baseline.filter_traces(filters), "lineno")
+        with open(prefix + "_alloc.txt", "w", encoding="utf-8") as f:
+            f.write(f"Top {self.top_n} allocation sites by growth during the stage\n\n")
+            for stat in stats[:self.top_n]:
+                f.write(f"{stat}\n")
+
+    def write_summary(self):
+        """Writes summary.json / summary.txt for the run and returns the text table."""
+        if not self.enabled:
+            return ""
+        lines = [f"{'stage':<14}{'wall (s)':>10}{'cpu (s)':>10}{'peak (MB)':>12}{'retained (MB)':>15}"]
+        for stage in self.stages:
+            lines.append(f"{stage['stage']:<14}{stage['wall_seconds']:>10.2f}{stage['cpu_seconds']:>10.2f}"
+                         f"{stage['peak_memory_mb']:>12.1f}{stage['retained_memory_mb']:>15.1f}")
+        summary = "\n".join(lines)
+        with open(os.path.join(self.run_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump({"mode": self.mode, "stages": self.stages}, f, indent=2)
+        with open(os.path.join(self.run_dir, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(summary + "\n")
+        logger.info(f"Profile summary ({self.run_dir}):\n{summary}")
+        return summary
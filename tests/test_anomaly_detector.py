@@ -0,0 +1,87 @@
+import datetime
+import math
+import random
+import pytest
+from src.report.anomaly_detector import AnomalyDetector, ALERT_METRICS, PERIOD_STEPS, _poisson_tail
+
+WEEK = PERIOD_STEPS["week"]
+START = datetime.datetime(2023, 1, 2)
+
+def poisson(rng, mean):
+    """Knuth's Poisson sampler (small means only)."""
+    limit, count, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+def bucket(review_count, rating=4.5):
+    return {"review_count": review_count, "rating_sum": rating * review_count, "scored_count": 0, "negative_count": 0}
+
+def weekly_buckets(counts):
+    return {START + WEEK * index: bucket(count) for index, count in enumerate(counts) if count}
+
+@pytest.fixture
+def detector():
+    return AnomalyDetector(db_handler=None, baseline_periods=14, z_threshold=3.0, min_reviews=5, min_baseline=3, min_count_excess=5)
+
+def test_poisson_tail():
+    assert _poisson_tail(0, 2.0) == 1.0
+    assert _poisson_tail(1, 0.5) == pytest.approx(1 - math.exp(-0.5))
+    assert _poisson_tail(5, 1.4) == pytest.approx(0.01425, abs=1e-4)
+    assert 0 < _poisson_tail(600, 500) < 1e-4 # large means neither underflow nor round to 1
+
+def test_small_baseline_noise_is_not_a_burst(detector):
+    # Baseline 1.4 +- 0.8 reviews a week; 5 reviews happen by chance about once in 70 weeks
+    counts = [1, 2, 1, 3, 1, 0, 2, 1, 2, 1, 1, 2, 1, 2, 5]
+    assert "review_count" not in detector.evaluate(weekly_buckets(counts), START + WEEK * 14, WEEK)
+
+@pytest.mark.parametrize("mean", [0.8, 2.0, 6.0, 20.0])
+def test_random_volume_raises_no_review_count_alerts(detector, mean):
+    rng = random.Random(42)
+    for product in range(20):
+        counts = [poisson(rng, mean) for _ in range(100)]
+        buckets = weekly_buckets(counts)
+        for index in range(len(counts)):
+            anomalies = detector.evaluate(buckets, START + WEEK * index, WEEK)
+            assert "review_count" not in anomalies, f"product {product}, week {index}: {counts[max(0, index - 14):index + 1]}"
+
+def test_review_bomb_is_flagged(detector):
+    counts = [2, 1, 3, 2, 2, 1, 2, 3, 1, 2, 2, 1, 3, 2, 25]
+    anomalies = detector.evaluate(weekly_buckets(counts), START + WEEK * 14, WEEK)
+    assert anomalies["review_count"][0] == 25
+
+def test_burst_on_a_busy_product_is_flagged(detector):
+    counts = [200, 210, 190, 205, 195, 200, 215, 185, 200, 205, 195, 210, 190, 200, 320]
+    anomalies = detector.evaluate(weekly_buckets(counts), START + WEEK * 14, WEEK)
+    assert anomalies["review_count"][0] == 320
+
+def test_weeks_before_the_first_review_are_not_zero_volume(detector):
+    # The product appeared 4 weeks ago; the 10 weeks before that must not pull the baseline to ~1
+    counts = [0] * 10 + [4, 6, 5, 5, 9]
+    assert "review_count" not in detector.evaluate(weekly_buckets(counts), START + WEEK * 14, WEEK)
+
+def test_rating_drop_is_flagged(detector):
+    buckets = {START + WEEK * index: bucket(10, rating=4.5) for index in range(14)}
+    buckets[START + WEEK * 14] = bucket(10, rating=1.5)
+    anomalies = detector.evaluate(buckets, START + WEEK * 14, WEEK)
+    assert anomalies["rating"][0] == pytest.approx(1.5)
+
+def test_few_low_ratings_after_a_flat_baseline_are_not_a_drop(detector):
+    # Three weeks of only 5-star reviews have no spread, but one 2-star review among five is still chance
+    buckets = {START + WEEK * index: bucket(6, rating=5.0) for index in range(3)}
+    buckets[START + WEEK * 3] = bucket(5, rating=4.4)
+    assert "rating" not in detector.evaluate(buckets, START + WEEK * 3, WEEK)
+
+@pytest.mark.parametrize("seed", [0, 3, 4, 5, 6, 7])
+def test_random_reviews_raise_no_alerts(tmp_path, seed):
+    from benchmarks.synthetic import generate_reviews
+    from src.db.database_handler import DatabaseHandler
+    from src.etl.transformer import ReviewTransformer
+
+    db_handler = DatabaseHandler(db_url=f"sqlite:///{tmp_path / 'reviews.db'}")
+    db_handler.create_tables()
+    db_handler.insert_reviews(ReviewTransformer().transform(generate_reviews(3000, seed=seed, n_products=10)))
+    AnomalyDetector(db_handler).check(since=datetime.datetime.min)
+    alerts = [alert for alert in db_handler.get_alerts(limit=1000) if alert["metric"] in ALERT_METRICS]
+    assert alerts == []
@@ -0,0 +1,73 @@
+import os
+import re
+import pytest
+from src.crawler import html_parser
+from src.crawler.html_parser import HtmlParser, BACKENDS
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+# Simulated redeploy: every hashed CSS-module class gets a new hash
+REDEPLOY_CLASS_HASH = re.compile(r'\b([A-Z][A-Za-z]+_[A-Za-z]+__)[A-Za-z0-9]{5}\b')
+
+BACKEND_NAMES = [pytest.param(name, marks=pytest.mark.skipif(name == "lxml" and html_parser.lxml is None, reason="lxml is not installed"))
+                 for name in BACKENDS]
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+@pytest.fixture(scope="module")
+def pages():
+    return {name: read_fixture(f"{name}.html") for name in ("search_page", "product_detail", "review_page")}
+
+@pytest.fixture(params=BACKEND_NAMES)
+def parser(request):
+    return HtmlParser(backend=request.param)
+
+def test_search_page(parser, pages):
+    products = parser.parse_search_page(pages["search_page"])
+    assert len(products) == 36
+    assert all(name and price for name, price, _ in products)
+    assert all(link.startswith("https://www.coupang.com/vp/products/") for _, _, link in products)
+
+def test_search_page_without_products(parser):
+    assert parser.parse_search_page("<html><body><p>검색 결과가 없습니다</p></body></html>") is None
+
+def test_product_detail(parser, pages):
+    brand, product_id, options = parser.parse_product_detail(pages["product_detail"])
+    assert (brand, product_id) == ("삼성전자", "8000000000 - 20000000000")
+    assert options and "쿠팡상품번호" not in options
+
+def test_review_articles(parser, pages):
+    reviews = parser.parse_review_articles(pages["review_page"])
+    assert len(reviews) == 5
+    assert all(review["author"] and review["rating"] and review["date"] for review in reviews)
+
+def test_parsing_is_repeatable(parser, pages):
+    # Parsing must not depend on what was parsed before (e.g. text() mutating a shared tree)
+    first = parser.parse_review_articles(pages["review_page"]), parser.parse_product_detail(pages["product_detail"])
+    second = parser.parse_review_articles(pages["review_page"]), parser.parse_product_detail(pages["product_detail"])
+    assert first == second
+
+def test_fallback_selectors_after_class_hash_change(parser, pages):
+    redeployed = REDEPLOY_CLASS_HASH.sub(lambda m: m.group(1) + "Zz9x1", pages["search_page"])
+    assert redeployed != pages["search_page"]
+    assert parser.parse_search_page(redeployed) == parser.parse_search_page(pages["search_page"])
+
+@pytest.mark.skipif(html_parser.lxml is None, reason="lxml is not installed")
+def test_backends_agree(pages):
+    results = {}
+    for name in BACKENDS:
+        parser = HtmlParser(backend=name)
+        results[name] = (parser.parse_search_page(pages["search_page"]),
+                         parser.parse_product_detail(pages["product_detail"]),
+                         parser.parse_review_articles(pages["review_page"]))
+    assert results["lxml"] == results["bs4"]
+
+@pytest.mark.skipif(html_parser.lxml is None, reason="lxml is not installed")
+def test_lxml_text_keeps_line_breaks_without_mutating_the_tree():
+    backend = BACKENDS["lxml"]()
+    root = backend.parse("<div><p>배송<br>빨라요<span>포장<br/>좋아요</span></p>끝</div>")
+    paragraph = backend.select(root, "p")[0]
+    assert backend.text(paragraph) == "배송\n빨라요포장\n좋아요"
+    assert backend.text(root) == "배송\n빨라요포장\n좋아요끝"
+    assert backend.text(paragraph) == "배송\n빨라요포장\n좋아요"
@@ -0,0 +1,13 @@
+import datetime
+from src.etl.records import review_key, record_key
+
+def test_masked_authors_with_empty_titles_stay_distinct():
+    first = {"작성자": "김*수", "리뷰제목": "", "작성일": "2024.01.02", "리뷰본문": "배송이 빨라요"}
+    second = dict(first, 리뷰본문="포장이 꼼꼼해요")
+    third = dict(first, 작성일="2024.01.03")
+    assert len({record_key(first), record_key(second), record_key(third)}) == 3
+
+def test_stored_review_matches_its_crawled_form():
+    crawled = review_key("김*수", "만족 ", "2024.01.02", " 배송이  빨라요\n")
+    stored = review_key("김*수", "만족", datetime.datetime(2024, 1, 2), "배송이 빨라요")
+    assert crawled == stored
@@ -0,0 +1,18 @@
+from benchmarks.synthetic import generate_reviews
+from src.db.database_handler import DatabaseHandler
+from src.etl.transformer import ReviewTransformer
+from src.search.review_search import ReviewSearchIndex
+
+def test_rebuild_indexes_rows_with_missing_date_and_rating(tmp_path):
+    db_handler = DatabaseHandler(db_url=f"sqlite:///{tmp_path / 'reviews.db'}")
+    db_handler.create_tables()
+    transformer = ReviewTransformer()
+    db_handler.insert_reviews(transformer.transform(generate_reviews(50)))
+    with db_handler.engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE reviews SET created_at = NULL, rating = NULL, coupang_product_id = NULL WHERE id <= 5")
+
+    index = ReviewSearchIndex(index_path=str(tmp_path / "search.db"))
+    assert index.rebuild(db_handler, transformer, chunk_size=20) == 50
+    with index._connect() as conn:
+        missing = conn.execute("SELECT rating, created_at, product_id FROM review_docs WHERE review_id <= 5").fetchall()
+    assert missing == [(None, None, None)] * 5
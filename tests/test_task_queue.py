@@ -0,0 +1,65 @@
+import multiprocessing
+import time
+import pytest
+from src.db.database_handler import DatabaseHandler
+from src.db.task_queue import TaskQueue
+
+WORKERS = 4
+TASKS = 60
+
+def lease_all(db_url, owner, start, results):
+    """Worker process: leases and completes tasks one at a time until the queue is empty."""
+    queue = TaskQueue(DatabaseHandler(db_url=db_url), lease_seconds=60)
+    leased = []
+    start.wait() # all workers race for the same rows
+    while True:
+        tasks = queue.lease(owner)
+        if not tasks:
+            break
+        for task in tasks:
+            leased.append(task.id)
+            assert queue.complete(task.id, owner)
+    results.put((owner, leased))
+
+@pytest.fixture
+def db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'queue.db'}"
+    DatabaseHandler(db_url=url).create_tables()
+    return url
+
+def test_concurrent_workers_lease_each_task_once(db_url):
+    queue = TaskQueue(DatabaseHandler(db_url=db_url))
+    for page in range(1, TASKS + 1):
+        assert queue.enqueue_search_page("키워드", page)
+
+    context = multiprocessing.get_context("spawn") # fresh engines in every worker, as on separate nodes
+    start, results = context.Barrier(WORKERS), context.Queue()
+    workers = [context.Process(target=lease_all, args=(db_url, f"worker-{index}", start, results)) for index in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    leases = dict(results.get(timeout=120) for _ in workers)
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    leased = [task_id for task_ids in leases.values() for task_id in task_ids]
+    assert sorted(leased) == sorted(set(leased)) # no task was leased twice
+    assert len(leased) == TASKS
+    assert queue.stats() == {"search": {"done": TASKS}}
+
+def test_expired_lease_is_taken_over(db_url):
+    queue = TaskQueue(DatabaseHandler(db_url=db_url), lease_seconds=0.2)
+    queue.enqueue_search_page("키워드", 1)
+
+    first = queue.lease("worker-a")
+    assert len(first) == 1
+    assert queue.lease("worker-b") == [] # still leased by worker-a
+    time.sleep(0.3)
+
+    second = queue.lease("worker-b")
+    assert [task.id for task in second] == [first[0].id]
+    assert second[0].attempts == 2
+    assert not queue.heartbeat(first[0].id, "worker-a")
+    assert not queue.complete(first[0].id, "worker-a") # the late worker cannot finish a task it lost
+    assert queue.complete(second[0].id, "worker-b")
+    assert queue.stats() == {"search": {"done": 1}}